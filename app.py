@@ -1,12 +1,38 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, Flask, Response, current_app, g, has_request_context, make_response, render_template, request, redirect, url_for, flash, session
 from werkzeug.security import generate_password_hash, check_password_hash
+import click
+import contextlib
+import csv
+import html
+import json
+import math
 import random
+import secrets
+import datetime as dt
+from functools import wraps
+from time import monotonic, perf_counter
 from flask_sqlalchemy import SQLAlchemy
 import os
+import sys
 from markupsafe import escape
-from sqlalchemy import text
 from config import Config
+from db_settings import engine_options, install_sqlite_pragmas, is_sqlite, sqlite_pragmas
 from dotenv import load_dotenv
+from migrations import run_migrations
+from retention import run_retention
+from cache import DiskCache, LRUCache, ResponseCache, TTLCache
+from pubsub import PubSubHub
+from rate_limit import MemoryBuckets, RateLimiter, SQLiteBuckets, rate_limits
+from metrics import QUERY_COUNT_BUCKETS, MetricsRegistry
+from search import FTS_COLUMNS, FTS_WEIGHTS, GROUND_FTS_DDL, fts_match_expression, material_keys, query_terms
+from spatial_index import GridIndex
+from jobs import PeriodicWorker, WorkerPool, retry_delay
+from matchmaking import free_slots, rank_open_pools
+from team_balancing import TEAM_LABELS, balance_teams, check_match_format
+from availability import DaySchedule, format_minutes, minutes_of, parse_date, parse_time
+from sqlalchemy import DDL, and_, case, delete, event, exists, func, insert, literal, or_, select, text, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
 # render_template: Used to display HTML pages
 # request: Handles data sent from forms
 # redirect: Sends users to different pages
@@ -16,14 +42,72 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-app = Flask(__name__)
-# Create a Flask application instance
-# __name__ tells Flask where to look for templates and static files
+# Bound to an application by create_app() (see the bottom of this file)
+db = SQLAlchemy()
+# Every page and API is registered on this blueprint; CLI commands are top-level
+bp = Blueprint('main', __name__, cli_group=None)
 
-# Load configuration
-app.config.from_object(Config)
+# ---------------------- Instrumentation ----------------------
 
-db = SQLAlchemy(app)
+# Served at /metrics; one registry per worker process
+metrics = MetricsRegistry()
+metrics.counter('http_requests_total', 'Requests by route, method and status.')
+metrics.histogram('http_request_duration_seconds', 'Request latency by route.')
+metrics.histogram('http_request_queries', 'SQL statements issued per request, by route.', QUERY_COUNT_BUCKETS)
+metrics.counter('db_query_seconds_total', 'Time spent in SQL statements, by route.')
+metrics.counter('db_slow_queries_total', 'SQL statements slower than SLOW_QUERY_MS, by route.')
+metrics.counter('rate_limited_total', 'Requests refused with 429, by rate limit name.')
+
+def _route_label():
+    if not has_request_context():
+        return 'none'  # CLI commands, scripts
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+# SQLAlchemy engine events: time every statement and attribute it to the request.
+# The start time lives on the statement's execution context, so a statement
+# that raises (and never reaches after_cursor_execute) leaves nothing behind.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_started = perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'query_started', None)
+    if started is None:
+        return
+    elapsed = perf_counter() - started
+    route = _route_label()
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+        g.query_seconds = g.get('query_seconds', 0.0) + elapsed
+    else:
+        metrics.inc('db_query_seconds_total', {'route': route}, elapsed)
+    if elapsed * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        metrics.inc('db_slow_queries_total', {'route': route})
+        current_app.logger.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000, route, ' '.join(statement.split())[:500])
+
+@bp.before_app_request
+def _start_request_timer():
+    g.request_started = perf_counter()
+
+@bp.after_app_request
+def _record_request_metrics(response):
+    route = _route_label()
+    queries = g.get('query_count', 0)
+    metrics.inc('http_requests_total', {'route': route, 'method': request.method, 'status': response.status_code})
+    metrics.observe('http_request_duration_seconds', perf_counter() - g.get('request_started', perf_counter()), {'route': route})
+    metrics.observe('http_request_queries', queries, {'route': route})
+    metrics.inc('db_query_seconds_total', {'route': route}, g.get('query_seconds', 0.0))
+    if current_app.debug:
+        response.headers['X-Query-Count'] = str(queries)
+    return response
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape target. Requires ``Authorization: Bearer <METRICS_TOKEN>`` when that is set."""
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return {"error": "unauthorized"}, 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 # Ground model
 class Ground(db.Model):
@@ -43,6 +127,29 @@ class Ground(db.Model):
     postal_code = db.Column(db.String(20), nullable=True)
     full_address = db.Column(db.String(300), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_ground_published', 'published', 'id'),
+        db.Index('ix_ground_host_email', 'host_email'),
+    )
+
+# Full-text index over the catalogue on SQLite, created and dropped with the
+# ground table and kept in sync by triggers (see search.py)
+for _statement in GROUND_FTS_DDL:
+    event.listen(Ground.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(Ground.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS ground_fts').execute_if(dialect='sqlite'))
+
+# Ground.materials split into one indexed row per material, for filtering and
+# facet counts. Names are normalized with search.material_keys; every write
+# to Ground.materials goes through set_ground_materials.
+class GroundMaterial(db.Model):
+    __tablename__ = 'ground_material'
+    ground_id = db.Column(db.Integer, db.ForeignKey('ground.id'), primary_key=True)
+    material = db.Column(db.String(50), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_ground_material_material', 'material', 'ground_id'),
+    )
+
 # Persistent users for players/hosts with age stored
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -51,15 +158,29 @@ class User(db.Model):
     age = db.Column(db.Integer, nullable=True)
     user_type = db.Column(db.String(20), nullable=False)  # 'player' or 'host'
     profile_image_url = db.Column(db.String(300), nullable=True)
+    phone = db.Column(db.String(30), nullable=True)
+    password_hash = db.Column(db.String(256), nullable=True)  # None for bots and dev-created users
 
 # Match pool per ground/date/time
 class Match(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     ground_id = db.Column(db.Integer, db.ForeignKey('ground.id'), nullable=False)
-    date = db.Column(db.String(20), nullable=False)
-    time = db.Column(db.String(10), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.Time, nullable=False)
     status = db.Column(db.String(20), default='waiting')  # waiting, pending_host, confirmed, declined
     host_email = db.Column(db.String(120), nullable=False)
+    # Members in the pool, only ever changed by a conditional UPDATE (see join_pool)
+    player_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # One pool per ground/date/time slot
+    __table_args__ = (
+        db.Index('uq_match_ground_slot', 'ground_id', 'date', 'time', unique=True),
+        db.Index('ix_match_status', 'status'),
+        db.Index('ix_match_date_time', 'date', 'time'),
+        db.CheckConstraint('player_count >= 0', name='ck_match_player_count'),
+        # Ids are never reused once retention deletes a row (see migration 10)
+        {'sqlite_autoincrement': True},
+    )
 
 # Players in a match with optional team assignment
 class MatchPlayer(db.Model):
@@ -68,72 +189,264 @@ class MatchPlayer(db.Model):
     user_email = db.Column(db.String(120), nullable=False)
     team = db.Column(db.String(1), nullable=True)  # 'A' or 'B'
 
-# Create the database and tables if they don't exist
-if not os.path.exists('grounds.db'):
-    with app.app_context():
-        db.create_all()
-
-# One-time migration: insert static grounds if DB is empty
-with app.app_context():
-    if Ground.query.count() == 0:
-        static_grounds = [
-            Ground(
-                name='Jinnah Sports Complex',
-                location='Islamabad',
-                rate=2000,
-                img='https://images.unsplash.com/photo-1506744038136-46273834b3fb?auto=format&fit=crop&w=400&q=80',
-                published=True,
-                host_email='demo@host.com',
-                materials='Football,Goal Post',
-                ground_use='Football'
-            ),
-            Ground(
-                name='Karachi United Stadium',
-                location='Karachi',
-                rate=1800,
-                img='https://images.unsplash.com/photo-1464983953574-0892a716854b?auto=format&fit=crop&w=400&q=80',
-                published=True,
-                host_email='demo@host.com',
-                materials='Football,Goal Post',
-                ground_use='Football'
-            ),
-            Ground(
-                name='Lahore Football Arena',
-                location='Lahore',
-                rate=2200,
-                img='https://images.unsplash.com/photo-1517649763962-0c623066013b?auto=format&fit=crop&w=400&q=80',
-                published=True,
-                host_email='demo@host.com',
-                materials='Football,Goal Post',
-                ground_use='Football'
-            ),
-            Ground(
-                name='Model Town Sports Complex',
-                location='Lahore',
-                rate=2100,
-                img='https://images.unsplash.com/photo-1465101046530-73398c7f28ca?auto=format&fit=crop&w=400&q=80',
-                published=True,
-                host_email='demo@host.com',
-                materials='Football,Goal Post',
-                ground_use='Football'
-            ),
-            Ground(
-                name='Punjab Stadium',
-                location='Lahore',
-                rate=2300,
-                img='https://images.unsplash.com/photo-1509228468518-180dd4864904?auto=format&fit=crop&w=400&q=80',
-                published=True,
-                host_email='demo@host.com',
-                materials='Football,Goal Post',
-                ground_use='Football'
-            ),
-        ]
-        db.session.bulk_save_objects(static_grounds)
-        db.session.commit()
+    # A player can only be in a pool once
+    __table_args__ = (
+        db.Index('uq_match_player_member', 'match_id', 'user_email', unique=True),
+        db.Index('ix_match_player_user_email', 'user_email'),
+        {'sqlite_autoincrement': True},
+    )
+
+# Booking requests from players for a ground and time range
+class Booking(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ground_id = db.Column(db.Integer, db.ForeignKey('ground.id'), nullable=False)
+    player_email = db.Column(db.String(120), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, approved, declined
+
+    __table_args__ = (
+        db.Index('ix_booking_ground_date', 'ground_id', 'date'),
+        db.Index('ix_booking_player_email', 'player_email'),
+        {'sqlite_autoincrement': True},
+    )
+
+# Read model for the player pages: one row per booking or pool membership,
+# with the ground copied in. Written in the same transaction as the change
+# it mirrors (see the Player Schedule section).
+class PlayerSchedule(db.Model):
+    __tablename__ = 'player_schedule'
+    id = db.Column(db.Integer, primary_key=True)
+    player_email = db.Column(db.String(120), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # 'booking' or 'match'
+    ref_id = db.Column(db.Integer, nullable=False)  # Booking.id or Match.id
+    ground_id = db.Column(db.Integer, nullable=False)
+    ground_name = db.Column(db.String(120), nullable=True)
+    ground_location = db.Column(db.String(120), nullable=True)
+    date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=True)  # None for match pools
+    status = db.Column(db.String(20), nullable=False)
+    team = db.Column(db.String(1), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_player_schedule_player', 'player_email', 'date', 'start_time'),
+        db.Index('uq_player_schedule_item', 'kind', 'ref_id', 'player_email', unique=True),
+    )
+
+# Durable background job (see the Background Jobs section). A job whose
+# idempotency_key is already queued or done is not added again.
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    idempotency_key = db.Column(db.String(200), nullable=True, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime, nullable=False, default=dt.datetime.now)
+    locked_until = db.Column(db.DateTime, nullable=True)  # lease of the worker running it
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=dt.datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=dt.datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_job_ready', 'status', 'run_after'),
+    )
+
+# A player waiting for the matchmaking worker to place them in a pool (see
+# the Matchmaking Queue section). One open request per player.
+class MatchRequest(db.Model):
+    __tablename__ = 'match_request'
+    id = db.Column(db.Integer, primary_key=True)
+    player_email = db.Column(db.String(120), nullable=False)
+    date_from = db.Column(db.Date, nullable=False)
+    date_to = db.Column(db.Date, nullable=False)
+    sport = db.Column(db.String(50), nullable=True)  # lowercased ground_use; None for any
+    origin_ground_id = db.Column(db.Integer, nullable=True)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    max_distance_km = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, placing, placed, expired, cancelled
+    match_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=dt.datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=dt.datetime.now)  # last placement attempt
+
+    __table_args__ = (
+        db.Index('ix_match_request_status', 'status', 'updated_at'),
+        db.Index('ix_match_request_player', 'player_email', 'status'),
+    )
 
-# Example user stores
-players = {}
-hosts = {}
+# Past pools, their members and past bookings, moved out of the hot tables
+# by the retention job (see retention.py). Ids are kept from the originals.
+class MatchArchive(db.Model):
+    __tablename__ = 'match_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    ground_id = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.Time, nullable=False)
+    status = db.Column(db.String(20), nullable=True)
+    host_email = db.Column(db.String(120), nullable=False)
+    player_count = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+class MatchPlayerArchive(db.Model):
+    __tablename__ = 'match_player_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    match_id = db.Column(db.Integer, nullable=False, index=True)
+    user_email = db.Column(db.String(120), nullable=False)
+    team = db.Column(db.String(1), nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+class BookingArchive(db.Model):
+    __tablename__ = 'booking_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    ground_id = db.Column(db.Integer, nullable=False)
+    player_email = db.Column(db.String(120), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    status = db.Column(db.String(20), nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+def seed_grounds():
+    """Insert the demo grounds into an empty catalogue. Returns how many were added."""
+    if Ground.query.count() > 0:
+        return 0
+    static_grounds = [
+        Ground(
+            name='Jinnah Sports Complex',
+            location='Islamabad',
+            rate=2000,
+            img='https://images.unsplash.com/photo-1506744038136-46273834b3fb?auto=format&fit=crop&w=400&q=80',
+            published=True,
+            host_email='demo@host.com',
+            materials='Football,Goal Post',
+            ground_use='Football'
+        ),
+        Ground(
+            name='Karachi United Stadium',
+            location='Karachi',
+            rate=1800,
+            img='https://images.unsplash.com/photo-1464983953574-0892a716854b?auto=format&fit=crop&w=400&q=80',
+            published=True,
+            host_email='demo@host.com',
+            materials='Football,Goal Post',
+            ground_use='Football'
+        ),
+        Ground(
+            name='Lahore Football Arena',
+            location='Lahore',
+            rate=2200,
+            img='https://images.unsplash.com/photo-1517649763962-0c623066013b?auto=format&fit=crop&w=400&q=80',
+            published=True,
+            host_email='demo@host.com',
+            materials='Football,Goal Post',
+            ground_use='Football'
+        ),
+        Ground(
+            name='Model Town Sports Complex',
+            location='Lahore',
+            rate=2100,
+            img='https://images.unsplash.com/photo-1465101046530-73398c7f28ca?auto=format&fit=crop&w=400&q=80',
+            published=True,
+            host_email='demo@host.com',
+            materials='Football,Goal Post',
+            ground_use='Football'
+        ),
+        Ground(
+            name='Punjab Stadium',
+            location='Lahore',
+            rate=2300,
+            img='https://images.unsplash.com/photo-1509228468518-180dd4864904?auto=format&fit=crop&w=400&q=80',
+            published=True,
+            host_email='demo@host.com',
+            materials='Football,Goal Post',
+            ground_use='Football'
+        ),
+    ]
+    db.session.add_all(static_grounds)
+    db.session.flush()
+    set_ground_materials((g.id, g.materials) for g in static_grounds)
+    db.session.commit()
+    return len(static_grounds)
+
+def set_ground_materials(grounds):
+    """Replace the ground_material rows for each (ground_id, materials) pair; the caller commits."""
+    grounds = list(grounds)
+    if not grounds:
+        return
+    db.session.execute(delete(GroundMaterial).where(GroundMaterial.ground_id.in_([gid for gid, _ in grounds])))
+    rows = [{'ground_id': gid, 'material': key} for gid, materials in grounds for key in material_keys(materials)]
+    if rows:
+        db.session.execute(insert(GroundMaterial), rows)
+
+def _ground_to_dict(ground):
+    """JSON-ready ground for templates and APIs."""
+    return {
+        'id': ground.id,
+        'name': ground.name,
+        'location': ground.location,
+        'rate': ground.rate,
+        'img': ground.img,
+        'published': ground.published,
+        'host_email': ground.host_email,
+        'materials': ground.materials,
+        'ground_use': ground.ground_use,
+        'latitude': ground.latitude,
+        'longitude': ground.longitude,
+        'city': ground.city,
+        'postal_code': ground.postal_code,
+        'full_address': ground.full_address
+    }
+
+# ---------------------- Ground Fields ----------------------
+# Shared by signup_host and the bulk import; the messages are shown to users as-is.
+
+def parse_coordinates(latitude, longitude):
+    """(lat, lng) as floats, or ValueError with the message to show."""
+    try:
+        lat_float = float(latitude)
+        lng_float = float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError('Please enter valid numeric coordinates.')
+    if not (-90 <= lat_float <= 90) or not (-180 <= lng_float <= 180):
+        raise ValueError('Please enter valid coordinates (Latitude: -90 to 90, Longitude: -180 to 180).')
+    return lat_float, lng_float
+
+def parse_rate(rate):
+    """Hourly rate as a non-negative int, or ValueError with the message to show."""
+    try:
+        if rate is None or rate == '':
+            raise ValueError('Rate is required')
+        rate_int = int(rate)
+    except (TypeError, ValueError):
+        raise ValueError('Please enter a valid rate (numbers only).')
+    if rate_int < 0:
+        raise ValueError('Rate must be a positive number.')
+    return rate_int
+
+# ---------------------- Credentials ----------------------
+# Password hashes live on User, so every worker process sees the same accounts.
+
+def hash_password(password):
+    """Hash with the configured method, e.g. 'pbkdf2:sha256:600000' or 'scrypt'."""
+    return generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'],
+                                  salt_length=current_app.config['PASSWORD_SALT_LENGTH'])
+
+def verify_password(user, password):
+    """Check a login attempt, upgrading the stored hash if the configured method changed."""
+    if user is None or not user.password_hash:
+        return False
+    if not check_password_hash(user.password_hash, password):
+        return False
+    stored_method = user.password_hash.split('$', 1)[0]
+    wanted_method = current_app.config['PASSWORD_HASH_METHOD']
+    if stored_method != wanted_method and not stored_method.startswith(wanted_method + ':'):
+        user.password_hash = hash_password(password)
+        db.session.commit()
+    return True
 
 def get_or_create_user_from_session():
     email = session.get('user_email')
@@ -143,31 +456,215 @@ def get_or_create_user_from_session():
     user = User.query.filter_by(email=email).first()
     if user:
         return user
-    # Bootstrap from in-memory stores
-    source = players.get(email) if user_type == 'player' else hosts.get(email)
-    name = source.get('name') if source else None
-    age = source.get('age') if source else None
-    user = User(email=email, name=name, age=age, user_type=user_type)
+    user = User(email=email, user_type=user_type)
     db.session.add(user)
     db.session.commit()
     return user
 
-@app.route('/')
+# ---------------------- Demo Accounts ----------------------
+
+DEMO_PASSWORD = 'demo123'
+DEMO_ACCOUNTS = {
+    'player@demo.com': dict(name='Demo Player', age=22, user_type='player', phone='0000000000',
+                            profile_image_url='https://em-content.zobj.net/thumbs/240/apple/354/smiling-face-with-sunglasses_1f60e.png'),
+    'demo@host.com': dict(name='Demo Host', age=30, user_type='host', phone='0000000000',
+                          profile_image_url='https://em-content.zobj.net/thumbs/240/apple/354/alien_1f47d.png'),
+}
+
+def ensure_demo_user(email):
+    """Create a demo account (or give it its password) the first time it is used.
+
+    Password hashing is slow on purpose, so it happens on the first demo
+    login rather than on every worker start. Returns None for other emails.
+    """
+    account = DEMO_ACCOUNTS.get(email)
+    if account is None:
+        return None
+    user = User.query.filter_by(email=email).first()
+    if user is not None and user.password_hash:
+        return user
+    if user is None:
+        user = User(email=email, password_hash=hash_password(DEMO_PASSWORD), **account)
+        db.session.add(user)
+    else:
+        user.password_hash = hash_password(DEMO_PASSWORD)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker created it first
+        db.session.rollback()
+        user = User.query.filter_by(email=email).first()
+    return user
+
+# ---------------------- Response Cache ----------------------
+
+def _response_cache_backend(app):
+    size, ttl = app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_SECONDS']
+    if app.config['RESPONSE_CACHE_BACKEND'] == 'none':
+        return None
+    if app.config['RESPONSE_CACHE_BACKEND'] == 'disk':
+        path = app.config['RESPONSE_CACHE_PATH'] or os.path.join(app.instance_path, 'response_cache.db')
+        return DiskCache(path, maxsize=size, ttl=ttl)
+    return LRUCache(maxsize=size, ttl=ttl)
+
+# create_app() picks the backend from RESPONSE_CACHE_BACKEND
+response_cache = ResponseCache(None)
+
+def cached_page(*tags):
+    """Serve a GET page from response_cache, keyed by route, arguments and viewer.
+
+    ``tags`` name the data the page shows; a tag may be a callable returning
+    the tag, for per-user pages. Writes call ``invalidate_pages`` with the
+    tags they affect. Pages carrying a flash message are never cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if response_cache.backend is None or request.method != 'GET' or '_flashes' in session:
+                return view(*args, **kwargs)
+            page_tags = [tag() if callable(tag) else tag for tag in tags]
+            viewer = (session.get('user_type'), session.get('user_email'))
+            params = list(request.args.items(multi=True)) + sorted(kwargs.items())
+            key = response_cache.key(request.endpoint, params, viewer, page_tags)
+            hit = response_cache.get(key)
+            if hit is not None:
+                body, status, mimetype = hit
+                response = Response(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and '_flashes' not in session:
+                response_cache.set(key, (response.get_data(), response.status_code, response.mimetype))
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+def invalidate_pages(*tags):
+    if response_cache.backend is not None:
+        response_cache.invalidate(*tags)
+
+def _host_pages_tag():
+    return f"host:{session.get('user_email')}"
+
+# ---------------------- Rate Limiting ----------------------
+
+def _rate_limit_backend(app):
+    if app.config['RATE_LIMIT_BACKEND'] == 'none':
+        return None
+    if app.config['RATE_LIMIT_BACKEND'] == 'disk':
+        path = app.config['RATE_LIMIT_PATH'] or os.path.join(app.instance_path, 'rate_limit.db')
+        return SQLiteBuckets(path)
+    return MemoryBuckets()
+
+# create_app() picks the backend from RATE_LIMIT_BACKEND and the limits from RATE_LIMIT_*_PER_*
+rate_limiter = RateLimiter(None)
+
+def _rate_limit_session_id():
+    if session.get('user_email'):
+        return f"user:{session['user_email']}"
+    # Anonymous visitors (e.g. on the login form) get a random id in their session cookie
+    if 'rate_id' not in session:
+        session['rate_id'] = secrets.token_hex(8)
+    return f"anon:{session['rate_id']}"
+
+def rate_limited(name, methods=('GET', 'POST'), template=None):
+    """Limit a view with the RATE_LIMIT_<NAME>_PER_IP and _PER_SESSION token buckets.
+
+    Only requests using ``methods`` count. Over the limit, the view is not
+    run: the response is a 429 with Retry-After, rendering ``template`` with
+    a flash message for pages and a JSON error otherwise. Views sharing a
+    name share buckets. Behind a reverse proxy, wrap the app in werkzeug's
+    ProxyFix so remote_addr is the client's address.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if rate_limiter.backend is None or request.method not in methods:
+                return view(*args, **kwargs)
+            allowed, retry_after = rate_limiter.hit(name, {'ip': request.remote_addr,
+                                                           'session': _rate_limit_session_id()})
+            if allowed:
+                return view(*args, **kwargs)
+            seconds = max(1, math.ceil(retry_after))
+            metrics.inc('rate_limited_total', {'route': name})
+            if template:
+                flash(f'Too many attempts. Please try again in {seconds} seconds.', 'danger')
+                response = make_response(render_template(template), 429)
+            else:
+                response = make_response({"error": "too many requests", "retry_after": seconds}, 429)
+            response.headers['Retry-After'] = str(seconds)
+            return response
+        return wrapper
+    return decorator
+
+# ---------------------- Lobby Feed ----------------------
+
+LOBBY_FEED_SIZE = 12
+# Bookable match slots, every 2 hours from 06:00 to 22:00 (see populateTimeDropdown)
+POOL_SLOT_TIMES = [f'{hour:02d}:00' for hour in range(6, 23, 2)]
+MAX_POOL_BATCH_GROUNDS = 200
+MAX_GROUNDS_PAGE_SIZE = 100
+MAX_MATCH_RANGE_DAYS = 31
+
+lobby_feed_cache = TTLCache(ttl=Config.LOBBY_FEED_CACHE_SECONDS)
+
+# Pool format, e.g. 10 players in 2 teams (5-a-side), 14/2 for 7-a-side, 22/2 for 11-a-side.
+# Per app (MATCH_CAPACITY, MATCH_TEAM_COUNT); create_app rejects a format that can't work.
+def match_capacity():
+    return current_app.config['MATCH_CAPACITY']
+
+def match_team_count():
+    return current_app.config['MATCH_TEAM_COUNT']
+
+@bp.app_template_filter('hhmm')
+def format_hhmm(value):
+    """A ``datetime.time`` as '18:00' (the form the slot pickers use)."""
+    return value.strftime('%H:%M')
+
+def _build_lobby_feed():
+    """Soonest upcoming match pools with their ground and player count, in one query."""
+    # Range scan on ix_match_date_time instead of every pool ever created
+    upcoming = (
+        db.session.query(Match.id)
+        .filter(Match.date >= dt.date.today())
+        .order_by(Match.date, Match.time)
+        .limit(LOBBY_FEED_SIZE)
+        .subquery()
+    )
+    rows = (
+        db.session.query(Match, Ground, func.count(MatchPlayer.id))
+        .join(upcoming, upcoming.c.id == Match.id)
+        .join(Ground, Ground.id == Match.ground_id)
+        .outerjoin(MatchPlayer, MatchPlayer.match_id == Match.id)
+        .group_by(Match.id, Ground.id)
+        .order_by(Match.date, Match.time)
+        .all()
+    )
+    # Plain dicts so cached cards never hold on to session-bound objects
+    return [
+        {
+            'match': {'id': m.id, 'date': m.date.isoformat(), 'time': format_hhmm(m.time), 'status': m.status},
+            'ground': {'id': g.id, 'name': g.name, 'location': g.location, 'img': g.img},
+            'count': count,
+            'capacity': match_capacity()
+        }
+        for m, g, count in rows
+    ]
+
+def get_lobby_feed():
+    return lobby_feed_cache.get_or_set('lobby', _build_lobby_feed)
+
+def invalidate_lobby_feed():
+    lobby_feed_cache.invalidate('lobby')
+    invalidate_pages('lobby')
+
+@bp.route('/')
+@cached_page('lobby')
 def home():
-    # Modern home: show recent/ongoing matches as the focal point
+    # Modern home: show upcoming match pools as the focal point
     # No login wall here; join will prompt login if needed via backend redirect
-    recent_matches = Match.query.order_by(Match.id.desc()).limit(12).all() if 'Match' in globals() else []
-    # Build simple DTOs
-    cards = []
-    for m in recent_matches:
-        g = Ground.query.get(m.ground_id)
-        count = MatchPlayer.query.filter_by(match_id=m.id).count()
-        cards.append({
-            'match': m,
-            'ground': g,
-            'count': count,
-            'capacity': 10
-        })
+    cards = get_lobby_feed()
     # Fallback demo cards if no real matches
     if not cards:
         cards = [
@@ -207,7 +704,7 @@ def home():
 
 
 
-@app.route('/signup/player', methods=['GET', 'POST'])
+@bp.route('/signup/player', methods=['GET', 'POST'])
 def signup_player():
     # This route handles both GET (show form) and POST (process form) requests
     if request.method == 'POST':
@@ -232,27 +729,20 @@ def signup_player():
                 return render_template('signup_player.html')
                 
             # Check if email already exists
-            if email in players:
+            if User.query.filter_by(email=email).first():
                 flash('Email already registered. Please login or use a different email.', 'danger')
                 return render_template('signup_player.html')
                 
-            print(f"Player signup: Name={name}, Age={age}, Email={email}, Phone={phone}")
-            players[email] = {
-                'password': generate_password_hash(password),
-                'name': name,
-                'age': age,
-                'email': email,
-                'phone': phone
-            }
-            # persist as User
-            if not User.query.filter_by(email=email).first():
-                db.session.add(User(email=email, name=name, age=age, user_type='player', profile_image_url=request.form.get('profile_image_url')))
-                db.session.commit()
+            current_app.logger.info('Player signup: %s', email)
+            db.session.add(User(email=email, name=name, age=age, user_type='player', phone=phone,
+                                password_hash=hash_password(password),
+                                profile_image_url=request.form.get('profile_image_url')))
+            db.session.commit()
             session['user_type'] = 'player'
             session['user_email'] = email
             flash('Account created successfully! Welcome!', 'success')
             # Redirect to the grounds page after signup
-            return redirect(url_for('grounds'))
+            return redirect(url_for('main.grounds'))
             
         except ValueError:
             flash('Please enter a valid age (numbers only).', 'danger')
@@ -260,9 +750,9 @@ def signup_player():
         except KeyError as e:
             flash(f'Missing required field: {str(e)}', 'danger')
             return render_template('signup_player.html')
-        except Exception as e:
+        except Exception:
             flash('An error occurred during signup. Please try again.', 'danger')
-            print(f"Player signup error: {e}")
+            current_app.logger.exception('Player signup error')
             return render_template('signup_player.html')
             
     # If it's a GET request, show the signup form
@@ -272,7 +762,7 @@ def signup_player():
 
 
 
-@app.route('/signup/host', methods=['GET', 'POST'])
+@bp.route('/signup/host', methods=['GET', 'POST'])
 def signup_host():
     if request.method == 'POST':
         try:
@@ -303,13 +793,9 @@ def signup_host():
                 
             # Validate coordinates
             try:
-                lat_float = float(latitude)
-                lng_float = float(longitude)
-                if not (-90 <= lat_float <= 90) or not (-180 <= lng_float <= 180):
-                    flash('Please enter valid coordinates (Latitude: -90 to 90, Longitude: -180 to 180).', 'danger')
-                    return render_template('signup_host.html')
-            except ValueError:
-                flash('Please enter valid numeric coordinates.', 'danger')
+                lat_float, lng_float = parse_coordinates(latitude, longitude)
+            except ValueError as e:
+                flash(str(e), 'danger')
                 return render_template('signup_host.html')
                 
             try:
@@ -326,20 +812,18 @@ def signup_host():
                 flash('Please enter a valid age (numbers only).', 'danger')
                 return render_template('signup_host.html')
             try:
-                if rate is None or rate == '':
-                    raise ValueError('Rate is required')
-                rate_int = int(rate)
-                if rate_int < 0:
-                    flash('Rate must be a positive number.', 'danger')
-                    return render_template('signup_host.html')
-            except ValueError:
-                flash('Please enter a valid rate (numbers only).', 'danger')
+                rate_int = parse_rate(rate)
+            except ValueError as e:
+                flash(str(e), 'danger')
                 return render_template('signup_host.html')
             # Check if host already exists by email in grounds table (host_email)
             existing_ground = Ground.query.filter_by(host_email=email).first()
             if existing_ground:
                 flash('Email already registered as a host. Please login or use a different email.', 'danger')
                 return render_template('signup_host.html')
+            if User.query.filter_by(email=email).first():
+                flash('Email already registered. Please login or use a different email.', 'danger')
+                return render_template('signup_host.html')
             session['user_type'] = 'host'
             session['user_email'] = email
             # Add the ground to the database as unpublished
@@ -361,112 +845,113 @@ def signup_host():
                 longitude=lng_float
             )
             db.session.add(new_ground)
+            db.session.flush()
+            set_ground_materials([(new_ground.id, new_ground.materials)])
+            db.session.add(User(email=email, name=name, age=age_int, user_type='host', phone=phone,
+                                password_hash=hash_password(password),
+                                profile_image_url=request.form.get('profile_image_url')))
             db.session.commit()
-            # Add host to hosts dictionary for login
-            hosts[email] = {
-                'password': generate_password_hash(password),
-                'name': name,
-                'age': int(age),
-                'email': email,
-                'phone': phone
-            }
-            if not User.query.filter_by(email=email).first():
-                db.session.add(User(email=email, name=name, age=int(age), user_type='host', profile_image_url=request.form.get('profile_image_url')))
-                db.session.commit()
+            invalidate_pages(f'host:{email}')
             flash('Host account created! Preview your ground before publishing.', 'success')
-            return redirect(url_for('grounds_host'))
-        except Exception as e:
+            return redirect(url_for('main.grounds_host'))
+        except Exception:
             flash('An error occurred during signup. Please try again.', 'danger')
-            print(f"Host signup error: {e}")
+            current_app.logger.exception('Host signup error')
             return render_template('signup_host.html')
     return render_template('signup_host.html')
 
-@app.route('/publish-ground/<int:ground_id>', methods=['POST'])
+@bp.route('/publish-ground/<int:ground_id>', methods=['POST'])
 def publish_ground_action(ground_id):
     # Only the host who owns the ground can publish it
     if 'user_email' not in session or session.get('user_type') != 'host':
         flash('You must be logged in as a host to publish a ground.', 'danger')
-        return redirect(url_for('login_host'))
+        return redirect(url_for('main.login_host'))
     ground = Ground.query.get_or_404(ground_id)
     if ground.host_email != session['user_email']:
         flash('You do not have permission to publish this ground.', 'danger')
-        return redirect(url_for('grounds_host'))
+        return redirect(url_for('main.grounds_host'))
     ground.published = True
     db.session.commit()
+    index_ground(ground)
+    invalidate_pages('grounds', f'host:{ground.host_email}')
     flash('Ground published successfully!', 'success')
-    return redirect(url_for('grounds_host'))
+    return redirect(url_for('main.grounds_host'))
 
-@app.route('/login')
+@bp.route('/login')
 def login():
     return render_template('login.html')
 
-@app.route('/login/player', methods=['GET', 'POST'])
+@bp.route('/login/player', methods=['GET', 'POST'])
+@rate_limited('login', methods=('POST',), template='login_player.html')
 def login_player():
     if request.method == 'POST':
         try:
             email = request.form['email']
             password = request.form['password']
-            user = players.get(email)
+            ensure_demo_user(email)
+            user = User.query.filter_by(email=email, user_type='player').first()
             
             # Check if user exists and password is correct
-            if user and check_password_hash(user['password'], password):
+            if verify_password(user, password):
                 # Login successful!
                 session['user_type'] = 'player'
                 session['user_email'] = email
                 get_or_create_user_from_session()
                 flash('Login successful!', 'success')
-                return redirect(url_for('grounds'))
+                return redirect(url_for('main.grounds'))
             else:
                 flash('Invalid email or password', 'danger')
                 return render_template('login_player.html')
         except KeyError as e:
             flash(f'Missing required field: {str(e)}', 'danger')
             return render_template('login_player.html')
-        except Exception as e:
+        except Exception:
             flash('An error occurred during login. Please try again.', 'danger')
-            print(f"Player login error: {e}")
+            current_app.logger.exception('Player login error')
             return render_template('login_player.html')
     return render_template('login_player.html')
 
-@app.route('/login/host', methods=['GET', 'POST'])
+@bp.route('/login/host', methods=['GET', 'POST'])
+@rate_limited('login', methods=('POST',), template='login_host.html')
 def login_host():
     if request.method == 'POST':
         try:
             email = request.form['email']
             password = request.form['password']
-            user = hosts.get(email)
+            ensure_demo_user(email)
+            user = User.query.filter_by(email=email, user_type='host').first()
             
             # Check if user exists and password is correct
-            if user and check_password_hash(user['password'], password):
+            if verify_password(user, password):
                 # Login successful!
                 session['user_type'] = 'host'
                 session['user_email'] = email
                 get_or_create_user_from_session()
                 flash('Login successful!', 'success')
-                return redirect(url_for('grounds'))
+                return redirect(url_for('main.grounds'))
             else:
                 flash('Invalid email or password', 'danger')
                 return render_template('login_host.html')
         except KeyError as e:
             flash(f'Missing required field: {str(e)}', 'danger')
             return render_template('login_host.html')
-        except Exception as e:
+        except Exception:
             flash('An error occurred during login. Please try again.', 'danger')
-            print(f"Host login error: {e}")
+            current_app.logger.exception('Host login error')
             return render_template('login_host.html')
     return render_template('login_host.html')
 
-@app.route('/dashboard/player')
+@bp.route('/dashboard/player')
 def dashboard_player():
     # Only allow if logged in as player
     return "Player Home Page"
 
-@app.route('/dashboard/host')
+@bp.route('/dashboard/host')
 def dashboard_host():
     # Only allow if logged in as host
     return "player Home Page"
 
-@app.route('/player/home')
+@bp.route('/player/home')
 def player_home():
     # Example static data for MVP
     grounds = [
@@ -488,39 +973,107 @@ def player_home():
     ]
     return render_template('player_home.html', grounds=grounds)
 
-@app.route('/grounds')
+def _published_grounds_page(after, limit, conditions=()):
+    """One page of published grounds by keyset: id > after, via the (published, id) index.
+
+    ``conditions`` narrows the grounds further (see _ground_filter_conditions).
+    Returns (grounds, next_cursor); next_cursor is None on the last page.
+    """
+    query = Ground.query.filter(Ground.published == True, *conditions)
+    if after:
+        query = query.filter(Ground.id > after)
+    rows = query.order_by(Ground.id).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def _cursor_arg():
+    try:
+        return max(0, int(request.args.get('after', 0)))
+    except ValueError:
+        return 0
+
+@bp.route('/grounds')
+@cached_page('grounds')
 def grounds():
-    # Show only published grounds to all users
-    grounds_list = Ground.query.filter_by(published=True).all()
-    # Convert Ground objects to dictionaries for JSON serialization
-    grounds_dict = []
-    for ground in grounds_list:
-        grounds_dict.append({
-            'id': ground.id,
-            'name': ground.name,
-            'location': ground.location,
-            'rate': ground.rate,
-            'img': ground.img,
-            'published': ground.published,
-            'host_email': ground.host_email,
-            'materials': ground.materials,
-            'ground_use': ground.ground_use,
-            'latitude': ground.latitude,
-            'longitude': ground.longitude,
-            'city': ground.city,
-            'postal_code': ground.postal_code,
-            'full_address': ground.full_address
-        })
+    # Show only published grounds to all users, one page at a time
+    grounds_list, next_cursor = _published_grounds_page(_cursor_arg(), current_app.config['GROUNDS_PAGE_SIZE'])
     is_host = session.get('user_type') == 'host'
     is_player = session.get('user_type') == 'player'
-    return render_template('grounds.html', grounds=grounds_list, grounds_json=grounds_dict, is_host=is_host, is_player=is_player)
+    return render_template('grounds.html', grounds=grounds_list, next_cursor=next_cursor, is_host=is_host, is_player=is_player,
+                           max_pool_batch=MAX_POOL_BATCH_GROUNDS)
+
+# Upper bounds of the rate facet buckets (PKR per hour); the last bucket is open-ended
+RATE_FACET_BOUNDS = (1000, 2000, 3000, 5000)
+
+def _ground_filter_conditions():
+    """WHERE conditions from ?sport=&material=&min_rate=&max_rate= (ValueError on a bad rate).
+
+    ``material`` may repeat or be comma-separated; a ground must offer all of them.
+    """
+    conditions = []
+    sport = request.args.get('sport', '').strip().lower()
+    if sport:
+        conditions.append(func.lower(Ground.ground_use) == sport)
+    for key in material_keys(request.args.getlist('material')):
+        conditions.append(exists().where(GroundMaterial.ground_id == Ground.id, GroundMaterial.material == key))
+    if request.args.get('min_rate'):
+        conditions.append(Ground.rate >= int(request.args['min_rate']))
+    if request.args.get('max_rate'):
+        conditions.append(Ground.rate <= int(request.args['max_rate']))
+    return conditions
+
+def _ground_facets(conditions):
+    """{'sport': {...}, 'material': {...}, 'rate': {...}} counts over the filtered published grounds.
+
+    All three facets come back from one UNION ALL statement over the same filtered set.
+    """
+    filtered = select(Ground.id, Ground.ground_use, Ground.rate).where(Ground.published == True, *conditions).cte('filtered')
+    sport = func.lower(filtered.c.ground_use)
+    bucket = case(*[(filtered.c.rate < bound, f'{low}-{bound - 1}')
+                    for low, bound in zip((0,) + RATE_FACET_BOUNDS, RATE_FACET_BOUNDS)],
+                  else_=f'{RATE_FACET_BOUNDS[-1]}+')
+    statement = union_all(
+        select(literal('sport'), sport, func.count()).select_from(filtered).where(sport != '').group_by(sport),
+        select(literal('material'), GroundMaterial.material, func.count())
+        .join_from(filtered, GroundMaterial, GroundMaterial.ground_id == filtered.c.id).group_by(GroundMaterial.material),
+        select(literal('rate'), bucket, func.count()).select_from(filtered).group_by(bucket),
+    )
+    facets = {'sport': {}, 'material': {}, 'rate': {}}
+    for facet, value, count in db.session.execute(statement):
+        facets[facet][value] = count
+    return facets
 
-@app.route('/grounds/host')
+@bp.route('/api/grounds')
+def api_grounds():
+    """Next page of published grounds for infinite scroll (?after=<cursor>&limit=&html=1).
+
+    Filters: ?sport=&material=&min_rate=&max_rate=; ?facets=1 adds counts for the filtered set.
+    """
+    try:
+        limit = int(request.args.get('limit', current_app.config['GROUNDS_PAGE_SIZE']))
+    except ValueError:
+        return {"error": "limit must be an integer"}, 400
+    try:
+        conditions = _ground_filter_conditions()
+    except ValueError:
+        return {"error": "min_rate and max_rate must be integers"}, 400
+    limit = max(1, min(limit, MAX_GROUNDS_PAGE_SIZE))
+    page, next_cursor = _published_grounds_page(_cursor_arg(), limit, conditions)
+    payload = {"grounds": [_ground_to_dict(g) for g in page], "next_cursor": next_cursor}
+    if request.args.get('facets'):
+        payload["facets"] = _ground_facets(conditions)
+    if request.args.get('html'):
+        is_player = session.get('user_type') == 'player'
+        payload["html"] = ''.join(render_template('ground_card.html', ground=g, is_player=is_player) for g in page)
+    return payload
+
+@bp.route('/grounds/host')
+@cached_page(_host_pages_tag)
 def grounds_host():
     # Show all grounds for the logged-in host (published and unpublished)
     if 'user_email' not in session or session.get('user_type') != 'host':
         flash('You must be logged in as a host to view this page.', 'danger')
-        return redirect(url_for('login_host'))
+        return redirect(url_for('main.login_host'))
     host_email = session['user_email']
     # All grounds for this host
     host_grounds = Ground.query.filter_by(host_email=host_email).all()
@@ -530,53 +1083,146 @@ def grounds_host():
     published_grounds = [g for g in host_grounds if g.published]
     
     # Convert Ground objects to dictionaries for JSON serialization
-    published_grounds_dict = []
-    for ground in published_grounds:
-        published_grounds_dict.append({
-            'id': ground.id,
-            'name': ground.name,
-            'location': ground.location,
-            'rate': ground.rate,
-            'img': ground.img,
-            'published': ground.published,
-            'host_email': ground.host_email,
-            'materials': ground.materials,
-            'ground_use': ground.ground_use,
-            'latitude': ground.latitude,
-            'longitude': ground.longitude,
-            'city': ground.city,
-            'postal_code': ground.postal_code,
-            'full_address': ground.full_address
-        })
-    
+    published_grounds_dict = [_ground_to_dict(ground) for ground in published_grounds]
     # Convert host_ground to dictionary if it exists
-    host_ground_dict = None
-    if host_ground:
-        host_ground_dict = {
-            'id': host_ground.id,
-            'name': host_ground.name,
-            'location': host_ground.location,
-            'rate': host_ground.rate,
-            'img': host_ground.img,
-            'published': host_ground.published,
-            'host_email': host_ground.host_email,
-            'materials': host_ground.materials,
-            'ground_use': host_ground.ground_use,
-            'latitude': host_ground.latitude,
-            'longitude': host_ground.longitude,
-            'city': host_ground.city,
-            'postal_code': host_ground.postal_code,
-            'full_address': host_ground.full_address
-        }
+    host_ground_dict = _ground_to_dict(host_ground) if host_ground else None
     
     return render_template('grounds_host.html', grounds=published_grounds, grounds_json=published_grounds_dict, host_ground=host_ground, host_ground_json=host_ground_dict)
 
-@app.route('/ground/<int:ground_id>')
+# ---------------------- Nearby Grounds ----------------------
+
+# Published grounds with coordinates, for /api/grounds/near and /api/grounds/within
+ground_index = GridIndex(cell_deg=Config.GROUND_INDEX_CELL_DEG)
+_ground_index_built_at = None
+MAX_NEAR_RADIUS_KM = 500
+MAX_NEAR_LIMIT = 100
+
+def _ensure_ground_index():
+    """Load the index on first use, and reload it every GROUND_INDEX_REFRESH_SECONDS
+    so grounds published through other workers show up too."""
+    global _ground_index_built_at
+    refresh = current_app.config['GROUND_INDEX_REFRESH_SECONDS']
+    if _ground_index_built_at is not None and monotonic() - _ground_index_built_at < refresh:
+        return
+    rows = (
+        db.session.query(Ground.id, Ground.latitude, Ground.longitude)
+        .filter(Ground.published == True, Ground.latitude.isnot(None), Ground.longitude.isnot(None))
+        .all()
+    )
+    ground_index.load(rows)
+    _ground_index_built_at = monotonic()
+
+def invalidate_ground_index():
+    """Force a full reload on the next query."""
+    global _ground_index_built_at
+    _ground_index_built_at = None
+
+def index_ground(ground):
+    """Add, move or drop one ground after it changes, without a full rebuild."""
+    if ground.published and ground.latitude is not None and ground.longitude is not None:
+        ground_index.upsert(ground.id, ground.latitude, ground.longitude)
+    else:
+        ground_index.remove(ground.id)
+
+def _grounds_by_ids(ids):
+    return {g.id: g for g in Ground.query.filter(Ground.id.in_(ids)).all()} if ids else {}
+
+def _float_args(*names):
+    values = []
+    for name in names:
+        raw = request.args.get(name)
+        if raw is None or raw == '':
+            raise ValueError(f'missing {name}')
+        value = float(raw)
+        if not math.isfinite(value):
+            raise ValueError(f'{name} must be a finite number')
+        values.append(value)
+    return values
+
+@bp.route('/api/grounds/near')
+def api_grounds_near():
+    """Published grounds within `radius` km of lat/lng, closest first."""
+    try:
+        lat, lng = _float_args('lat', 'lng')
+        radius = float(request.args.get('radius', 10))
+        limit = int(request.args.get('limit', 20))
+    except ValueError as e:
+        return {"error": f"invalid parameters: {e}"}, 400
+    if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+        return {"error": "lat must be -90..90 and lng -180..180"}, 400
+    radius = max(0.0, min(radius, MAX_NEAR_RADIUS_KM))
+    limit = max(1, min(limit, MAX_NEAR_LIMIT))
+    _ensure_ground_index()
+    hits = ground_index.nearest(lat, lng, radius, limit)
+    grounds_by_id = _grounds_by_ids([gid for _, gid, _, _ in hits])
+    results = []
+    for dist, gid, _, _ in hits:
+        ground = grounds_by_id.get(gid)
+        if ground is not None:
+            results.append(dict(_ground_to_dict(ground), distance_km=round(dist, 3)))
+    return {"lat": lat, "lng": lng, "radius_km": radius, "grounds": results}
+
+@bp.route('/api/grounds/within')
+def api_grounds_within():
+    """Published grounds inside a bounding box (e.g. the visible map area)."""
+    try:
+        min_lat, min_lng, max_lat, max_lng = _float_args('min_lat', 'min_lng', 'max_lat', 'max_lng')
+        limit = int(request.args.get('limit', MAX_NEAR_LIMIT))
+    except ValueError as e:
+        return {"error": f"invalid parameters: {e}"}, 400
+    if not all(-90 <= lat <= 90 for lat in (min_lat, max_lat)) or not all(-180 <= lng <= 180 for lng in (min_lng, max_lng)):
+        return {"error": "lat must be -90..90 and lng -180..180"}, 400
+    if min_lat > max_lat or min_lng > max_lng:
+        return {"error": "min values must not exceed max values"}, 400
+    limit = max(1, min(limit, MAX_NEAR_LIMIT))
+    _ensure_ground_index()
+    hits = ground_index.within_bbox(min_lat, min_lng, max_lat, max_lng, limit)
+    grounds_by_id = _grounds_by_ids([gid for gid, _, _ in hits])
+    return {"grounds": [_ground_to_dict(grounds_by_id[gid]) for gid, _, _ in hits if gid in grounds_by_id]}
+
+# ---------------------- Ground Search ----------------------
+
+MAX_SEARCH_LIMIT = 50
+
+def search_grounds(q, limit):
+    """Published grounds matching every word of q as a prefix, best match first."""
+    if db.engine.dialect.name == 'sqlite':
+        expression = fts_match_expression(q)
+        if expression is None:
+            return []
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        statement = text(
+            'SELECT ground.* FROM ground_fts JOIN ground ON ground.id = ground_fts.rowid'
+            f' WHERE ground_fts MATCH :expression AND ground.published = 1'
+            f' ORDER BY bm25(ground_fts, {weights}), ground.id LIMIT :limit'
+        )
+        return db.session.execute(select(Ground).from_statement(statement),
+                                  {'expression': expression, 'limit': limit}).scalars().all()
+    terms = query_terms(q)
+    if not terms:
+        return []
+    columns = [getattr(Ground, column) for column in FTS_COLUMNS]
+    matches_term = [or_(*(column.ilike(f'%{term}%') for column in columns)) for term in terms]
+    return Ground.query.filter(Ground.published == True, *matches_term).order_by(Ground.name).limit(limit).all()
+
+@bp.route('/api/grounds/search')
+@cached_page('grounds')
+def api_grounds_search():
+    """Search-as-you-type over published grounds (?q=<words>&limit=)."""
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return {"error": "limit must be an integer"}, 400
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    q = request.args.get('q', '')
+    return {"query": q, "grounds": [_ground_to_dict(g) for g in search_grounds(q, limit)]}
+
+@bp.route('/ground/<int:ground_id>')
 def ground_detail(ground_id):
     # For now, just show a placeholder page
     return f"Ground detail and booking for ground {ground_id}"
 
-@app.route('/publish-ground', methods=['GET', 'POST'])
+@bp.route('/publish-ground', methods=['GET', 'POST'])
 def publish_ground():
     if request.method == 'POST':
         # Add new ground to the database (unpublished by default)
@@ -598,12 +1244,159 @@ def publish_ground():
             ground_use=ground_use
         )
         db.session.add(new_ground)
+        db.session.flush()
+        set_ground_materials([(new_ground.id, new_ground.materials)])
         db.session.commit()
+        invalidate_pages(f'host:{host_email}')
         flash('Ground created! Preview it before publishing.', 'success')
-        return redirect(url_for('grounds_host'))
+        return redirect(url_for('main.grounds_host'))
     return render_template('publish_ground.html')
 
-@app.route('/final-booking/<int:ground_id>', methods=['GET', 'POST'])
+# ---------------------- Player Schedule ----------------------
+
+def project_new_booking(booking, ground):
+    """Add a booking to its player's schedule (call before committing the booking)."""
+    db.session.flush()
+    db.session.add(PlayerSchedule(
+        player_email=booking.player_email, kind='booking', ref_id=booking.id,
+        ground_id=ground.id, ground_name=ground.name, ground_location=ground.location,
+        date=booking.date, start_time=booking.start_time, end_time=booking.end_time,
+        status=booking.status
+    ))
+
+def project_booking_status(booking):
+    db.session.execute(
+        update(PlayerSchedule)
+        .where(PlayerSchedule.kind == 'booking', PlayerSchedule.ref_id == booking.id)
+        .values(status=booking.status)
+        .execution_options(synchronize_session=False)
+    )
+
+def project_pool_member(match, email, ground):
+    """Add a pool membership to the player's schedule."""
+    db.session.add(PlayerSchedule(
+        player_email=email, kind='match', ref_id=match.id,
+        ground_id=ground.id, ground_name=ground.name, ground_location=ground.location,
+        date=match.date, start_time=match.time, status=match.status
+    ))
+
+def project_match_state(match):
+    """Copy a pool's status and every member's team onto their schedule rows."""
+    db.session.flush()
+    team = (
+        select(MatchPlayer.team)
+        .where(MatchPlayer.match_id == match.id, MatchPlayer.user_email == PlayerSchedule.player_email)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(PlayerSchedule)
+        .where(PlayerSchedule.kind == 'match', PlayerSchedule.ref_id == match.id)
+        .values(status=match.status, team=team)
+        .execution_options(synchronize_session=False)
+    )
+
+def get_player_schedule(email, kind=None, since=None):
+    """A player's bookings and pools, latest first, from the (player_email, date, start_time) index."""
+    query = PlayerSchedule.query.filter(PlayerSchedule.player_email == email)
+    if kind:
+        query = query.filter(PlayerSchedule.kind == kind)
+    if since:
+        query = query.filter(PlayerSchedule.date >= since)
+    return query.order_by(PlayerSchedule.date.desc(), PlayerSchedule.start_time.desc()).all()
+
+# ---------------------- Availability ----------------------
+
+# A match pool occupies its ground for two hours from its start time
+MATCH_SLOT_MINUTES = 120
+OPENING_MINUTE = 6 * 60
+CLOSING_MINUTE = 24 * 60
+# What actually holds a ground: approved bookings and matches sent to/confirmed by the host
+BLOCKING_BOOKING_STATUSES = ('approved',)
+BLOCKING_MATCH_STATUSES = ('pending_host', 'confirmed')
+
+schedule_cache = TTLCache(ttl=Config.AVAILABILITY_CACHE_SECONDS)
+
+def _load_day_schedule(ground_id, date):
+    """Busy blocks of one ground on one date, from the (ground_id, date) indexes."""
+    intervals = []
+    bookings = Booking.query.filter(
+        Booking.ground_id == ground_id, Booking.date == date,
+        Booking.status.in_(BLOCKING_BOOKING_STATUSES)
+    ).all()
+    for b in bookings:
+        intervals.append((minutes_of(b.start_time), minutes_of(b.end_time),
+                          {'kind': 'booking', 'id': b.id, 'status': b.status}))
+    matches = Match.query.filter(
+        Match.ground_id == ground_id, Match.date == date,
+        Match.status.in_(BLOCKING_MATCH_STATUSES)
+    ).all()
+    for m in matches:
+        start = minutes_of(m.time)
+        intervals.append((start, min(start + MATCH_SLOT_MINUTES, CLOSING_MINUTE),
+                          {'kind': 'match', 'id': m.id, 'status': m.status}))
+    return DaySchedule(intervals)
+
+def get_day_schedule(ground_id, date):
+    return schedule_cache.get_or_set((ground_id, date), lambda: _load_day_schedule(ground_id, date))
+
+def invalidate_day_schedule(ground_id, date):
+    schedule_cache.invalidate((ground_id, date))
+
+def _parse_booking_times(date, start_time, end_time):
+    """Validate a booking request. Returns (date, start, end) as date/time objects
+    or raises ValueError with a user message."""
+    if not date or not start_time or not end_time:
+        raise ValueError('Please provide a date, start time and end time.')
+    try:
+        day, start, end = parse_date(date), parse_time(start_time), parse_time(end_time)
+    except ValueError:
+        raise ValueError('Please enter a valid date and times.')
+    if start >= end:
+        raise ValueError('End time must be after start time.')
+    return day, start, end
+
+def _parse_slot(date, time, new_pool=False):
+    """'YYYY-MM-DD' and 'HH:MM' request values as (date, time) objects; raises ValueError.
+
+    With ``new_pool`` the time must also be one of POOL_SLOT_TIMES. Lookups
+    accept any time, since older pools exist at other times.
+    """
+    date, time = parse_date(date or ''), parse_time(time or '')
+    if new_pool and format_hhmm(time) not in POOL_SLOT_TIMES:
+        raise ValueError(f'time must be one of {", ".join(POOL_SLOT_TIMES)}')
+    return date, time
+
+def _describe_conflicts(conflicts):
+    kinds = {item['kind'] for item in conflicts}
+    if kinds == {'match'}:
+        return 'a scheduled match'
+    if kinds == {'booking'}:
+        return 'an approved booking'
+    return 'existing bookings and matches'
+
+@bp.route('/api/grounds/<int:ground_id>/availability')
+def api_ground_availability(ground_id):
+    """Busy and free time ranges of a ground on one date."""
+    try:
+        date = parse_date(request.args.get('date') or '')
+    except ValueError:
+        return {"error": "date must be YYYY-MM-DD"}, 400
+    ground = Ground.query.get_or_404(ground_id)
+    schedule = get_day_schedule(ground.id, date)
+    return {
+        "ground_id": ground.id,
+        "date": date.isoformat(),
+        "busy": [
+            {"start": format_minutes(start), "end": format_minutes(end), "items": items}
+            for start, end, items in schedule.busy()
+        ],
+        "free": [
+            {"start": format_minutes(start), "end": format_minutes(end)}
+            for start, end in schedule.free(OPENING_MINUTE, CLOSING_MINUTE)
+        ]
+    }
+
+@bp.route('/final-booking/<int:ground_id>', methods=['GET', 'POST'])
 def final_booking(ground_id):
     ground = Ground.query.get_or_404(ground_id)
     if request.method == 'POST':
@@ -613,160 +1406,534 @@ def final_booking(ground_id):
         player_email = session.get('user_email')
         if not player_email:
             flash('You must be logged in as a player to book.', 'danger')
-            return redirect(url_for('login_player'))
+            return redirect(url_for('main.login_player'))
+        try:
+            day, start, end = _parse_booking_times(date, start_time, end_time)
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return render_template('final_booking.html', ground=ground)
+        conflicts = get_day_schedule(ground.id, day).conflicts(minutes_of(start), minutes_of(end))
+        if conflicts:
+            flash(f'That time overlaps {_describe_conflicts(conflicts)}. Please pick a free slot.', 'danger')
+            return render_template('final_booking.html', ground=ground)
         # Create booking request
         booking = Booking(
             ground_id=ground.id,
             player_email=player_email,
-            date=date,
-            start_time=start_time,
-            end_time=end_time,
+            date=day,
+            start_time=start,
+            end_time=end,
             status='pending'
         )
         db.session.add(booking)
+        project_new_booking(booking, ground)
         db.session.commit()
         flash('Booking request sent to the host!', 'success')
-        return redirect(url_for('player_dashboard'))
+        return redirect(url_for('main.player_dashboard'))
     return render_template('final_booking.html', ground=ground)
 
 # ---------------------- Join Match Flow ----------------------
 
-def _balance_teams_median_based10(player_emails_with_age):
-    """Greedy median-based team balancing for exactly 10 players.
-    Steps:
-    1) Sort ascending by age
-    2) Iterate; assign current player to the team whose current median age is lower
-       (tie-break by alternating or random), while keeping size <= 5 for each team
+def _insert_match_if_missing(ground, date, time):
+    """INSERT the pool row for a slot unless another request already created it."""
+    values = dict(ground_id=ground.id, date=date, time=time, status='waiting',
+                  host_email=ground.host_email, player_count=0)
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        db.session.execute(insert(Match).values(**values).on_conflict_do_nothing())
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(Match(**values))
+    except IntegrityError:
+        pass
+
+def _form_teams(match):
+    """Split a full pool into age-balanced teams A, B, ... and hand it to the host.
+
+    Returns False (and changes nothing) if any player's age is missing.
     """
-    if len(player_emails_with_age) != 10:
-        return None, None
-
-    players_sorted = sorted(player_emails_with_age, key=lambda x: x[1])
-    team_a_emails, team_b_emails = [], []
-    team_a_ages, team_b_ages = [], []
-    toggle = 0  # tie-break alternator
-
-    def median(values):
-        if not values:
-            return None
-        n = len(values)
-        mid = n // 2
-        if n % 2 == 1:
-            return values[mid]
-        return (values[mid - 1] + values[mid]) / 2
-
-    for email, age in players_sorted:
-        # Ensure team sizes stay within 5
-        if len(team_a_emails) >= 5:
-            team_b_emails.append(email)
-            team_b_ages.append(age)
-            continue
-        if len(team_b_emails) >= 5:
-            team_a_emails.append(email)
-            team_a_ages.append(age)
-            continue
+    rows = (
+        db.session.query(MatchPlayer, User.age)
+        .outerjoin(User, User.email == MatchPlayer.user_email)
+        .filter(MatchPlayer.match_id == match.id)
+        .all()
+    )
+    if any(age is None for _, age in rows):
+        return False
+    teams = balance_teams([(mp.user_email, age) for mp, age in rows], team_count=match_team_count(),
+                          time_budget=current_app.config['TEAM_BALANCE_TIME_BUDGET'])
+    team_of = {email: TEAM_LABELS[i] for i, members in enumerate(teams) for email in members}
+    for mp, _ in rows:
+        mp.team = team_of[mp.user_email]
+    match.status = 'pending_host'
+    return True
 
-        med_a = median(team_a_ages)
-        med_b = median(team_b_ages)
-        if med_a is None and med_b is None:
-            # Seed teams: put first on A, second on B
-            if toggle % 2 == 0:
-                team_a_emails.append(email); team_a_ages.append(age)
-            else:
-                team_b_emails.append(email); team_b_ages.append(age)
-            toggle += 1
-            continue
-        if med_a is None:
-            team_a_emails.append(email); team_a_ages.append(age)
-            continue
-        if med_b is None:
-            team_b_emails.append(email); team_b_ages.append(age)
-            continue
+def join_pool(ground, date, time, email):
+    """Add a player to the ground/date/time pool in a single transaction.
 
-        if med_a < med_b:
-            team_a_emails.append(email); team_a_ages.append(age)
-        elif med_b < med_a:
-            team_b_emails.append(email); team_b_ages.append(age)
-        else:
-            # Equal medians: alternate
-            if toggle % 2 == 0:
-                team_a_emails.append(email); team_a_ages.append(age)
-            else:
-                team_b_emails.append(email); team_b_ages.append(age)
-            toggle += 1
+    Capacity is enforced by the database: the seat is claimed with a
+    conditional ``UPDATE ... SET player_count = player_count + 1 WHERE
+    status = 'waiting' AND player_count < capacity``, so concurrent workers
+    cannot overfill a pool. Only the request that claims the last seat queues
+    the form_teams job, in the same transaction, so teams are formed exactly
+    once and off the request path. The unique indexes stop duplicate pools
+    and duplicate memberships.
 
-    return team_a_emails, team_b_emails
+    Returns (match, outcome) where outcome is one of 'joined', 'teams_queued'
+    (the last seat: teams are being formed), 'already_joined', 'full' or 'closed'.
+    """
+    try:
+        _insert_match_if_missing(ground, date, time)
+        match = Match.query.filter_by(ground_id=ground.id, date=date, time=time).one()
+        if MatchPlayer.query.filter_by(match_id=match.id, user_email=email).first():
+            db.session.rollback()
+            return match, 'already_joined'
+        claimed = db.session.execute(
+            update(Match)
+            .where(Match.id == match.id, Match.status == 'waiting', Match.player_count < match_capacity())
+            .values(player_count=Match.player_count + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            return match, ('full' if match.status == 'waiting' else 'closed')
+        db.session.add(MatchPlayer(match_id=match.id, user_email=email))
+        project_pool_member(match, email, ground)
+        db.session.flush()
+        db.session.refresh(match)
+        outcome = 'joined'
+        if match.player_count == match_capacity():
+            outcome = 'teams_queued'
+            enqueue_job('form_teams', {'match_id': match.id}, key=f'form_teams:{match.id}')
+        db.session.commit()
+    except IntegrityError:
+        # Same player racing themselves into the pool: the unique index said no
+        db.session.rollback()
+        match = Match.query.filter_by(ground_id=ground.id, date=date, time=time).first()
+        return match, 'already_joined'
+    # This process's caches and stream subscribers; a job may run in another process
+    invalidate_lobby_feed()
+    publish_pool_update(match)
+    if outcome == 'teams_queued':
+        wake_job_workers()
+    return match, outcome
 
-@app.route('/join_match/<int:ground_id>', methods=['POST'])
+@bp.route('/join_match/<int:ground_id>', methods=['POST'])
 def join_match(ground_id):
     if 'user_email' not in session or session.get('user_type') != 'player':
         flash('You must be logged in as a player to join a match.', 'danger')
-        return redirect(url_for('login_player'))
-    date = request.form.get('date')
-    time = request.form.get('time')
-    if not date or not time:
+        return redirect(url_for('main.login_player'))
+    if not request.form.get('date') or not request.form.get('time'):
         flash('Please provide both date and time.', 'danger')
-        return redirect(url_for('grounds'))
+        return redirect(url_for('main.grounds'))
+    try:
+        date, time = _parse_slot(request.form['date'], request.form['time'], new_pool=True)
+    except ValueError:
+        flash('Please pick a valid date and time.', 'danger')
+        return redirect(url_for('main.grounds'))
     ground = Ground.query.get_or_404(ground_id)
     player = get_or_create_user_from_session()
     if player is None or player.age is None:
         flash('Your profile age is missing. Please update your age.', 'danger')
-        return redirect(url_for('grounds'))
-    match = Match.query.filter_by(ground_id=ground.id, date=date, time=time).first()
-    if match is None:
-        match = Match(ground_id=ground.id, date=date, time=time, status='waiting', host_email=ground.host_email)
-        db.session.add(match)
-        db.session.commit()
-    if match.status in ['pending_host', 'confirmed']:
-        flash('This match is already under review or confirmed. Try another slot.', 'danger')
-        return redirect(url_for('grounds'))
-    existing = MatchPlayer.query.filter_by(match_id=match.id, user_email=player.email).first()
-    if existing:
-        flash('You are already in this match pool.', 'success')
-        return redirect(url_for('grounds'))
-    current_count = MatchPlayer.query.filter_by(match_id=match.id).count()
-    if current_count >= 10:
+        return redirect(url_for('main.grounds'))
+    # Don't gather a pool for a slot the host has already given to a booking
+    slot_start = minutes_of(time)
+    booked = [c for c in get_day_schedule(ground.id, date).conflicts(slot_start, slot_start + MATCH_SLOT_MINUTES)
+              if c['kind'] == 'booking']
+    if booked:
+        flash('This slot is already booked. Try another slot.', 'danger')
+        return redirect(url_for('main.grounds'))
+    match, outcome = join_pool(ground, date, time, player.email)
+    if outcome in ('closed', 'full') and date < dt.date.today():
+        # Nothing left to place them in: the matchmaking window must not be in the past either
         flash('This match pool is full.', 'danger')
-        return redirect(url_for('grounds'))
-    db.session.add(MatchPlayer(match_id=match.id, user_email=player.email))
-    db.session.commit()
-    current_players = MatchPlayer.query.filter_by(match_id=match.id).all()
-    if len(current_players) == 10:
-        emails = [mp.user_email for mp in current_players]
-        users = {u.email: u for u in User.query.filter(User.email.in_(emails)).all()}
-        if any((users.get(e) is None) or (users[e].age is None) for e in emails):
-            flash('One or more players missing age; cannot form teams yet.', 'danger')
-            return redirect(url_for('grounds'))
-        players_with_ages = [(e, users[e].age) for e in emails]
-        team_a_emails, team_b_emails = _balance_teams_median_based10(players_with_ages)
-        if not team_a_emails or not team_b_emails:
-            flash('Could not form teams. Please try again.', 'danger')
-            return redirect(url_for('grounds'))
-        for mp in current_players:
-            mp.team = 'A' if mp.user_email in team_a_emails else 'B'
-        match.status = 'pending_host'
+    elif outcome in ('closed', 'full'):
+        # Queue the player for the best open pool nearby on the same day instead
+        enqueue_match_request(player.email, date, date, ground.ground_use, ground,
+                              current_app.config['MATCHMAKING_DEFAULT_DISTANCE_KM'])
+        reason = 'full' if outcome == 'full' else 'already under review or confirmed'
+        flash(f'This match pool is {reason}. We have queued you for the best open pool nearby '
+              f'on {date.isoformat()}; it will show on your dashboard.', 'success')
+    elif outcome == 'already_joined':
+        flash('You are already in this match pool.', 'success')
+    elif outcome == 'teams_queued':
+        flash('Pool complete! Teams are being formed and sent to the host for approval.', 'success')
+    else:
+        flash(f'Joined match pool. Waiting for {match_capacity() - match.player_count} more players.', 'success')
+    return redirect(url_for('main.grounds'))
+
+# ---------------------- Background Jobs ----------------------
+# Durable work that doesn't have to finish before the response: it is queued
+# in the job table inside the same transaction as the change that needs it,
+# and run by a pool of worker threads in every process (or `flask --app app
+# run-jobs`). Handlers make their database changes without committing;
+# run_jobs commits them together with the job's 'done' status, and retries
+# failures with backoff up to max_attempts. Handlers must be safe to run twice.
+#
+# A job runs in whichever process claims it, so in-process effects (caches,
+# live updates) stay with the request that made the change. A handler may
+# return a function to run after its commit for those effects, but they only
+# reach the process running the job (and the shared 'disk' response cache).
+
+JOB_HANDLERS = {}
+job_workers = None
+
+def job_handler(kind):
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+def enqueue_job(kind, payload, key=None, delay=0):
+    """Add a job to the current transaction; does nothing if ``key`` was already used."""
+    now = dt.datetime.now()
+    values = dict(kind=kind, payload=json.dumps(payload), idempotency_key=key, status='queued', attempts=0,
+                  max_attempts=current_app.config['JOB_MAX_ATTEMPTS'], run_after=now + dt.timedelta(seconds=delay),
+                  created_at=now, updated_at=now)
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert_job = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        db.session.execute(insert_job(Job).values(**values).on_conflict_do_nothing())
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(Job(**values))
+    except IntegrityError:
+        pass
+
+def wake_job_workers():
+    """Call after committing new jobs so an idle worker picks them up now rather than at its next poll."""
+    if job_workers is not None:
+        job_workers.wake()
+
+def run_jobs(limit=None):
+    """Run the jobs that are due, oldest first. Returns how many were attempted.
+
+    A job is claimed with a conditional UPDATE that takes a lease on it, so
+    workers in several processes can share the table; a job whose worker died
+    is picked up again once its lease runs out.
+    """
+    config = current_app.config
+    now = dt.datetime.now()
+    due = or_(and_(Job.status == 'queued', Job.run_after <= now), and_(Job.status == 'running', Job.locked_until < now))
+    ids = db.session.scalars(select(Job.id).where(due).order_by(Job.run_after, Job.id)
+                             .limit(limit or config['JOB_BATCH_SIZE'])).all()
+    attempted = 0
+    for job_id in ids:
+        now = dt.datetime.now()
+        claimed = db.session.execute(
+            update(Job).where(Job.id == job_id, or_(and_(Job.status == 'queued', Job.run_after <= now),
+                                                    and_(Job.status == 'running', Job.locked_until < now)))
+            .values(status='running', attempts=Job.attempts + 1, updated_at=now,
+                    locked_until=now + dt.timedelta(seconds=config['JOB_LEASE_SECONDS']))
+        ).rowcount
         db.session.commit()
-        flash('Teams formed and sent to host for approval!', 'success')
+        if not claimed:
+            continue
+        attempted += 1
+        job = db.session.get(Job, job_id)
+        try:
+            after_commit = JOB_HANDLERS[job.kind](**json.loads(job.payload))
+            job.status, job.locked_until, job.updated_at = 'done', None, dt.datetime.now()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception('Job %s (%s) failed', job_id, job.kind)
+            job = db.session.get(Job, job_id)
+            job.last_error = f'{type(e).__name__}: {e}'
+            job.locked_until, job.updated_at = None, dt.datetime.now()
+            if job.attempts >= job.max_attempts:
+                job.status = 'failed'
+            else:
+                job.status = 'queued'
+                job.run_after = dt.datetime.now() + dt.timedelta(seconds=retry_delay(job.attempts))
+            db.session.commit()
+            continue
+        if after_commit is not None:
+            try:
+                after_commit()
+            except Exception:
+                current_app.logger.exception('Job %s (%s): after-commit step failed', job_id, job.kind)
+    return attempted
+
+@job_handler('form_teams')
+def _form_teams_job(match_id):
+    match = db.session.get(Match, match_id)
+    if match is None or match.status != 'waiting' or match.player_count < match_capacity():
+        return  # already formed, or the pool changed since
+    if not _form_teams(match):
+        # Not retried: a player has no age, and only they can fix that
+        current_app.logger.warning('Pool %s is full but a player has no age; teams not formed', match_id)
+        return
+    project_match_state(match)
+    enqueue_job('notify_host', {'match_id': match_id}, key=f'notify_host:{match_id}')
+
+    def refresh():
+        invalidate_lobby_feed()
+        invalidate_day_schedule(match.ground_id, match.date)
+        publish_pool_update(match)
+    return refresh
+
+@job_handler('notify_host')
+def _notify_host_job(match_id):
+    match = db.session.get(Match, match_id)
+    if match is None:
+        return
+    # No mail/SMS channel yet: the host sees the pool on their dashboard
+    current_app.logger.info('Pool %s on %s %s is ready for host %s to approve',
+                            match_id, match.date, format_hhmm(match.time), match.host_email)
+    host_email = match.host_email
+    return lambda: invalidate_pages(f'host:{host_email}')
+
+@bp.before_app_request
+def _ensure_job_workers():
+    # Like the matchmaking worker: started by the first request, never under TESTING
+    global job_workers
+    if job_workers is not None or not current_app.config['JOB_WORKERS'] or current_app.testing:
+        return
+    app = current_app._get_current_object()
+
+    def run_pass():
+        with app.app_context():
+            # Keep going while there is a backlog
+            while run_jobs():
+                pass
+
+    job_workers = WorkerPool(run_pass, app.config['JOB_WORKERS'], app.config['JOB_POLL_SECONDS'], name='jobs')
+    job_workers.start()
+
+# ---------------------- Matchmaking Queue ----------------------
+# Players who can't get into the pool they wanted are queued and placed by a
+# background worker (ranking rules in matchmaking.py). Every placement goes
+# through join_pool, so capacity and team formation work as for a click.
+
+matchmaking_worker = None
+
+def enqueue_match_request(email, date_from, date_to, sport, origin_ground, max_distance_km,
+                          latitude=None, longitude=None):
+    """Queue (or re-queue with new criteria) the player's open request and wake the worker."""
+    req = (MatchRequest.query
+           .filter(MatchRequest.player_email == email, MatchRequest.status.in_(('queued', 'placing')))
+           .first()) or MatchRequest(player_email=email)
+    if origin_ground is not None:
+        latitude, longitude = origin_ground.latitude, origin_ground.longitude
+    req.date_from, req.date_to = date_from, date_to
+    req.sport = (sport or '').strip().lower() or None
+    req.origin_ground_id = origin_ground.id if origin_ground is not None else None
+    req.latitude, req.longitude = latitude, longitude
+    req.max_distance_km = max_distance_km
+    req.status, req.match_id, req.updated_at = 'queued', None, dt.datetime.now()
+    db.session.add(req)
+    db.session.commit()
+    if matchmaking_worker is not None:
+        matchmaking_worker.wake()
+    return req
+
+def _matchmaking_grounds(req):
+    """[(distance_km, ground)] of published grounds that fit the request, nearest first."""
+    if req.latitude is not None and req.longitude is not None:
+        _ensure_ground_index()
+        hits = ground_index.nearest(req.latitude, req.longitude, req.max_distance_km,
+                                    current_app.config['MATCHMAKING_MAX_GROUNDS'])
+        distances = {ground_id: dist for dist, ground_id, _, _ in hits}
     else:
-        flash(f'Joined match pool. Waiting for {10 - len(current_players)} more players.', 'success')
-    return redirect(url_for('grounds'))
+        # No coordinates to measure from: only the ground they asked for
+        distances = {req.origin_ground_id: 0.0} if req.origin_ground_id else {}
+    grounds = _grounds_by_ids(list(distances))
+    fits = [(distances[gid], g) for gid, g in grounds.items()
+            if g.published and (req.sport is None or (g.ground_use or '').lower() == req.sport)]
+    return sorted(fits, key=lambda item: (item[0], item[1].id))
 
-@app.route('/api/match_pool/<int:ground_id>')
-def api_match_pool_by_ground(ground_id):
+def place_match_request(req):
+    """Put the request's player into the best pool that fits; returns the Match, or None for now."""
+    now = dt.datetime.now()
+    start = max(req.date_from, now.date())
+    grounds = _matchmaking_grounds(req)
+    if start > req.date_to or not grounds:
+        return None
+    by_id = {g.id: g for _, g in grounds}
+    distance = {g.id: d for d, g in grounds}
+    in_window = (Match.ground_id.in_(list(by_id)), Match.date >= start, Match.date <= req.date_to)
+    # Slots the player already has a pool in, on any ground
+    busy = {(item.date, item.start_time) for item in get_player_schedule(req.player_email, kind='match', since=start)}
+
+    def upcoming(day, time):
+        return (day, time) not in busy and (day > now.date() or time > now.time())
+
+    def placed(ground, day, time):
+        match, outcome = join_pool(ground, day, time, req.player_email)
+        return match if outcome in ('joined', 'teams_queued') else None
+
+    rows = db.session.query(Match.ground_id, Match.date, Match.time, Match.status, Match.player_count).filter(*in_window).all()
+    open_pools = rank_open_pools([(count, distance[gid], day, time, gid) for gid, day, time, status, count in rows
+                                  if status == 'waiting' and count < match_capacity() and upcoming(day, time)])
+    for _, _, day, time, ground_id in open_pools:
+        match = placed(by_id[ground_id], day, time)
+        if match is not None:
+            return match
+
+    # Nothing open: start a pool in the nearest ground's earliest free slot
+    def is_free(ground, day, time):
+        slot_start = minutes_of(time)
+        return upcoming(day, time) and not [c for c in get_day_schedule(ground.id, day).conflicts(
+            slot_start, slot_start + MATCH_SLOT_MINUTES) if c['kind'] == 'booking']
+
+    days = [start + dt.timedelta(days=n) for n in range((req.date_to - start).days + 1)]
+    slot_times = [parse_time(t) for t in POOL_SLOT_TIMES]
+    taken = {(gid, day, time) for gid, day, time, _, _ in rows}
+    for _, ground, day, time in free_slots(grounds, days, slot_times, taken, is_free):
+        match = placed(ground, day, time)
+        if match is not None:
+            return match
+    return None
+
+def run_matchmaking(limit=None):
+    """One pass over the queue, least recently tried first. Returns {'placed', 'waiting', 'expired'}.
+
+    Requests are claimed with a conditional UPDATE, so several workers can
+    share a queue without placing a player twice.
+    """
+    limit = limit or current_app.config['MATCHMAKING_BATCH_SIZE']
+    now = dt.datetime.now()
+    # Windows that have passed, players with no age (queued before it was required),
+    # and claims left behind by a worker that died
+    with_age = select(User.email).where(User.age.isnot(None))
+    expired = db.session.execute(
+        update(MatchRequest)
+        .where(MatchRequest.status == 'queued',
+               or_(MatchRequest.date_to < now.date(), MatchRequest.player_email.not_in(with_age)))
+        .values(status='expired', updated_at=now)
+    ).rowcount
+    db.session.execute(
+        update(MatchRequest)
+        .where(MatchRequest.status == 'placing', MatchRequest.updated_at < now - dt.timedelta(minutes=5))
+        .values(status='queued')
+    )
+    db.session.commit()
+    ids = db.session.scalars(select(MatchRequest.id).where(MatchRequest.status == 'queued')
+                             .order_by(MatchRequest.updated_at, MatchRequest.id).limit(limit)).all()
+    placed = waiting = 0
+    for request_id in ids:
+        claimed = db.session.execute(
+            update(MatchRequest).where(MatchRequest.id == request_id, MatchRequest.status == 'queued')
+            .values(status='placing', updated_at=dt.datetime.now())
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            continue
+        req = db.session.get(MatchRequest, request_id)
+        try:
+            match = place_match_request(req)
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Matchmaking failed for request %s', request_id)
+            match = None
+        req = db.session.get(MatchRequest, request_id)
+        req.status = 'placed' if match else 'queued'
+        req.match_id = match.id if match else None
+        req.updated_at = dt.datetime.now()
+        db.session.commit()
+        if match:
+            placed += 1
+        else:
+            waiting += 1
+    return {'placed': placed, 'waiting': waiting, 'expired': expired}
+
+@bp.before_app_request
+def _ensure_matchmaking_worker():
+    # Started by the first request rather than create_app, so CLI commands and
+    # scripts that build an app don't spawn one
+    global matchmaking_worker
+    if matchmaking_worker is not None or not current_app.config['MATCHMAKING_WORKER'] or current_app.testing:
+        return
+    app = current_app._get_current_object()
+
+    def run_pass():
+        with app.app_context():
+            run_matchmaking()
+
+    matchmaking_worker = PeriodicWorker(run_pass, app.config['MATCHMAKING_INTERVAL_SECONDS'], name='matchmaking')
+    matchmaking_worker.start()
+
+def _match_request_to_dict(req):
+    return {
+        'id': req.id,
+        'status': req.status,
+        'date_from': req.date_from.isoformat(),
+        'date_to': req.date_to.isoformat(),
+        'sport': req.sport,
+        'max_distance_km': req.max_distance_km,
+        'match_id': req.match_id,
+    }
+
+@bp.route('/matchmaking', methods=['POST'])
+def matchmaking_queue():
+    """Queue for any pool within max_distance_km of a ground (or latitude/longitude) in a date window."""
+    if 'user_email' not in session or session.get('user_type') != 'player':
+        flash('You must be logged in as a player to join a match.', 'danger')
+        return redirect(url_for('main.login_player'))
+    config = current_app.config
+    try:
+        date_from = parse_date(request.form.get('date_from') or '')
+        date_to = parse_date(request.form.get('date_to') or request.form['date_from'])
+        max_distance = float(request.form.get('max_distance_km') or config['MATCHMAKING_DEFAULT_DISTANCE_KM'])
+        origin = db.session.get(Ground, int(request.form['ground_id'])) if request.form.get('ground_id') else None
+        lat, lng = (None, None)
+        if origin is None:
+            lat, lng = parse_coordinates(request.form.get('latitude'), request.form.get('longitude'))
+    except (KeyError, ValueError):
+        flash('Pick a date window and a ground (or your location) to be matched.', 'danger')
+        return redirect(url_for('main.grounds'))
+    if date_to < max(date_from, dt.date.today()) or (date_to - date_from).days >= config['MATCHMAKING_MAX_WINDOW_DAYS']:
+        flash(f'Pick a future window of at most {config["MATCHMAKING_MAX_WINDOW_DAYS"]} days.', 'danger')
+        return redirect(url_for('main.grounds'))
+    max_distance = max(0.0, min(max_distance, config['MATCHMAKING_MAX_DISTANCE_KM']))
+    # Teams are balanced by age, so a pool with an ageless player could never form them
+    player = get_or_create_user_from_session()
+    if player is None or player.age is None:
+        flash('Your profile age is missing. Please update your age.', 'danger')
+        return redirect(url_for('main.grounds'))
+    enqueue_match_request(session['user_email'], date_from, date_to, request.form.get('sport'), origin,
+                          max_distance, lat, lng)
+    flash('You are in the matchmaking queue. Your pool will show on your dashboard.', 'success')
+    return redirect(url_for('main.grounds'))
+
+@bp.route('/api/matchmaking')
+def api_matchmaking():
+    """The player's latest matchmaking request, for polling."""
     if 'user_email' not in session or session.get('user_type') != 'player':
         return {"error": "unauthorized"}, 401
-    date = request.args.get('date')
-    time = request.args.get('time')
-    if not date or not time:
-        return {"error": "missing date/time"}, 400
-    ground = Ground.query.get_or_404(ground_id)
-    match = Match.query.filter_by(ground_id=ground.id, date=date, time=time).first()
+    req = (MatchRequest.query.filter_by(player_email=session['user_email'])
+           .order_by(MatchRequest.id.desc()).first())
+    return {"request": _match_request_to_dict(req) if req else None}
+
+@bp.route('/matchmaking/cancel', methods=['POST'])
+def matchmaking_cancel():
+    if 'user_email' not in session or session.get('user_type') != 'player':
+        return redirect(url_for('main.login_player'))
+    db.session.execute(
+        update(MatchRequest)
+        .where(MatchRequest.player_email == session['user_email'], MatchRequest.status == 'queued')
+        .values(status='cancelled', updated_at=dt.datetime.now())
+    )
+    db.session.commit()
+    flash('You have left the matchmaking queue.', 'success')
+    return redirect(url_for('main.grounds'))
+
+# ---------------------- Match Pool Snapshots & Live Updates ----------------------
+
+# Open /stream connections subscribe here, keyed by (ground_id, date, time)
+pool_hub = PubSubHub()
+
+def _match_pool_snapshot(match):
+    """JSON-ready view of a pool and its players (an empty pool if match is None)."""
     if match is None:
-        # Return empty pool snapshot
         return {
             "match_id": None,
             "status": "waiting",
-            "capacity": 10,
+            "capacity": match_capacity(),
             "count": 0,
             "players": []
         }
@@ -786,262 +1953,668 @@ def api_match_pool_by_ground(ground_id):
     return {
         "match_id": match.id,
         "status": match.status,
-        "capacity": 10,
+        "capacity": match_capacity(),
         "count": len(players),
         "players": players
     }
 
-@app.route('/match/<int:match_id>/accept', methods=['POST'])
+def publish_pool_update(match):
+    """Push the pool's new state to every client streaming this slot."""
+    topic = (match.ground_id, match.date, match.time)
+    # Skip the snapshot queries entirely when nobody is watching
+    if pool_hub.has_subscribers(topic):
+        pool_hub.publish(topic, _match_pool_snapshot(match))
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@bp.route('/api/match_pool/<int:ground_id>')
+@rate_limited('match_pool')
+def api_match_pool_by_ground(ground_id):
+    if 'user_email' not in session or session.get('user_type') != 'player':
+        return {"error": "unauthorized"}, 401
+    if not request.args.get('date') or not request.args.get('time'):
+        return {"error": "missing date/time"}, 400
+    try:
+        date, time = _parse_slot(request.args['date'], request.args['time'])
+    except ValueError:
+        return {"error": "date must be YYYY-MM-DD and time HH:MM"}, 400
+    ground = Ground.query.get_or_404(ground_id)
+    match = Match.query.filter_by(ground_id=ground.id, date=date, time=time).first()
+    return _match_pool_snapshot(match)
+
+def _pool_occupancy(ground_ids, date):
+    """Fill level, status and team split of every slot for many grounds on one date.
+
+    One grouped query over the (ground_id, date, time) index; slots with no
+    Match row are reported as empty waiting pools; pools at a time outside
+    POOL_SLOT_TIMES (from before slots were fixed) get an entry of their own.
+    ``teams`` counts every team of the match format; team_a/team_b are kept
+    for older clients.
+    """
+    rows = (
+        db.session.query(Match.ground_id, Match.time, Match.id, Match.status, MatchPlayer.team,
+                         func.count(MatchPlayer.id))
+        .outerjoin(MatchPlayer, MatchPlayer.match_id == Match.id)
+        .filter(Match.ground_id.in_(ground_ids), Match.date == date)
+        .group_by(Match.id, MatchPlayer.team)
+        .all()
+    )
+
+    def slot(match_id=None, status='waiting'):
+        return {"match_id": match_id, "status": status, "count": 0, "team_a": 0, "team_b": 0,
+                "teams": {label: 0 for label in TEAM_LABELS[:match_team_count()]}}
+
+    grid = {gid: {t: slot() for t in POOL_SLOT_TIMES} for gid in ground_ids}
+    for ground_id, time, match_id, status, team, count in rows:
+        key = format_hhmm(time)
+        entry = grid[ground_id].setdefault(key, slot())
+        if entry["match_id"] != match_id:
+            entry = grid[ground_id][key] = slot(match_id, status)
+        entry["count"] += count
+        if team:
+            entry["teams"][team] = entry["teams"].get(team, 0) + count
+    for slots in grid.values():
+        for entry in slots.values():
+            entry["team_a"], entry["team_b"] = entry["teams"].get('A', 0), entry["teams"].get('B', 0)
+    return grid
+
+@bp.route('/api/match_pools')
+def api_match_pools():
+    """Occupancy grid for many grounds and all slots of a day in one request."""
+    raw_ids = request.args.get('ground_ids', '')
+    if not request.args.get('date') or not raw_ids:
+        return {"error": "missing ground_ids/date"}, 400
+    try:
+        date = parse_date(request.args['date'])
+    except ValueError:
+        return {"error": "date must be YYYY-MM-DD"}, 400
+    try:
+        ground_ids = sorted({int(x) for x in raw_ids.split(',') if x.strip()})
+    except ValueError:
+        return {"error": "ground_ids must be comma-separated integers"}, 400
+    if len(ground_ids) > MAX_POOL_BATCH_GROUNDS:
+        return {"error": f"at most {MAX_POOL_BATCH_GROUNDS} grounds per request"}, 400
+    grid = _pool_occupancy(ground_ids, date)
+    return {
+        "date": date.isoformat(),
+        "capacity": match_capacity(),
+        "slots": POOL_SLOT_TIMES,
+        "grounds": {str(gid): slots for gid, slots in grid.items()}
+    }
+
+@bp.route('/api/matches')
+def api_matches():
+    """Match pools in a date range: ?from=YYYY-MM-DD&to=YYYY-MM-DD[&ground_id=N].
+
+    Both ends are inclusive and default to today and six days later (this
+    week). A range scan over uq_match_ground_slot with a ground_id, or over
+    ix_match_date_time without one.
+    """
+    today = dt.date.today()
+    try:
+        start = parse_date(request.args['from']) if request.args.get('from') else today
+        end = parse_date(request.args['to']) if request.args.get('to') else start + dt.timedelta(days=6)
+    except ValueError:
+        return {"error": "from/to must be YYYY-MM-DD"}, 400
+    if end < start:
+        return {"error": "to must not be before from"}, 400
+    if (end - start).days >= MAX_MATCH_RANGE_DAYS:
+        return {"error": f"at most {MAX_MATCH_RANGE_DAYS} days per request"}, 400
+    query = Match.query.filter(Match.date >= start, Match.date <= end)
+    ground_id = request.args.get('ground_id', type=int)
+    if ground_id is not None:
+        query = query.filter(Match.ground_id == ground_id)
+    matches = query.order_by(Match.date, Match.time, Match.ground_id).all()
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "capacity": match_capacity(),
+        "matches": [
+            {
+                "id": m.id,
+                "ground_id": m.ground_id,
+                "date": m.date.isoformat(),
+                "time": format_hhmm(m.time),
+                "status": m.status,
+                "count": m.player_count
+            }
+            for m in matches
+        ]
+    }
+
+@bp.route('/api/match_pool/<int:ground_id>/stream')
+def api_match_pool_stream(ground_id):
+    """Server-Sent Events: the current pool, then a new 'pool' event on every change."""
+    if 'user_email' not in session or session.get('user_type') != 'player':
+        return {"error": "unauthorized"}, 401
+    if not request.args.get('date') or not request.args.get('time'):
+        return {"error": "missing date/time"}, 400
+    try:
+        date, time = _parse_slot(request.args['date'], request.args['time'])
+    except ValueError:
+        return {"error": "date must be YYYY-MM-DD and time HH:MM"}, 400
+    ground = Ground.query.get_or_404(ground_id)
+    # Subscribe before reading so no update between the read and the stream is lost
+    sub = pool_hub.subscribe((ground.id, date, time))
+    match = Match.query.filter_by(ground_id=ground.id, date=date, time=time).first()
+    initial = _match_pool_snapshot(match)
+    keepalive = current_app.config['POOL_STREAM_KEEPALIVE_SECONDS']
+
+    def stream():
+        yield _sse_event('pool', initial)
+        while True:
+            message = sub.get(timeout=keepalive)
+            if message is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+            else:
+                yield _sse_event('pool', message)
+
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(sub.close)
+    return response
+
+@bp.route('/match/<int:match_id>/accept', methods=['POST'])
 def accept_match(match_id):
     match = Match.query.get_or_404(match_id)
     ground = Ground.query.get(match.ground_id)
     if session.get('user_email') != ground.host_email or session.get('user_type') != 'host':
         flash('You do not have permission to accept this match.', 'danger')
-        return redirect(url_for('host_dashboard'))
+        return redirect(url_for('main.host_dashboard'))
+    start = minutes_of(match.time)
+    end = min(start + MATCH_SLOT_MINUTES, CLOSING_MINUTE)
+    # A waiting pool doesn't hold the ground, so a booking may have been approved
+    # over it since; lock the ground as approve_booking does and check again
+    Ground.query.filter_by(id=ground.id).with_for_update().one()
     match.status = 'confirmed'
+    db.session.flush()
+    conflicts = _load_day_schedule(ground.id, match.date).conflicts(start, end)
+    conflicts = [c for c in conflicts if c['kind'] == 'booking' or (c['id'] != match.id and c['status'] == 'confirmed')]
+    if conflicts:
+        db.session.rollback()
+        flash(f'Cannot confirm: this match overlaps {_describe_conflicts(conflicts)}.', 'danger')
+        return redirect(url_for('main.host_dashboard'))
+    project_match_state(match)
     db.session.commit()
+    invalidate_lobby_feed()
+    invalidate_day_schedule(match.ground_id, match.date)
+    publish_pool_update(match)
     flash('Match confirmed.', 'success')
-    return redirect(url_for('host_dashboard'))
+    return redirect(url_for('main.host_dashboard'))
 
-@app.route('/match/<int:match_id>/decline', methods=['POST'])
+@bp.route('/match/<int:match_id>/decline', methods=['POST'])
 def decline_match(match_id):
     match = Match.query.get_or_404(match_id)
     ground = Ground.query.get(match.ground_id)
     if session.get('user_email') != ground.host_email or session.get('user_type') != 'host':
         flash('You do not have permission to decline this match.', 'danger')
-        return redirect(url_for('host_dashboard'))
+        return redirect(url_for('main.host_dashboard'))
     match.status = 'waiting'  # keep pool, allow later approval
+    project_match_state(match)
     db.session.commit()
+    invalidate_lobby_feed()
+    invalidate_day_schedule(match.ground_id, match.date)
+    publish_pool_update(match)
     flash('Match declined. Players remain in the waiting pool.', 'success')
-    return redirect(url_for('host_dashboard'))
+    return redirect(url_for('main.host_dashboard'))
 
 # ---------------------- Dev/Test Utilities (debug only) ----------------------
-@app.route('/dev/fill_match/<int:ground_id>', methods=['POST', 'GET'])
+@bp.route('/dev/fill_match/<int:ground_id>', methods=['POST', 'GET'])
 def dev_fill_match(ground_id):
     # Guard for debug mode only
-    if not app.debug:
+    if not current_app.debug:
         flash('Dev utility is only available in debug mode.', 'danger')
-        return redirect(url_for('grounds'))
-    date = request.values.get('date')
-    time = request.values.get('time')
-    if not date or not time:
-        flash('Provide date and time parameters.', 'danger')
-        return redirect(url_for('grounds'))
+        return redirect(url_for('main.grounds'))
+    try:
+        date, time = _parse_slot(request.values.get('date'), request.values.get('time'), new_pool=True)
+    except ValueError:
+        flash(f'Provide date (YYYY-MM-DD) and time ({", ".join(POOL_SLOT_TIMES)}) parameters.', 'danger')
+        return redirect(url_for('main.grounds'))
     ground = Ground.query.get_or_404(ground_id)
     match = Match.query.filter_by(ground_id=ground.id, date=date, time=time).first()
-    if match is None:
-        match = Match(ground_id=ground.id, date=date, time=time, status='waiting', host_email=ground.host_email)
-        db.session.add(match)
-        db.session.commit()
-    current_players = MatchPlayer.query.filter_by(match_id=match.id).all()
-    remaining = 10 - len(current_players)
+    remaining = match_capacity() - (match.player_count if match else 0)
     # Optional count parameter to add a specific number of bots (for incremental testing)
     try:
         count_param = int(request.values.get('count', remaining))
     except Exception:
         count_param = remaining
     add_n = max(0, min(remaining, count_param))
+    outcome = None
     for i in range(add_n):
-        email = f"bot{random.randint(100000,999999)}_{ground.id}_{date}_{time}@example.com"
-        user = User.query.filter_by(email=email).first()
-        if not user:
-            user = User(email=email, name=f"Bot {i}", age=random.randint(16, 45), user_type='player', profile_image_url='https://via.placeholder.com/40')
-            db.session.add(user)
+        email = f"bot{random.randint(100000,999999)}_{ground.id}_{date}_{format_hhmm(time)}@example.com"
+        if not User.query.filter_by(email=email).first():
+            db.session.add(User(email=email, name=f"Bot {i}", age=random.randint(16, 45), user_type='player', profile_image_url='https://via.placeholder.com/40'))
             db.session.commit()
-        if not MatchPlayer.query.filter_by(match_id=match.id, user_email=email).first():
-            db.session.add(MatchPlayer(match_id=match.id, user_email=email))
-    db.session.commit()
-    # If full, assign teams and mark pending_host
-    current_players = MatchPlayer.query.filter_by(match_id=match.id).all()
-    if len(current_players) == 10:
-        emails = [mp.user_email for mp in current_players]
-        users = {u.email: u for u in User.query.filter(User.email.in_(emails)).all()}
-        players_with_ages = [(e, users[e].age) for e in emails]
-        team_a_emails, team_b_emails = _balance_teams_median_based10(players_with_ages)
-        if team_a_emails and team_b_emails:
-            for mp in current_players:
-                mp.team = 'A' if mp.user_email in team_a_emails else 'B'
-            match.status = 'pending_host'
-            db.session.commit()
-            flash('Filled match with bots and sent to host for approval.', 'success')
-        else:
-            flash('Could not assign teams.', 'danger')
+        # Bots go through the same atomic join as real players
+        match, outcome = join_pool(ground, date, time, email)
+        if outcome in ('full', 'closed'):
+            break
+    if outcome == 'teams_queued':
+        flash('Filled match with bots; teams are being formed for host approval.', 'success')
+    elif add_n == 0 or outcome in ('full', 'closed'):
+        flash('This match pool is already full or closed.', 'danger')
     else:
-        flash('Added bots to the pool. Not yet at 10.', 'success')
-    return redirect(url_for('grounds'))
+        flash(f'Added bots to the pool. Not yet at {match_capacity()}.', 'success')
+    return redirect(url_for('main.grounds'))
 
-@app.route('/dev/ensure_tables')
+@bp.route('/dev/ensure_tables')
 def dev_ensure_tables():
-    if not app.debug:
+    if not current_app.debug:
         return {"error": "debug only"}, 403
     db.create_all()
     flash('Ensured database tables exist.', 'success')
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
-@app.route('/dev/become_host', methods=['GET', 'POST'])
+@bp.route('/dev/become_host', methods=['GET', 'POST'])
 def dev_become_host():
-    if not app.debug:
+    if not current_app.debug:
         flash('Dev utility is only available in debug mode.', 'danger')
-        return redirect(url_for('grounds'))
+        return redirect(url_for('main.grounds'))
     host_email = request.values.get('host_email')
     if not host_email:
         flash('Provide host_email parameter.', 'danger')
-        return redirect(url_for('grounds'))
+        return redirect(url_for('main.grounds'))
     # Ensure a host user exists
     user = User.query.filter_by(email=host_email).first()
     if not user:
-        user = User(email=host_email, name='Dev Host', age=25, user_type='host')
+        # Also make login feasible with a known password for other flows
+        user = User(email=host_email, name='Dev Host', age=25, user_type='host', password_hash=hash_password('devpass'))
         db.session.add(user)
         db.session.commit()
-    # Also make login feasible via in-memory dict for other flows
-    hosts[host_email] = hosts.get(host_email, {'password': generate_password_hash('devpass'), 'name': 'Dev Host', 'age': 25, 'email': host_email, 'phone': ''})
     session['user_type'] = 'host'
     session['user_email'] = host_email
     flash(f'Impersonating host {host_email}', 'success')
-    return redirect(url_for('host_dashboard'))
+    return redirect(url_for('main.host_dashboard'))
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     return render_template('500.html'), 500
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     # Clear the user session
     session.clear()
     flash('You have been logged out successfully.', 'success')
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
-class Booking(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    ground_id = db.Column(db.Integer, db.ForeignKey('ground.id'), nullable=False)
-    player_email = db.Column(db.String(120), nullable=False)
-    date = db.Column(db.String(20), nullable=False)
-    start_time = db.Column(db.String(10), nullable=False)
-    end_time = db.Column(db.String(10), nullable=False)
-    status = db.Column(db.String(20), default='pending')  # pending, approved, declined
+def _host_bookings_page(ground_ids, before, limit):
+    """Newest bookings for these grounds by keyset: id < before.
 
-# Ensure all tables are created automatically
-with app.app_context():
-    db.create_all()
-    # Lightweight migration: add missing columns if DB was created before new fields
-    try:
-        conn = db.engine.connect()
-        # Check user table for profile_image_url
-        cols = [row[1] for row in conn.execute(text("PRAGMA table_info('user')")).fetchall()]
-        if 'profile_image_url' not in cols:
-            conn.execute(text("ALTER TABLE user ADD COLUMN profile_image_url VARCHAR(300)"))
-        conn.close()
-    except Exception as e:
-        # Do not crash app; just log
-        print(f"DB migration check failed: {e}")
-
-    # Seed default demo accounts (idempotent)
-    demo_player_email = 'player@demo.com'
-    demo_host_email = 'demo@host.com'
-    if demo_player_email not in players:
-        players[demo_player_email] = {
-            'password': generate_password_hash('demo123'),
-            'name': 'Demo Player',
-            'age': 22,
-            'email': demo_player_email,
-            'phone': '0000000000'
-        }
-    if not User.query.filter_by(email=demo_player_email).first():
-        db.session.add(User(email=demo_player_email, name='Demo Player', age=22, user_type='player', profile_image_url='https://em-content.zobj.net/thumbs/240/apple/354/smiling-face-with-sunglasses_1f60e.png'))
-        db.session.commit()
-    if demo_host_email not in hosts:
-        hosts[demo_host_email] = {
-            'password': generate_password_hash('demo123'),
-            'name': 'Demo Host',
-            'age': 30,
-            'email': demo_host_email,
-            'phone': '0000000000'
-        }
-    if not User.query.filter_by(email=demo_host_email).first():
-        db.session.add(User(email=demo_host_email, name='Demo Host', age=30, user_type='host', profile_image_url='https://em-content.zobj.net/thumbs/240/apple/354/alien_1f47d.png'))
-        db.session.commit()
+    Returns (bookings, next_cursor); next_cursor is None on the last page.
+    """
+    query = Booking.query.filter(Booking.ground_id.in_(ground_ids))
+    if before:
+        query = query.filter(Booking.id < before)
+    rows = query.order_by(Booking.id.desc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def _pending_matches_with_rosters(ground_ids):
+    """Pools awaiting the host and their players, in one joined query.
+
+    Returns (matches, rosters) where rosters maps match id -> {team: [(MatchPlayer, User or None)]}.
+    """
+    rows = (
+        db.session.query(Match, MatchPlayer, User)
+        .outerjoin(MatchPlayer, MatchPlayer.match_id == Match.id)
+        .outerjoin(User, User.email == MatchPlayer.user_email)
+        .filter(Match.ground_id.in_(ground_ids), Match.status == 'pending_host')
+        .order_by(Match.id.desc(), MatchPlayer.team, MatchPlayer.id)
+        .all()
+    )
+    matches, rosters = [], {}
+    for match, mp, user in rows:
+        if match.id not in rosters:
+            matches.append(match)
+            rosters[match.id] = {label: [] for label in TEAM_LABELS[:match_team_count()]}
+        if mp is not None:
+            rosters[match.id].setdefault(mp.team or '-', []).append((mp, user))
+    return matches, rosters
 
-@app.route('/host/dashboard', methods=['GET', 'POST'])
+@bp.route('/host/dashboard', methods=['GET', 'POST'])
 def host_dashboard():
     if 'user_email' not in session or session.get('user_type') != 'host':
         flash('You must be logged in as a host to view this page.', 'danger')
-        return redirect(url_for('login_host'))
+        return redirect(url_for('main.login_host'))
     host_email = session['user_email']
-    # Get all grounds owned by this host
+    # A fixed number of queries however many bookings and pools the host has
     host_grounds = Ground.query.filter_by(host_email=host_email).all()
-    ground_ids = [g.id for g in host_grounds]
-    # Get all bookings for these grounds
-    bookings = Booking.query.filter(Booking.ground_id.in_(ground_ids)).order_by(Booking.id.desc()).all()
-    # Notification: count of pending requests
-    pending_count = sum(1 for b in bookings if b.status == 'pending')
-    # Pending matches needing approval
-    pending_matches = Match.query.filter(Match.ground_id.in_(ground_ids), Match.status == 'pending_host').order_by(Match.id.desc()).all()
-    match_players_map = {}
-    for m in pending_matches:
-        match_players_map[m.id] = MatchPlayer.query.filter_by(match_id=m.id).all()
-    return render_template('host_dashboard.html', bookings=bookings, host_grounds=host_grounds, pending_count=pending_count, pending_matches=pending_matches, match_players_map=match_players_map)
-
-@app.route('/booking/<int:booking_id>/approve', methods=['POST'])
+    ground_ids = [gr.id for gr in host_grounds]
+    ground_names = {gr.id: gr.name for gr in host_grounds}
+    pending_count = Booking.query.filter(Booking.ground_id.in_(ground_ids), Booking.status == 'pending').count()
+    bookings, next_cursor = _host_bookings_page(ground_ids, request.args.get('before', type=int),
+                                                current_app.config['HOST_BOOKINGS_PAGE_SIZE'])
+    pending_matches, rosters = _pending_matches_with_rosters(ground_ids)
+    return render_template('host_dashboard.html', bookings=bookings, next_cursor=next_cursor,
+                           ground_names=ground_names, pending_count=pending_count,
+                           pending_matches=pending_matches, rosters=rosters,
+                           query_count=g.get('query_count') if current_app.debug else None)
+
+@bp.route('/booking/<int:booking_id>/approve', methods=['POST'])
 def approve_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
     # Only the host of the ground can approve
     ground = Ground.query.get(booking.ground_id)
     if session.get('user_email') != ground.host_email:
         flash('You do not have permission to approve this booking.', 'danger')
-        return redirect(url_for('host_dashboard'))
+        return redirect(url_for('main.host_dashboard'))
+    start, end = minutes_of(booking.start_time), minutes_of(booking.end_time)
+    # Lock the ground (row lock on server databases; the UPDATE below takes
+    # SQLite's write lock) so two approvals for the same time cannot both pass
+    Ground.query.filter_by(id=ground.id).with_for_update().one()
     booking.status = 'approved'
+    db.session.flush()
+    conflicts = _load_day_schedule(ground.id, booking.date).conflicts(start, end)
+    conflicts = [c for c in conflicts if not (c['kind'] == 'booking' and c['id'] == booking.id)]
+    if conflicts:
+        db.session.rollback()
+        flash(f'Cannot approve: this time overlaps {_describe_conflicts(conflicts)}.', 'danger')
+        return redirect(url_for('main.host_dashboard'))
+    project_booking_status(booking)
     db.session.commit()
+    invalidate_day_schedule(ground.id, booking.date)
     flash('Booking approved.', 'success')
-    return redirect(url_for('host_dashboard'))
+    return redirect(url_for('main.host_dashboard'))
 
-@app.route('/booking/<int:booking_id>/decline', methods=['POST'])
+@bp.route('/booking/<int:booking_id>/decline', methods=['POST'])
 def decline_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
     ground = Ground.query.get(booking.ground_id)
     if session.get('user_email') != ground.host_email:
         flash('You do not have permission to decline this booking.', 'danger')
-        return redirect(url_for('host_dashboard'))
+        return redirect(url_for('main.host_dashboard'))
     booking.status = 'declined'
+    project_booking_status(booking)
     db.session.commit()
+    invalidate_day_schedule(booking.ground_id, booking.date)
     flash('Booking declined.', 'success')
-    return redirect(url_for('host_dashboard'))
+    return redirect(url_for('main.host_dashboard'))
 
-@app.route('/player/dashboard')
+@bp.route('/player/dashboard')
 def player_dashboard():
     if 'user_email' not in session or session.get('user_type') != 'player':
         flash('You must be logged in as a player to view this page.', 'danger')
-        return redirect(url_for('login_player'))
-    player_email = session['user_email']
-    bookings = Booking.query.filter_by(player_email=player_email).order_by(Booking.id.desc()).all()
-    # Get all grounds for display
-    ground_ids = [b.ground_id for b in bookings]
-    grounds_by_id = {g.id: g for g in Ground.query.filter(Ground.id.in_(ground_ids)).all()}
-    # Joined matches
-    mps = MatchPlayer.query.filter_by(user_email=player_email).all()
-    match_ids = [mp.match_id for mp in mps]
-    matches = {m.id: m for m in Match.query.filter(Match.id.in_(match_ids)).order_by(Match.id.desc()).all()} if match_ids else {}
-    match_team_by_id = {mp.match_id: mp.team for mp in mps}
-    mg_ids = list({m.ground_id for m in matches.values()}) if matches else []
-    match_grounds = {g.id: g for g in Ground.query.filter(Ground.id.in_(mg_ids)).all()} if mg_ids else {}
-    return render_template('player_dashboard.html', bookings=bookings, grounds=grounds_by_id, matches=matches, match_team_by_id=match_team_by_id, match_grounds=match_grounds)
-
-@app.route('/player/requests')
+        return redirect(url_for('main.login_player'))
+    schedule = get_player_schedule(session['user_email'])
+    bookings = [item for item in schedule if item.kind == 'booking']
+    matches = [item for item in schedule if item.kind == 'match']
+    return render_template('player_dashboard.html', bookings=bookings, matches=matches)
+
+@bp.route('/player/requests')
 def player_requests():
     if 'user_email' not in session or session.get('user_type') != 'player':
         flash('You must be logged in as a player to view this page.', 'danger')
-        return redirect(url_for('login_player'))
-    player_email = session['user_email']
-    bookings = Booking.query.filter_by(player_email=player_email).order_by(Booking.id.desc()).all()
-    ground_ids = [b.ground_id for b in bookings]
-    grounds_by_id = {g.id: g for g in Ground.query.filter(Ground.id.in_(ground_ids)).all()}
-    return render_template('player_requests.html', bookings=bookings, grounds=grounds_by_id)
+        return redirect(url_for('main.login_player'))
+    bookings = get_player_schedule(session['user_email'], kind='booking')
+    return render_template('player_requests.html', bookings=bookings)
+
+@bp.route('/api/player/schedule')
+def api_player_schedule():
+    """The logged-in player's bookings and pools, latest first; ?since=YYYY-MM-DD to skip older ones."""
+    if 'user_email' not in session or session.get('user_type') != 'player':
+        return {"error": "unauthorized"}, 401
+    since = request.args.get('since')
+    try:
+        since = parse_date(since) if since else None
+    except ValueError:
+        return {"error": "since must be YYYY-MM-DD"}, 400
+    return {
+        "items": [
+            {
+                "kind": item.kind,
+                "id": item.ref_id,
+                "ground": {"id": item.ground_id, "name": item.ground_name, "location": item.ground_location},
+                "date": item.date.isoformat(),
+                "start_time": format_hhmm(item.start_time),
+                "end_time": format_hhmm(item.end_time) if item.end_time else None,
+                "status": item.status,
+                "team": item.team
+            }
+            for item in get_player_schedule(session['user_email'], since=since)
+        ]
+    }
+
+# ---------------------- Ground Import/Export ----------------------
+# CSV (with a header row) or JSONL, read and written one row at a time so
+# files of any size run in bounded memory.
+
+GROUND_FILE_FIELDS = ['name', 'host_email', 'city', 'location', 'postal_code', 'full_address',
+                      'latitude', 'longitude', 'rate', 'materials', 'ground_use', 'published', 'img']
+GROUND_IMPORT_REQUIRED = ['name', 'host_email', 'city', 'ground_use', 'rate', 'latitude', 'longitude']
+
+def _ground_file_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+def _open_ground_file(path, mode):
+    """The file at path, or stdin/stdout for '-'."""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    return open(path, mode, newline='', encoding='utf-8')
+
+def _read_ground_rows(stream, fmt):
+    """Yield (line number, row dict) pairs; a JSONL line that is not an object yields None."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+def _clean_text(value):
+    # Stored escaped like signup_host; unescape first so exported rows aren't escaped twice
+    return str(escape(html.unescape(str(value).strip()))) if value is not None else ''
+
+def clean_ground_row(row, publish=False):
+    """Ground column values for one imported row, checked with the signup_host rules.
+
+    Raises ValueError with the reason when the row can't be imported.
+    """
+    if row is None:
+        raise ValueError('Each line must be a JSON object.')
+    missing = [field for field in GROUND_IMPORT_REQUIRED if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f'Missing {", ".join(missing)}.')
+    latitude, longitude = parse_coordinates(row['latitude'], row['longitude'])
+    materials = row.get('materials') or []
+    if isinstance(materials, str):
+        materials = materials.split(',')
+    city = _clean_text(row['city'])
+    published = row.get('published')
+    if isinstance(published, str):
+        published = published.strip().lower() in ('1', 'true', 'yes')
+    return {
+        'name': _clean_text(row['name']),
+        'host_email': _clean_text(row['host_email']),
+        'city': city,
+        'location': _clean_text(row.get('location')) or city,
+        'postal_code': _clean_text(row.get('postal_code')) or None,
+        'full_address': _clean_text(row.get('full_address')) or None,
+        'latitude': latitude,
+        'longitude': longitude,
+        'rate': parse_rate(row['rate']),
+        'materials': ','.join(_clean_text(m) for m in materials if str(m).strip()),
+        'ground_use': _clean_text(row['ground_use']),
+        'published': bool(publish or published),
+        'img': row.get('img') or 'https://images.unsplash.com/photo-1506744038136-46273834b3fb?auto=format&fit=crop&w=400&q=80',
+    }
+
+@bp.cli.command('import-grounds')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Default: from the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per INSERT and per transaction.')
+@click.option('--publish', is_flag=True, help='Publish every imported ground.')
+@click.option('--dry-run', is_flag=True, help='Validate the file without writing anything.')
+def import_grounds_command(path, fmt, batch_size, publish, dry_run):
+    """Bulk-load grounds from a CSV or JSONL file ('-' for stdin).
+
+    Invalid rows are reported and skipped; valid ones are committed a batch
+    at a time, so an interrupted import keeps every finished batch.
+    """
+    fmt = _ground_file_format(path, fmt)
+    imported = rejected = 0
+    batch, hosts = [], set()
+
+    def flush():
+        if batch and not dry_run:
+            ids = db.session.scalars(insert(Ground).returning(Ground.id, sort_by_parameter_order=True), batch).all()
+            set_ground_materials(zip(ids, (values['materials'] for values in batch)))
+            db.session.commit()
+            click.echo(f'... {imported} grounds', err=True)
+        batch.clear()
+
+    with _open_ground_file(path, 'r') as stream:
+        for number, row in _read_ground_rows(stream, fmt):
+            try:
+                values = clean_ground_row(row, publish)
+            except ValueError as e:
+                rejected += 1
+                click.echo(f'line {number}: {e}', err=True)
+                continue
+            batch.append(values)
+            hosts.add(values['host_email'])
+            imported += 1
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    if imported and not dry_run:
+        invalidate_ground_index()
+        invalidate_pages('grounds', *(f'host:{email}' for email in hosts))
+    verb = 'Would import' if dry_run else 'Imported'
+    click.echo(f'{verb} {imported} grounds, rejected {rejected}.')
+    if rejected:
+        raise SystemExit(1)
+
+@bp.cli.command('export-grounds')
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Default: from the file extension.')
+@click.option('--published-only', is_flag=True)
+def export_grounds_command(path, fmt, published_only):
+    """Write every ground to a CSV or JSONL file ('-' for stdout), in id order."""
+    fmt = _ground_file_format(path, fmt)
+    query = select(*(Ground.__table__.c[field] for field in GROUND_FILE_FIELDS)).order_by(Ground.id)
+    if published_only:
+        query = query.where(Ground.published.is_(True))
+    exported = 0
+    with _open_ground_file(path, 'w') as out:
+        writer = csv.DictWriter(out, GROUND_FILE_FIELDS) if fmt == 'csv' else None
+        if writer:
+            writer.writeheader()
+        # Streamed in chunks rather than loaded whole
+        for row in db.session.execute(query.execution_options(yield_per=1000)):
+            record = row._asdict()
+            if writer:
+                writer.writerow(record)
+            else:
+                record['materials'] = [m for m in (record['materials'] or '').split(',') if m]
+                out.write(json.dumps(record) + '\n')
+            exported += 1
+    click.echo(f'Exported {exported} grounds.', err=True)
+
+# ---------------------- Application Factory & CLI ----------------------
+
+def init_database():
+    """Create missing tables and apply pending migrations (see migrations.py)."""
+    db.create_all()
+    return run_migrations(db.engine)
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create tables and apply pending migrations."""
+    applied = init_database()
+    click.echo(f'Applied migrations: {applied}' if applied else 'Database is up to date.')
+
+@bp.cli.command('seed')
+def seed_command():
+    """Add the demo grounds (to an empty catalogue) and the demo accounts."""
+    added = seed_grounds()
+    for email in DEMO_ACCOUNTS:
+        ensure_demo_user(email)
+    click.echo(f'Added {added} grounds; demo accounts use the password {DEMO_PASSWORD}.')
+
+@bp.cli.command('run-jobs')
+@click.option('--limit', type=int, help='Stop after this many jobs (default: until the queue is empty).')
+def run_jobs_command(limit):
+    """Run queued background jobs in this process."""
+    total = 0
+    while limit is None or total < limit:
+        ran = run_jobs(None if limit is None else min(limit - total, current_app.config['JOB_BATCH_SIZE']))
+        if not ran:
+            break
+        total += ran
+    click.echo(f'Ran {total} jobs.')
+
+@bp.cli.command('retention')
+@click.option('--dry-run', is_flag=True, help='Count what each rule would touch without changing anything.')
+@click.option('--match-days', type=int, help='Archive pools older than this many days (default: RETENTION_MATCH_DAYS).')
+@click.option('--booking-days', type=int, help='Archive bookings older than this many days (default: RETENTION_BOOKING_DAYS).')
+@click.option('--batch-size', type=int, help='Rows per transaction (default: RETENTION_BATCH_SIZE).')
+def retention_command(dry_run, match_days, booking_days, batch_size):
+    """Archive past pools and bookings and purge bots and orphaned rows."""
+    config = current_app.config
+    results = run_retention(
+        db.engine,
+        match_days=config['RETENTION_MATCH_DAYS'] if match_days is None else match_days,
+        booking_days=config['RETENTION_BOOKING_DAYS'] if booking_days is None else booking_days,
+        bot_email_pattern=config['RETENTION_BOT_EMAIL_PATTERN'],
+        job_days=config['RETENTION_JOB_DAYS'],
+        batch_size=batch_size or config['RETENTION_BATCH_SIZE'],
+        dry_run=dry_run,
+        progress=lambda rule, rows: click.echo(f'... {rule}: {rows}', err=True),
+    )
+    for rule, rows in results.items():
+        click.echo(f'{rule}: {rows}{" (dry run)" if dry_run else ""}')
+    if not dry_run and any(results.values()):
+        invalidate_lobby_feed()
+        invalidate_pages('lobby', 'grounds')
+
+def create_app(test_config=None):
+    """Build and configure the Flask app.
+
+    Does no database work, so importing this module and booting a worker
+    stay cheap. Prepare a database with ``flask --app app init-db`` (and
+    ``flask --app app seed`` for demo data).
+    """
+    app = Flask(__name__)
+    # __name__ tells Flask where to look for templates and static files
+    app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
+    check_match_format(app.config['MATCH_CAPACITY'], app.config['MATCH_TEAM_COUNT'])
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS win over the ones built from settings
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(app.config),
+                                               **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    db.init_app(app)
+    app.register_blueprint(bp)
+    with app.app_context():
+        if is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+            install_sqlite_pragmas(db.engine, sqlite_pragmas(app.config))
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    response_cache.backend = _response_cache_backend(app)
+    rate_limiter.backend = _rate_limit_backend(app)
+    rate_limiter.limits = rate_limits(app.config)
+    return app
 
 if __name__ == '__main__':
     # This runs our Flask app when we execute this file directly
+    app = create_app()
+    with app.app_context():
+        init_database()
     app.run(debug=True)
     # debug=True shows detailed error messages during development
     # Never use debug=True in production! 
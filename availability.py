@@ -0,0 +1,97 @@
+"""
+Per-ground, per-day schedules of busy time, used to reject overlapping bookings.
+
+Times are minutes since midnight. A ``DaySchedule`` keeps its busy blocks
+sorted and non-overlapping, so checking a new request only looks at the
+two blocks around it, found by binary search: O(log n) per check.
+"""
+from bisect import bisect_right
+from datetime import datetime
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_time(value):
+    """Validate an 'HH:MM' string and return a ``datetime.time``."""
+    return datetime.strptime(value, '%H:%M').time()
+
+
+def minutes_of(value):
+    """Minutes since midnight of a ``datetime.time``."""
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def parse_date(value):
+    """Validate a 'YYYY-MM-DD' string; raises ValueError otherwise."""
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class DaySchedule:
+    """Busy blocks of one ground on one day.
+
+    Each block is (start, end, items) covering [start, end). ``items`` lists
+    what occupies it (bookings, matches); items that overlapped when the
+    schedule was loaded share one merged block.
+    """
+
+    def __init__(self, intervals=()):
+        self._starts = []
+        self._blocks = []
+        for start, end, item in sorted(intervals, key=lambda i: (i[0], i[1])):
+            if self._blocks and start < self._blocks[-1][1]:
+                last_start, last_end, items = self._blocks[-1]
+                self._blocks[-1] = (last_start, max(last_end, end), items + [item])
+            else:
+                self._starts.append(start)
+                self._blocks.append((start, end, [item]))
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def conflicts(self, start, end):
+        """Items overlapping [start, end), or an empty list if the time is free."""
+        i = bisect_right(self._starts, start)
+        found = []
+        # The block starting at or before `start` may run past it...
+        if i > 0 and self._blocks[i - 1][1] > start:
+            found.extend(self._blocks[i - 1][2])
+        # ...and the next one may start before `end`
+        if i < len(self._blocks) and self._blocks[i][0] < end:
+            found.extend(self._blocks[i][2])
+            # Wider requests can swallow several blocks
+            j = i + 1
+            while j < len(self._blocks) and self._blocks[j][0] < end:
+                found.extend(self._blocks[j][2])
+                j += 1
+        return found
+
+    def add(self, start, end, item):
+        """Reserve [start, end) for item. Raises ValueError if it overlaps."""
+        if start >= end:
+            raise ValueError('start must be before end')
+        if self.conflicts(start, end):
+            raise ValueError('time overlaps an existing reservation')
+        i = bisect_right(self._starts, start)
+        self._starts.insert(i, start)
+        self._blocks.insert(i, (start, end, [item]))
+
+    def busy(self):
+        return [(start, end, list(items)) for start, end, items in self._blocks]
+
+    def free(self, open_minute=0, close_minute=MINUTES_PER_DAY):
+        """Gaps between busy blocks within opening hours, as [(start, end)]."""
+        gaps = []
+        cursor = open_minute
+        for start, end, _ in self._blocks:
+            if start > cursor:
+                gaps.append((cursor, min(start, close_minute)))
+            cursor = max(cursor, end)
+            if cursor >= close_minute:
+                break
+        if cursor < close_minute:
+            gaps.append((cursor, close_minute))
+        return [(s, e) for s, e in gaps if s < e]
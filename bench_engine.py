@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Engine settings benchmark: concurrent joins and reads under two SQLite setups.
+
+For each profile a fresh database is seeded (same data as bench_routes.py)
+and writer threads POST /join_match while reader threads poll
+/api/match_pool and /grounds, all at once. Reported per profile:
+
+- joins/s and reads/s over the time each group took to finish
+- p95 latency per group
+- errors: 5xx responses, e.g. "database is locked" when a writer gives up
+
+Profiles:
+
+- sqlite defaults:  rollback journal, synchronous=FULL, no busy_timeout
+                    beyond the driver's, default page cache and no mmap
+- configured:       the SQLITE_* settings from config.py (WAL,
+                    synchronous=NORMAL, bigger cache, mmap, busy_timeout)
+
+Usage:
+    python bench_engine.py --writers 4 --readers 4 --joins 400 --reads 2000
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time as _time
+
+from bench_routes import SCALES, _login, _percentile, scenarios, seed
+
+PROFILES = {
+    'sqlite defaults': {'SQLITE_JOURNAL_MODE': None, 'SQLITE_SYNCHRONOUS': None, 'SQLITE_CACHE_SIZE': None,
+                        'SQLITE_MMAP_SIZE': None, 'SQLITE_BUSY_TIMEOUT_MS': None},
+    'configured': {},
+}
+
+
+def _run_steps(app, steps, latencies, errors):
+    client = app.test_client()
+    for method, path, data, login in steps:
+        if login:
+            _login(client, *login)
+        t0 = _time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        latencies.append(_time.perf_counter() - t0)
+        if response.status_code >= 500:
+            errors.append(path)
+
+
+def _run_group(app, steps, threads, results, name):
+    latencies, errors = [], []
+    workers = [threading.Thread(target=_run_steps, args=(app, steps[i::threads], latencies, errors))
+               for i in range(threads)]
+    started = _time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results[name] = {
+        'rate': len(steps) / (_time.perf_counter() - started),
+        'p95_ms': _percentile(latencies, 95) * 1000,
+        'errors': len(errors),
+    }
+
+
+def run_profile(module, overrides, args):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_engine_'), 'bench.db')
+    app = module.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path,
+                             'RESPONSE_CACHE_BACKEND': 'none', 'RATE_LIMIT_BACKEND': 'none', **overrides})
+    app.logger.setLevel(logging.CRITICAL)  # failed requests are counted, not printed
+    module.lobby_feed_cache.invalidate()
+    module.schedule_cache.invalidate()
+    rng = random.Random(args.seed)
+    volumes = SCALES[args.scale]
+    with app.app_context():
+        module.init_database()
+        matches = seed(module, volumes, rng)
+        plan = scenarios(module, volumes, matches, max(args.joins, args.reads), rng)
+    reads = [step for pair in zip(plan['match_pool'], plan['grounds']) for step in pair][:args.reads]
+    results = {}
+    groups = [threading.Thread(target=_run_group, args=(app, plan['join_match'][:args.joins], args.writers, results, 'joins')),
+              threading.Thread(target=_run_group, args=(app, reads, args.readers, results, 'reads'))]
+    for group in groups:
+        group.start()
+    for group in groups:
+        group.join()
+    with app.app_context():
+        module.db.engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--joins', type=int, default=400)
+    parser.add_argument('--reads', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    import app as module
+    print(f"{'profile':<16} {'joins/s':>8} {'p95 ms':>8} {'errors':>7} {'reads/s':>8} {'p95 ms':>8} {'errors':>7}")
+    for name, overrides in PROFILES.items():
+        r = run_profile(module, overrides, args)
+        print(f"{name:<16} {r['joins']['rate']:>8.1f} {r['joins']['p95_ms']:>8.1f} {r['joins']['errors']:>7}"
+              f" {r['reads']['rate']:>8.1f} {r['reads']['p95_ms']:>8.1f} {r['reads']['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
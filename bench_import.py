@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: how long a fresh worker takes to import and build the app.
+
+Each run starts a new Python process (nothing cached in sys.modules) and
+times, in order:
+
+- import:      ``import app``
+- create_app:  building the Flask app (config, blueprint, engine)
+- first page:  one GET /login through the test client
+- init-db:     ``init_database()`` on an empty SQLite file, i.e. the work
+               that used to happen on every import and now runs only from
+               ``flask --app app init-db``
+
+Usage:
+    python bench_import.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + sys.argv[1]})
+created = time.perf_counter()
+assert app.test_client().get('/login').status_code == 200
+served = time.perf_counter()
+with app.app_context():
+    app_module.init_database()
+initialised = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first page': served - created,
+    'init-db': initialised - served,
+}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = {}
+    for _ in range(args.runs):
+        db_path = os.path.join(tempfile.mkdtemp(prefix='bench_import_'), 'cold.db')
+        out = subprocess.run([sys.executable, '-c', CHILD, db_path], cwd=here,
+                             capture_output=True, text=True, check=True).stdout
+        for step, seconds in json.loads(out.strip().splitlines()[-1]).items():
+            samples.setdefault(step, []).append(seconds * 1000)
+
+    print(f"{'step':<12} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for step, values in samples.items():
+        print(f"{step:<12} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
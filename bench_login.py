@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Login throughput benchmark for different password hash settings.
+
+For each hash method it creates a few users in a throwaway SQLite database
+and times POST /login/player through the Flask test client, using several
+threads so you can see how many logins per second one worker can serve.
+
+Usage:
+    python bench_login.py --methods pbkdf2:sha256:600000 pbkdf2:sha256:260000 scrypt --logins 40
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--methods', nargs='+', default=['pbkdf2:sha256:600000', 'pbkdf2:sha256:260000', 'scrypt'])
+    parser.add_argument('--logins', type=int, default=40, help='login attempts per method')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--users', type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_login_'), 'bench.db')
+    from app import create_app, db, init_database, User, hash_password
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'})
+    with app.app_context():
+        init_database()
+
+    print(f"{'method':<28} {'hash ms':>9} {'logins/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for method in args.methods:
+        app.config['PASSWORD_HASH_METHOD'] = method
+        with app.app_context():
+            User.query.filter(User.email.like('bench%')).delete(synchronize_session=False)
+            started = time.perf_counter()
+            hashes = [hash_password(f'pw{i}') for i in range(args.users)]
+            hash_ms = (time.perf_counter() - started) * 1000 / args.users
+            db.session.add_all([
+                User(email=f'bench{i}@example.com', age=20, user_type='player', password_hash=h)
+                for i, h in enumerate(hashes)
+            ])
+            db.session.commit()
+
+        latencies = []
+        lock = threading.Lock()
+
+        def run(n):
+            client = app.test_client()
+            for i in range(n):
+                user = i % args.users
+                t0 = time.perf_counter()
+                rv = client.post('/login/player', data={'email': f'bench{user}@example.com', 'password': f'pw{user}'})
+                elapsed = time.perf_counter() - t0
+                assert rv.status_code == 302, rv.status_code
+                with lock:
+                    latencies.append(elapsed)
+
+        per_thread = max(1, args.logins // args.threads)
+        threads = [threading.Thread(target=run, args=(per_thread,)) for _ in range(args.threads)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+        print(f"{method:<28} {hash_ms:>9.1f} {len(latencies) / wall:>10.1f} {p50:>8.1f} {p95:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Route benchmark: seed a large, reproducible dataset and time the hot pages.
+
+The database is a fresh SQLite file filled with bulk inserts (no ORM objects),
+driven by a seeded RNG so two runs at the same scale see identical data:
+
+- grounds:        published (9 in 10) grounds spread over a few hundred hosts
+- players:        player accounts with an age, so they can join pools
+- matches:        pools on distinct ground/date/slot keys from 2030-01-01 on
+- match players:  pool members; a pool that reaches capacity is split into
+                  teams and waits for the host
+- bookings:       pending/approved requests on the same grounds
+
+Each scenario then runs through the Flask test client, logged in where the
+page needs it, and reports throughput, p50/p95/p99 latency and SQL statements
+per request (from the /metrics registry):
+
+    home             GET /
+    grounds          GET /grounds (first page and a deep cursor)
+    match_pool       GET /api/match_pool/<id>?date&time for seeded pools
+    join_match       POST /join_match/<id>, every tenth join forms teams
+    host_dashboard   GET /host/dashboard for the busiest host
+    player_dashboard GET /player/dashboard for seeded pool members
+
+Unless --caches is given, the page cache is off and the lobby feed and day
+schedule caches are cleared before every request, so the numbers measure the
+database path.
+
+Baselines are stored per scale in bench_baselines.json. --check compares a run
+against it and exits 1 when a scenario's p95 grows by more than
+--latency-tolerance plus --latency-slack-ms (so sub-millisecond jitter on
+fast routes doesn't fail the check) or it issues more statements than the
+baseline; --save-baseline records the run as the new baseline.
+
+Usage:
+    python bench_routes.py --scale small --check
+    python bench_routes.py --scale large --save-baseline
+    python bench_routes.py --grounds 2000 --matches 20000 --requests 500
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time as _time
+from datetime import date, time, timedelta
+
+from migrations import rebuild_player_schedule
+
+SCALES = {
+    'small': {'grounds': 500, 'players': 2000, 'matches': 5000, 'match_players': 40000, 'bookings': 2000},
+    'large': {'grounds': 10000, 'players': 20000, 'matches': 100000, 'match_players': 1000000, 'bookings': 50000},
+}
+HOSTS = 200
+START_DATE = date(2030, 1, 1)
+BATCH = 10000
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baselines.json')
+
+
+def _batched(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(module, model, rows):
+    for batch in _batched(rows):
+        module.db.session.execute(model.__table__.insert(), batch)
+
+
+def seed(module, volumes, rng):
+    """Bulk-insert the dataset described by volumes; returns the match slots per ground."""
+    slot_times = [time.fromisoformat(t) for t in module.POOL_SLOT_TIMES]
+    capacity = module.match_capacity()
+    n_grounds, n_players, n_matches = volumes['grounds'], volumes['players'], volumes['matches']
+
+    _insert(module, module.User, (
+        {'email': f'host{h}@bench.pk', 'name': f'Host {h}', 'age': 30, 'user_type': 'host'}
+        for h in range(HOSTS)
+    ))
+    _insert(module, module.User, (
+        {'email': f'player{p}@bench.pk', 'name': f'Player {p}', 'age': rng.randint(13, 19), 'user_type': 'player'}
+        for p in range(n_players)
+    ))
+    _insert(module, module.Ground, (
+        {'id': g + 1, 'name': f'Ground {g}', 'location': f'Block {g % 97}, Lahore', 'rate': rng.randrange(1000, 5000, 100),
+         'img': 'https://example.com/ground.jpg', 'published': g % 10 != 0, 'host_email': f'host{g % HOSTS}@bench.pk',
+         'materials': 'grass,lights', 'ground_use': 'football', 'city': 'Lahore',
+         'latitude': 31.4 + rng.random() * 0.3, 'longitude': 74.2 + rng.random() * 0.3}
+        for g in range(n_grounds)
+    ))
+
+    # Spread the members over the pools; pools that fill up are split into teams
+    per_match, extra = divmod(volumes['match_players'], n_matches)
+    matches, members = [], []
+    for m in range(n_matches):
+        ground_id = m % n_grounds + 1
+        slot = m // n_grounds
+        match_date = START_DATE + timedelta(days=slot // len(slot_times))
+        count = min(capacity, per_match + (1 if m < extra else 0))
+        full = count == capacity
+        matches.append({'id': m + 1, 'ground_id': ground_id, 'date': match_date,
+                        'time': slot_times[slot % len(slot_times)], 'player_count': count,
+                        'status': 'pending_host' if full else 'waiting',
+                        'host_email': f'host{(ground_id - 1) % HOSTS}@bench.pk'})
+        first = m * capacity
+        for k in range(count):
+            members.append({'match_id': m + 1, 'user_email': f'player{(first + k) % n_players}@bench.pk',
+                            'team': ('A' if k % 2 == 0 else 'B') if full else None})
+    _insert(module, module.Match, matches)
+    _insert(module, module.MatchPlayer, members)
+
+    _insert(module, module.Booking, (
+        {'ground_id': b % n_grounds + 1, 'player_email': f'player{rng.randrange(n_players)}@bench.pk',
+         'date': START_DATE + timedelta(days=400 + b // n_grounds), 'start_time': time(8), 'end_time': time(10),
+         'status': 'pending' if b % 3 else 'approved'}
+        for b in range(volumes['bookings'])
+    ))
+    module.db.session.commit()
+    with module.db.engine.begin() as conn:
+        rebuild_player_schedule(conn)
+    return matches
+
+
+def _login(client, user_type, email):
+    with client.session_transaction() as sess:
+        sess['user_type'] = user_type
+        sess['user_email'] = email
+
+
+def scenarios(module, volumes, matches, requests, rng):
+    """{name: [(method, path, data, session)]}, one entry per request."""
+    n_players = volumes['players']
+    capacity = module.match_capacity()
+    published = [g + 1 for g in range(volumes['grounds']) if g % 10 != 0]
+    deep_cursor = published[len(published) * 9 // 10]
+    sample = [matches[rng.randrange(len(matches))] for _ in range(requests)]
+    member_of = [f'player{(m["id"] - 1) * capacity % n_players}@bench.pk' for m in sample]
+    # Joins go to fresh pools after the seeded dates, ten players per pool
+    join_date = START_DATE + timedelta(days=len(matches) // volumes['grounds'] // len(module.POOL_SLOT_TIMES) + 30)
+    return {
+        'home': [('GET', '/', None, None)] * requests,
+        'grounds': [('GET', '/grounds' if i % 2 else f'/grounds?after={deep_cursor}', None, None)
+                    for i in range(requests)],
+        'match_pool': [('GET', f'/api/match_pool/{m["ground_id"]}?date={m["date"].isoformat()}'
+                        f'&time={m["time"].strftime("%H:%M")}', None, ('player', member_of[i]))
+                       for i, m in enumerate(sample)],
+        'join_match': [('POST', f'/join_match/{published[(i // capacity) % len(published)]}',
+                        {'date': (join_date + timedelta(days=i // capacity // len(published))).isoformat(),
+                         'time': module.POOL_SLOT_TIMES[0]},
+                        ('player', f'player{i % n_players}@bench.pk'))
+                       for i in range(requests)],
+        # Host 1 owns ground 2, so at least one published ground
+        'host_dashboard': [('GET', '/host/dashboard', None, ('host', f'host{1 % HOSTS}@bench.pk'))] * requests,
+        'player_dashboard': [('GET', '/player/dashboard', None, ('player', email)) for email in member_of],
+    }
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_scenario(module, app, steps, warmup, use_caches):
+    """Replay the first ``warmup`` steps untimed, then time the rest."""
+    client = app.test_client()
+    steps, warm = steps[warmup:], steps[:warmup]
+    for method, path, data, login in warm:
+        if login:
+            _login(client, *login)
+        client.open(path, method=method, data=data)
+    module.metrics.reset()
+    latencies = []
+    started = _time.perf_counter()
+    for method, path, data, login in steps:
+        if login:
+            _login(client, *login)
+        if not use_caches:
+            module.lobby_feed_cache.invalidate()
+            module.schedule_cache.invalidate()
+        t0 = _time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        latencies.append(_time.perf_counter() - t0)
+        if response.status_code >= 400:
+            raise SystemExit(f'{method} {path} returned {response.status_code}')
+    elapsed = _time.perf_counter() - started
+    statements = requests_seen = 0
+    for hist in module.metrics.series('http_request_queries').values():
+        statements += hist.sum
+        requests_seen += hist.count
+    return {
+        'requests': len(steps),
+        'rps': round(len(steps) / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+        'queries': round(statements / max(requests_seen, 1), 2),
+    }
+
+
+def compare(results, baseline, latency_tolerance, query_tolerance, latency_slack_ms=0):
+    """Regression messages for every scenario slower or chattier than its baseline."""
+    problems = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        limit = base['p95_ms'] * (1 + latency_tolerance) + latency_slack_ms
+        if result['p95_ms'] > limit:
+            problems.append(f'{name}: p95 {result["p95_ms"]} ms > {limit:.2f} ms (baseline {base["p95_ms"]} ms)')
+        if result['queries'] > base['queries'] + query_tolerance:
+            problems.append(f'{name}: {result["queries"]} queries/request > baseline {base["queries"]}')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    for name in SCALES['small']:
+        parser.add_argument('--' + name.replace('_', '-'), type=int, help=f'override the scale\'s {name} count')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--only', nargs='+', help='run just these scenarios')
+    parser.add_argument('--caches', action='store_true', help='leave the in-process caches on')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline-file', default=BASELINE_FILE)
+    parser.add_argument('--check', action='store_true', help='exit 1 on a regression against the baseline')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--latency-tolerance', type=float, default=0.5, help='allowed p95 growth (0.5 = +50%%)')
+    parser.add_argument('--latency-slack-ms', type=float, default=1.0, help='allowed p95 growth on top, in ms')
+    parser.add_argument('--query-tolerance', type=float, default=0, help='allowed extra statements per request')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    volumes = dict(SCALES[args.scale])
+    for name in volumes:
+        if getattr(args, name) is not None:
+            volumes[name] = getattr(args, name)
+    custom = volumes != SCALES[args.scale]
+    baseline_key = args.scale + ('-custom' if custom else '') + ('-caches' if args.caches else '')
+
+    import app as module
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_routes_'), 'bench.db')
+    app = module.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path,
+                             'RESPONSE_CACHE_BACKEND': 'memory' if args.caches else 'none',
+                             'RATE_LIMIT_BACKEND': 'none',  # every simulated client is 127.0.0.1
+                             # Only the request path is timed: no worker threads competing for the write lock
+                             'JOB_WORKERS': 0, 'MATCHMAKING_WORKER': False})
+    rng = random.Random(args.seed)
+    with app.app_context():
+        module.init_database()
+        t0 = _time.perf_counter()
+        matches = seed(module, volumes, rng)
+        print(f'seeded {volumes} in {_time.perf_counter() - t0:.1f}s', file=sys.stderr)
+        plan = scenarios(module, volumes, matches, args.warmup + args.requests, rng)
+
+    results = {}
+    for name, steps in plan.items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = run_scenario(module, app, steps, args.warmup, args.caches)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'scenario':<17} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+        for name, r in results.items():
+            print(f"{name:<17} {r['rps']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['queries']:>8.2f}")
+
+    baselines = {}
+    if os.path.exists(args.baseline_file):
+        with open(args.baseline_file) as f:
+            baselines = json.load(f)
+    status = 0
+    if args.check:
+        if baseline_key not in baselines:
+            print(f'no baseline for {baseline_key!r} in {args.baseline_file}', file=sys.stderr)
+            status = 1
+        else:
+            problems = compare(results, baselines[baseline_key]['results'], args.latency_tolerance,
+                               args.query_tolerance, args.latency_slack_ms)
+            for problem in problems:
+                print('REGRESSION ' + problem, file=sys.stderr)
+            status = 1 if problems else 0
+    if args.save_baseline:
+        saved = baselines.get(baseline_key, {}).get('results', {})
+        saved.update(results)
+        baselines[baseline_key] = {'volumes': volumes, 'requests': args.requests, 'results': saved}
+        with open(args.baseline_file, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'saved baseline {baseline_key!r} to {args.baseline_file}', file=sys.stderr)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
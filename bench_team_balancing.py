@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark the team balancing engine against the old 10-player median heuristic.
+
+For random pools it reports the average time per call and the balance
+quality (gap between the oldest and youngest team average age, lower is
+better). The old function only handles 10 players / 2 teams, so the other
+formats are reported for the new engine alone.
+
+Usage:
+    python bench_team_balancing.py --pools 500
+"""
+import argparse
+import random
+import statistics
+import time
+
+from team_balancing import balance_teams, spread
+
+
+# The previous implementation from app.py, kept here as the baseline
+def _balance_teams_median_based10(player_emails_with_age):
+    """Greedy median-based team balancing for exactly 10 players.
+    Steps:
+    1) Sort ascending by age
+    2) Iterate; assign current player to the team whose current median age is lower
+       (tie-break by alternating or random), while keeping size <= 5 for each team
+    """
+    if len(player_emails_with_age) != 10:
+        return None, None
+
+    players_sorted = sorted(player_emails_with_age, key=lambda x: x[1])
+    team_a_emails, team_b_emails = [], []
+    team_a_ages, team_b_ages = [], []
+    toggle = 0  # tie-break alternator
+
+    def median(values):
+        if not values:
+            return None
+        n = len(values)
+        mid = n // 2
+        if n % 2 == 1:
+            return values[mid]
+        return (values[mid - 1] + values[mid]) / 2
+
+    for email, age in players_sorted:
+        # Ensure team sizes stay within 5
+        if len(team_a_emails) >= 5:
+            team_b_emails.append(email)
+            team_b_ages.append(age)
+            continue
+        if len(team_b_emails) >= 5:
+            team_a_emails.append(email)
+            team_a_ages.append(age)
+            continue
+
+        med_a = median(team_a_ages)
+        med_b = median(team_b_ages)
+        if med_a is None and med_b is None:
+            # Seed teams: put first on A, second on B
+            if toggle % 2 == 0:
+                team_a_emails.append(email); team_a_ages.append(age)
+            else:
+                team_b_emails.append(email); team_b_ages.append(age)
+            toggle += 1
+            continue
+        if med_a is None:
+            team_a_emails.append(email); team_a_ages.append(age)
+            continue
+        if med_b is None:
+            team_b_emails.append(email); team_b_ages.append(age)
+            continue
+
+        if med_a < med_b:
+            team_a_emails.append(email); team_a_ages.append(age)
+        elif med_b < med_a:
+            team_b_emails.append(email); team_b_ages.append(age)
+        else:
+            # Equal medians: alternate
+            if toggle % 2 == 0:
+                team_a_emails.append(email); team_a_ages.append(age)
+            else:
+                team_b_emails.append(email); team_b_ages.append(age)
+            toggle += 1
+
+    return team_a_emails, team_b_emails
+
+
+def _random_pool(size, rng):
+    return [(f'p{i}', rng.randint(15, 45)) for i in range(size)]
+
+
+def _measure(fn, pools):
+    times, gaps = [], []
+    for pool in pools:
+        ages = dict(pool)
+        started = time.perf_counter()
+        teams = fn(pool)
+        times.append(time.perf_counter() - started)
+        gaps.append(spread([[ages[key] for key in team] for team in teams]))
+    return statistics.mean(times) * 1000, max(times) * 1000, statistics.mean(gaps), max(gaps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pools', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--time-budget', type=float, default=0.05)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{'format':<28} {'avg ms':>8} {'max ms':>8} {'avg gap':>9} {'max gap':>9}")
+    pools = [_random_pool(10, rng) for _ in range(args.pools)]
+    rows = [
+        ('10/2 median (old)', lambda p: _balance_teams_median_based10(p)),
+        ('10/2 engine', lambda p: balance_teams(p, 2, time_budget=args.time_budget)),
+    ]
+    for label, fn in rows:
+        print(f"{label:<28} {'%8.3f %8.3f %9.3f %9.3f' % _measure(fn, pools)}")
+    for size, teams in [(14, 2), (22, 2), (15, 3), (20, 4)]:
+        pools = [_random_pool(size, rng) for _ in range(args.pools)]
+        fn = lambda p, k=teams: balance_teams(p, k, time_budget=args.time_budget)
+        print(f"{f'{size}/{teams} engine':<28} {'%8.3f %8.3f %9.3f %9.3f' % _measure(fn, pools)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Caches shared by the app's read-heavy pages.
+
+``TTLCache`` holds computed values in this process. ``ResponseCache`` holds
+rendered pages on top of a pluggable backend: ``LRUCache`` (in-process) or
+``DiskCache`` (a SQLite file every worker process can share).
+"""
+import hashlib
+import itertools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe key/value cache where each entry expires after ``ttl`` seconds.
+
+    Values are kept in this process only, so callers must invalidate keys
+    whenever the data behind them changes.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_set(self, key, factory):
+        """Return the cached value for ``key``, building it with ``factory()`` on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when no key is given."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class LRUCache:
+    """Thread-safe in-process store holding at most ``maxsize`` entries.
+
+    Entries expire after ``ttl`` seconds; when full, the least recently
+    used entry is evicted.
+    """
+
+    def __init__(self, maxsize=512, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class DiskCache:
+    """Store kept in a SQLite file, so several worker processes share one cache.
+
+    Same interface and eviction rules as ``LRUCache``; values are pickled.
+    """
+
+    def __init__(self, path, maxsize=512, ttl=60):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_entry ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entry_used_at ON cache_entry (used_at)')
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        conn = self._conn()
+        row = conn.execute('SELECT value, expires_at FROM cache_entry WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        now = time.time()
+        if row[1] < now:
+            conn.execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+            return default
+        conn.execute('UPDATE cache_entry SET used_at = ? WHERE key = ?', (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)',
+            (key, pickle.dumps(value), now + self.ttl, now)
+        )
+        excess = conn.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0] - self.maxsize
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                ' SELECT key FROM cache_entry ORDER BY expires_at < ? DESC, used_at LIMIT ?)',
+                (now, excess)
+            )
+
+    def clear(self):
+        self._conn().execute('DELETE FROM cache_entry')
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+
+
+class ResponseCache:
+    """Rendered responses keyed by route, arguments and viewer, invalidated by tag.
+
+    Every entry depends on a few tags (e.g. 'grounds', 'host:<email>'). The
+    current version of each tag is part of the entry's key, so invalidating
+    a tag only stores a new version: stale entries are never read again and
+    age out of the backend. This works the same whether the backend is
+    private to the process or shared between processes.
+    """
+
+    _counter = itertools.count()
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _tag_version(self, tag):
+        version = self.backend.get(f'tag:{tag}')
+        if version is None:
+            # Lost or never set: start a fresh version so no older entry can match
+            version = self._new_version()
+            self.backend.set(f'tag:{tag}', version)
+        return version
+
+    @staticmethod
+    def _new_version():
+        return f'{time.time_ns():x}.{os.getpid()}.{next(ResponseCache._counter)}'
+
+    def key(self, route, args, viewer, tags):
+        versions = [(tag, self._tag_version(tag)) for tag in sorted(tags)]
+        raw = repr((route, sorted(args), viewer, versions)).encode()
+        return 'page:' + hashlib.sha1(raw).hexdigest()
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.set(f'tag:{tag}', self._new_version())
+
+    def clear(self):
+        self.backend.clear()
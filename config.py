@@ -7,6 +7,83 @@ class Config:
     # Database Configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///grounds.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite, applied to every connection (empty env var = SQLite's default)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL') or None
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL') or None
+    SQLITE_CACHE_SIZE = os.environ.get('SQLITE_CACHE_SIZE', '-32000') or None  # negative = KiB
+    SQLITE_MMAP_SIZE = os.environ.get('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)) or None
+    SQLITE_BUSY_TIMEOUT_MS = os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000') or None
+    # Connection pool for server databases (PostgreSQL, MySQL)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))  # seconds; below the server's idle timeout
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    
+    # Match format: players per pool and how many teams they are split into
+    MATCH_CAPACITY = int(os.environ.get('MATCH_CAPACITY', '10'))
+    MATCH_TEAM_COUNT = int(os.environ.get('MATCH_TEAM_COUNT', '2'))
+    TEAM_BALANCE_TIME_BUDGET = float(os.environ.get('TEAM_BALANCE_TIME_BUDGET', '0.05'))  # seconds
+    
+    # Password hashing (any werkzeug method: 'pbkdf2:sha256:<iterations>' or 'scrypt')
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', '16'))
+    
+    # Caching
+    LOBBY_FEED_CACHE_SECONDS = int(os.environ.get('LOBBY_FEED_CACHE_SECONDS', '30'))
+    AVAILABILITY_CACHE_SECONDS = int(os.environ.get('AVAILABILITY_CACHE_SECONDS', '30'))
+    # Rendered pages: 'memory' (per process), 'disk' (shared SQLite file) or 'none'
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH')  # default: instance/response_cache.db
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '512'))
+    RESPONSE_CACHE_SECONDS = int(os.environ.get('RESPONSE_CACHE_SECONDS', '60'))
+    
+    # Rate limiting (token buckets): 'memory' (per process), 'disk' (shared SQLite file) or 'none'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH')  # default: instance/rate_limit.db
+    # Per route, per client IP and per session: '<requests>/<second|minute|hour|day>' (empty = no limit)
+    RATE_LIMIT_MATCH_POOL_PER_IP = os.environ.get('RATE_LIMIT_MATCH_POOL_PER_IP', '300/minute')
+    RATE_LIMIT_MATCH_POOL_PER_SESSION = os.environ.get('RATE_LIMIT_MATCH_POOL_PER_SESSION', '60/minute')
+    RATE_LIMIT_LOGIN_PER_IP = os.environ.get('RATE_LIMIT_LOGIN_PER_IP', '30/minute')  # both login forms
+    RATE_LIMIT_LOGIN_PER_SESSION = os.environ.get('RATE_LIMIT_LOGIN_PER_SESSION', '5/minute')
+    
+    # Live match pool updates (Server-Sent Events)
+    POOL_STREAM_KEEPALIVE_SECONDS = int(os.environ.get('POOL_STREAM_KEEPALIVE_SECONDS', '15'))
+    
+    # Grounds listing page size (keyset pagination)
+    GROUNDS_PAGE_SIZE = int(os.environ.get('GROUNDS_PAGE_SIZE', '20'))
+    HOST_BOOKINGS_PAGE_SIZE = int(os.environ.get('HOST_BOOKINGS_PAGE_SIZE', '25'))
+    
+    # Nearby grounds index (cell size in degrees, ~11 km at 0.1)
+    GROUND_INDEX_CELL_DEG = float(os.environ.get('GROUND_INDEX_CELL_DEG', '0.1'))
+    GROUND_INDEX_REFRESH_SECONDS = int(os.environ.get('GROUND_INDEX_REFRESH_SECONDS', '300'))
+    
+    # Instrumentation: statements slower than this are logged; /metrics token (optional)
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Background jobs: worker threads per process (0 = only `flask --app app run-jobs`)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+    JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', '2'))
+    JOB_BATCH_SIZE = int(os.environ.get('JOB_BATCH_SIZE', '20'))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '5'))
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '60'))
+    
+    # Overflow matchmaking: queued players are placed by a background worker in each process
+    MATCHMAKING_WORKER = os.environ.get('MATCHMAKING_WORKER', 'True').lower() == 'true'
+    MATCHMAKING_INTERVAL_SECONDS = float(os.environ.get('MATCHMAKING_INTERVAL_SECONDS', '5'))
+    MATCHMAKING_BATCH_SIZE = int(os.environ.get('MATCHMAKING_BATCH_SIZE', '50'))
+    MATCHMAKING_DEFAULT_DISTANCE_KM = float(os.environ.get('MATCHMAKING_DEFAULT_DISTANCE_KM', '10'))
+    MATCHMAKING_MAX_DISTANCE_KM = float(os.environ.get('MATCHMAKING_MAX_DISTANCE_KM', '50'))
+    MATCHMAKING_MAX_WINDOW_DAYS = int(os.environ.get('MATCHMAKING_MAX_WINDOW_DAYS', '14'))
+    MATCHMAKING_MAX_GROUNDS = int(os.environ.get('MATCHMAKING_MAX_GROUNDS', '20'))
+    
+    # Retention job (flask --app app retention): archive past pools/bookings, purge dev bots
+    RETENTION_MATCH_DAYS = int(os.environ.get('RETENTION_MATCH_DAYS', '30'))
+    RETENTION_BOOKING_DAYS = int(os.environ.get('RETENTION_BOOKING_DAYS', '90'))
+    RETENTION_JOB_DAYS = int(os.environ.get('RETENTION_JOB_DAYS', '7'))  # finished background jobs
+    RETENTION_BOT_EMAIL_PATTERN = os.environ.get('RETENTION_BOT_EMAIL_PATTERN', 'bot%@example.com')
+    RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', '1000'))
     
     # Other Configuration
     DEBUG = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
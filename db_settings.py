@@ -0,0 +1,67 @@
+"""
+Database engine settings built from the app config.
+
+SQLite gets its PRAGMAs applied to every new connection, since most of them
+(synchronous, cache_size, mmap_size, busy_timeout) only last for the
+connection that set them. Server databases (PostgreSQL, MySQL) get pool
+sizing and recycling instead. A setting left as None keeps the driver's
+default.
+"""
+from sqlalchemy import event
+
+SQLITE_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SQLITE_SYNCHRONOUS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+
+def engine_options(config):
+    """create_engine() keyword arguments (SQLALCHEMY_ENGINE_OPTIONS) for the configured database."""
+    if is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        return {}
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    return {name: value for name, value in options.items() if value is not None}
+
+
+def sqlite_pragmas(config):
+    """[(pragma, value)] to run on each new SQLite connection. Raises ValueError on a bad setting."""
+    pragmas = []
+    journal_mode = config['SQLITE_JOURNAL_MODE']
+    if journal_mode:
+        if journal_mode.upper() not in SQLITE_JOURNAL_MODES:
+            raise ValueError(f'SQLITE_JOURNAL_MODE must be one of {sorted(SQLITE_JOURNAL_MODES)}')
+        pragmas.append(('journal_mode', journal_mode.upper()))
+    synchronous = config['SQLITE_SYNCHRONOUS']
+    if synchronous:
+        if synchronous.upper() not in SQLITE_SYNCHRONOUS:
+            raise ValueError(f'SQLITE_SYNCHRONOUS must be one of {sorted(SQLITE_SYNCHRONOUS)}')
+        pragmas.append(('synchronous', synchronous.upper()))
+    for pragma, key in (('cache_size', 'SQLITE_CACHE_SIZE'), ('mmap_size', 'SQLITE_MMAP_SIZE'),
+                        ('busy_timeout', 'SQLITE_BUSY_TIMEOUT_MS')):
+        if config[key] is not None:
+            try:
+                pragmas.append((pragma, int(config[key])))
+            except ValueError:
+                raise ValueError(f'{key} must be an integer') from None
+    return pragmas
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    """Run the pragmas on every connection the engine opens from now on."""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
@@ -0,0 +1,78 @@
+"""
+Durable background jobs: the worker side.
+
+Jobs are rows in the ``job`` table (model, handlers and ``run_jobs`` are in
+app.py), so they survive restarts and any process can run them. This module
+holds the parts that don't touch the database: retry backoff and the
+threads that poll for work.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts, base=2.0, cap=300.0):
+    """Seconds to wait before retrying a job that has failed ``attempts`` times."""
+    return min(cap, base * 2 ** max(0, attempts - 1))
+
+
+class PeriodicWorker:
+    """Calls ``func()`` on a daemon thread every ``interval`` seconds, or sooner after ``wake()``."""
+
+    def __init__(self, func, interval, name='worker'):
+        self.func = func
+        self.interval = interval
+        self.name = name
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.func()
+            except Exception:
+                # Keep the worker alive; the next pass retries
+                logger.exception('%s pass failed', self.name)
+
+
+class WorkerPool:
+    """``size`` PeriodicWorkers running the same function; ``wake()`` wakes them all."""
+
+    def __init__(self, func, size, interval, name='worker'):
+        self.workers = [PeriodicWorker(func, interval, name=f'{name}-{i}') for i in range(size)]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def wake(self):
+        for worker in self.workers:
+            worker.wake()
+
+    def stop(self, timeout=None):
+        for worker in self.workers:
+            worker.stop(timeout)
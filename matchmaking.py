@@ -0,0 +1,33 @@
+"""
+Overflow matchmaking: placing queued players into the best open pool.
+
+A player whose pool is full (or already with the host) is queued with a date
+window, a sport and a maximum distance. A background worker takes the queue
+a batch at a time; for each request app.py collects the open pools and free
+slots that fit, and this module decides the order to try them in.
+
+- open pools first, fullest first (every placement brings a pool closer to
+  kick-off), then nearest, then soonest
+- otherwise the nearest ground's earliest free slot, which starts a new pool
+"""
+
+
+def rank_open_pools(pools):
+    """Sort (player_count, distance_km, date, time, ...) tuples into the order to try them."""
+    return sorted(pools, key=lambda pool: (-pool[0], pool[1], pool[2], pool[3]))
+
+
+def free_slots(grounds, days, slot_times, taken, is_free=None):
+    """Yield (distance_km, ground, day, time) for new pools: nearest ground first, then earliest slot.
+
+    ``grounds`` is [(distance_km, ground)] nearest first and ``taken`` a set of
+    (ground id, day, time) that already have a pool. ``is_free(ground, day, time)``
+    can veto further slots (bookings, slots already past).
+    """
+    for distance, ground in grounds:
+        for day in days:
+            for slot in slot_times:
+                if (ground.id, day, slot) in taken:
+                    continue
+                if is_free is None or is_free(ground, day, slot):
+                    yield distance, ground, day, slot
@@ -0,0 +1,116 @@
+"""
+In-process request and database metrics, exposed in Prometheus text format.
+
+Counters and histograms are labelled by plain dicts (e.g. route, method).
+Each worker process keeps its own registry; Prometheus scrapes every worker
+and sums them.
+"""
+import threading
+from bisect import bisect_left
+
+# Seconds; covers cached pages (~1 ms) up to badly slow requests
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements per request; an N+1 page climbs through these as data grows
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """Counts of observations at or below each bucket bound, plus their sum."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(upper bound, observations <= bound)], ending with ('+Inf', count)."""
+        running, out = 0, []
+        for bound, n in zip(self.buckets + ('+Inf',), self.counts):
+            running += n
+            out.append((bound, running))
+        return out
+
+
+def _labels_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    """Thread-safe set of named counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}  # name -> (type, help, buckets)
+        self._series = {}  # name -> {labels key: float or Histogram}
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text, None)
+        self._series.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+        self._series.setdefault(name, {})
+
+    def inc(self, name, labels=None, amount=1):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._series[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._series[name]
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(self._meta[name][2])
+            hist.observe(value)
+
+    def value(self, name, labels=None):
+        """Current counter value, or the histogram for these labels (None if never touched)."""
+        with self._lock:
+            return self._series[name].get(_labels_key(labels))
+
+    def series(self, name):
+        """{labels key: counter value or Histogram} for every label set seen so far."""
+        with self._lock:
+            return dict(self._series[name])
+
+    def reset(self):
+        with self._lock:
+            for series in self._series.values():
+                series.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, _) in sorted(self._meta.items()):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for key, item in sorted(self._series[name].items()):
+                    if kind == 'counter':
+                        lines.append(f'{name}{_format_labels(key)} {item}')
+                        continue
+                    for bound, count in item.cumulative():
+                        lines.append(f'{name}_bucket{_format_labels(key, [("le", bound)])} {count}')
+                    lines.append(f'{name}_sum{_format_labels(key)} {item.sum}')
+                    lines.append(f'{name}_count{_format_labels(key)} {item.count}')
+        return '\n'.join(lines) + '\n'
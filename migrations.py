@@ -0,0 +1,353 @@
+"""
+Versioned schema migrations for the grounds database.
+
+Every migration has a version number and runs once, in order, inside its own
+transaction. Applied versions are recorded in the ``schema_migrations`` table
+so restarting the app (or running several workers) never repeats work.
+
+To add a migration, write a function that takes a SQLAlchemy connection and
+decorate it with ``@migration(<next version>, '<short description>')``.
+Migrations must be safe on a brand new database too, because ``db.create_all()``
+already builds the latest tables before they run.
+"""
+from datetime import datetime
+
+from sqlalchemy import MetaData, Table, bindparam, inspect, text
+
+from search import GROUND_FTS_DDL, GROUND_FTS_REBUILD, material_keys
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register a migration function under a version number."""
+    def decorator(func):
+        MIGRATIONS.append((version, name, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR(200) NOT NULL, "
+        "applied_at VARCHAR(40) NOT NULL)"
+    ))
+
+
+def applied_versions(conn):
+    """Return the set of migration versions already applied."""
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def current_version(engine):
+    """Highest applied migration version (0 for an unmigrated database)."""
+    with engine.begin() as conn:
+        versions = applied_versions(conn)
+    return max(versions) if versions else 0
+
+
+def run_migrations(engine, verbose=False):
+    """Apply every pending migration. Returns the list of versions applied."""
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    applied = []
+    for version, name, func in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            # Another worker may have applied it while we were waiting
+            if version in applied_versions(conn):
+                continue
+            func(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :a)"),
+                {"v": version, "n": name, "a": datetime.utcnow().isoformat()}
+            )
+        applied.append(version)
+        if verbose:
+            print(f"Applied migration {version}: {name}")
+    return applied
+
+
+def _column_names(conn, table):
+    return {col['name'] for col in inspect(conn).get_columns(table)}
+
+
+# ---------------------- Migrations ----------------------
+
+@migration(1, 'add user.profile_image_url')
+def _add_user_profile_image(conn):
+    if 'profile_image_url' not in _column_names(conn, 'user'):
+        conn.execute(text("ALTER TABLE user ADD COLUMN profile_image_url VARCHAR(300)"))
+
+
+@migration(2, 'merge duplicate match slots and pool members')
+def _dedupe_match_pools(conn):
+    # Older databases could hold several Match rows for the same ground/date/time
+    # and the same player twice in one pool. Keep the oldest row of each and move
+    # pool members onto it so the unique indexes below can be created.
+    conn.execute(text(
+        'UPDATE match_player SET match_id = ('
+        ' SELECT MIN(k.id) FROM "match" m JOIN "match" k'
+        ' ON k.ground_id = m.ground_id AND k.date = m.date AND k.time = m.time'
+        ' WHERE m.id = match_player.match_id)'
+        ' WHERE match_id IN ('
+        ' SELECT m.id FROM "match" m JOIN "match" k'
+        ' ON k.ground_id = m.ground_id AND k.date = m.date AND k.time = m.time AND k.id < m.id)'
+    ))
+    conn.execute(text(
+        'DELETE FROM "match" WHERE id NOT IN ('
+        ' SELECT MIN(id) FROM "match" GROUP BY ground_id, date, time)'
+    ))
+    conn.execute(text(
+        'DELETE FROM match_player WHERE id NOT IN ('
+        ' SELECT MIN(id) FROM match_player GROUP BY match_id, user_email)'
+    ))
+
+
+@migration(3, 'indexes for hot lookups on ground, match, match_player and booking')
+def _add_hot_path_indexes(conn):
+    statements = [
+        'CREATE INDEX IF NOT EXISTS ix_ground_published ON ground (published, id)',
+        'CREATE INDEX IF NOT EXISTS ix_ground_host_email ON ground (host_email)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_match_ground_slot ON "match" (ground_id, date, time)',
+        'CREATE INDEX IF NOT EXISTS ix_match_status ON "match" (status)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_match_player_member ON match_player (match_id, user_email)',
+        'CREATE INDEX IF NOT EXISTS ix_match_player_user_email ON match_player (user_email)',
+        'CREATE INDEX IF NOT EXISTS ix_booking_ground_date ON booking (ground_id, date)',
+        'CREATE INDEX IF NOT EXISTS ix_booking_player_email ON booking (player_email)',
+    ]
+    for stmt in statements:
+        conn.execute(text(stmt))
+
+
+@migration(4, 'add match.player_count for atomic capacity checks')
+def _add_match_player_count(conn):
+    if 'player_count' not in _column_names(conn, 'match'):
+        conn.execute(text('ALTER TABLE "match" ADD COLUMN player_count INTEGER NOT NULL DEFAULT 0'))
+    conn.execute(text(
+        'UPDATE "match" SET player_count = ('
+        ' SELECT COUNT(*) FROM match_player WHERE match_player.match_id = "match".id)'
+    ))
+
+
+@migration(5, 'store credentials on user (password_hash, phone)')
+def _add_user_credentials(conn):
+    columns = _column_names(conn, 'user')
+    if 'password_hash' not in columns:
+        conn.execute(text("ALTER TABLE user ADD COLUMN password_hash VARCHAR(256)"))
+    if 'phone' not in columns:
+        conn.execute(text("ALTER TABLE user ADD COLUMN phone VARCHAR(30)"))
+
+
+# Formats older versions accepted as free text, tried in order
+_LEGACY_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y')
+_LEGACY_TIME_FORMATS = ('%H:%M', '%H:%M:%S', '%H:%M:%S.%f', '%I:%M %p', '%I:%M%p')
+
+
+def _parse_legacy(value, formats, kind):
+    if not isinstance(value, str):
+        return value  # already typed (server databases after this migration)
+    value = value.strip()
+    if kind == 'time' and value == '24:00':
+        return datetime.strptime('23:59', '%H:%M').time()  # old "end of day"
+    for fmt in formats:
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return parsed.date() if kind == 'date' else parsed.time()
+    return None
+
+
+def _typed_values(conn, table, columns):
+    """Rows of ``table`` as (id, [typed values]), plus the ids that cannot be parsed."""
+    kinds = ['date' if col == 'date' else 'time' for col in columns]
+    rows, bad = [], []
+    selected = ', '.join(columns)
+    for row in conn.execute(text(f'SELECT id, {selected} FROM "{table}" ORDER BY id')):
+        values = [
+            _parse_legacy(value, _LEGACY_DATE_FORMATS if kind == 'date' else _LEGACY_TIME_FORMATS, kind)
+            for value, kind in zip(row[1:], kinds)
+        ]
+        (bad if None in values else rows).append((row[0], values))
+    return rows, [row_id for row_id, _ in bad]
+
+
+def _delete_ids(conn, table, column, ids):
+    if ids:
+        conn.execute(text(f'DELETE FROM "{table}" WHERE {column} IN :ids')
+                     .bindparams(bindparam('ids', expanding=True)), {'ids': ids})
+
+
+def _storage_value(conn, value):
+    # SQLite has no DATE/TIME storage class: SQLAlchemy keeps ISO strings with
+    # microseconds for TIME, which also sort correctly for range queries
+    if conn.dialect.name == 'sqlite':
+        return value.isoformat() if hasattr(value, 'year') else value.strftime('%H:%M:%S.%f')
+    return value
+
+
+@migration(6, 'typed date/time columns for match and booking')
+def _type_match_and_booking_times(conn):
+    # Pools and bookings used to hold dates and times as free text, compared
+    # as strings. Rewrite every row into the typed form; rows that were never
+    # a readable date/time could not be joined, booked or approved, so they
+    # are dropped. Pools that collapse onto the same slot are merged.
+    matches, bad_matches = _typed_values(conn, 'match', ['date', 'time'])
+    ground_of = dict(conn.execute(text('SELECT id, ground_id FROM "match"')).all())
+    keep = {}
+    for match_id, (day, start) in matches:
+        kept = keep.setdefault((ground_of[match_id], day, start), match_id)
+        if kept != match_id:
+            conn.execute(text(
+                'UPDATE match_player SET match_id = :kept WHERE match_id = :dup AND user_email NOT IN ('
+                ' SELECT user_email FROM match_player WHERE match_id = :kept)'
+            ), {'kept': kept, 'dup': match_id})
+            bad_matches.append(match_id)
+    _delete_ids(conn, 'match_player', 'match_id', bad_matches)
+    _delete_ids(conn, 'match', 'id', bad_matches)
+    kept_ids = set(keep.values())
+    for match_id, (day, start) in matches:
+        if match_id in kept_ids:
+            conn.execute(text('UPDATE "match" SET date = :d, time = :t WHERE id = :id'),
+                         {'d': _storage_value(conn, day), 't': _storage_value(conn, start), 'id': match_id})
+    conn.execute(text(
+        'UPDATE "match" SET player_count = ('
+        ' SELECT COUNT(*) FROM match_player WHERE match_player.match_id = "match".id)'
+    ))
+
+    bookings, bad_bookings = _typed_values(conn, 'booking', ['date', 'start_time', 'end_time'])
+    _delete_ids(conn, 'booking', 'id', bad_bookings)
+    for booking_id, (day, start, end) in bookings:
+        conn.execute(text('UPDATE booking SET date = :d, start_time = :s, end_time = :e WHERE id = :id'),
+                     {'d': _storage_value(conn, day), 's': _storage_value(conn, start),
+                      'e': _storage_value(conn, end), 'id': booking_id})
+
+    if conn.dialect.name == 'postgresql':
+        for table, column, sql_type in [('match', 'date', 'DATE'), ('match', 'time', 'TIME'),
+                                        ('booking', 'date', 'DATE'), ('booking', 'start_time', 'TIME'),
+                                        ('booking', 'end_time', 'TIME')]:
+            conn.execute(text(
+                f'ALTER TABLE "{table}" ALTER COLUMN {column} TYPE {sql_type} USING {column}::{sql_type.lower()}'
+            ))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_match_date_time ON "match" (date, time)'))
+
+
+@migration(7, 'player_schedule read model for the player pages')
+def _add_player_schedule(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS player_schedule ('
+        'id INTEGER PRIMARY KEY, '
+        'player_email VARCHAR(120) NOT NULL, '
+        'kind VARCHAR(10) NOT NULL, '
+        'ref_id INTEGER NOT NULL, '
+        'ground_id INTEGER NOT NULL, '
+        'ground_name VARCHAR(120), '
+        'ground_location VARCHAR(120), '
+        'date DATE NOT NULL, '
+        'start_time TIME NOT NULL, '
+        'end_time TIME, '
+        'status VARCHAR(20) NOT NULL, '
+        'team VARCHAR(1))'
+    ))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_player_schedule_player ON player_schedule (player_email, date, start_time)'))
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_player_schedule_item ON player_schedule (kind, ref_id, player_email)'))
+    rebuild_player_schedule(conn)
+
+
+def rebuild_player_schedule(conn):
+    """Rebuild the player_schedule read model from every booking and pool membership."""
+    conn.execute(text('DELETE FROM player_schedule'))
+    conn.execute(text(
+        'INSERT INTO player_schedule (player_email, kind, ref_id, ground_id, ground_name, ground_location,'
+        ' date, start_time, end_time, status, team)'
+        " SELECT b.player_email, 'booking', b.id, b.ground_id, g.name, g.location,"
+        " b.date, b.start_time, b.end_time, COALESCE(b.status, 'pending'), NULL"
+        ' FROM booking b LEFT JOIN ground g ON g.id = b.ground_id'
+    ))
+    conn.execute(text(
+        'INSERT INTO player_schedule (player_email, kind, ref_id, ground_id, ground_name, ground_location,'
+        ' date, start_time, end_time, status, team)'
+        " SELECT mp.user_email, 'match', m.id, m.ground_id, g.name, g.location,"
+        " m.date, m.time, NULL, COALESCE(m.status, 'waiting'), mp.team"
+        ' FROM match_player mp JOIN "match" m ON m.id = mp.match_id LEFT JOIN ground g ON g.id = m.ground_id'
+    ))
+
+
+@migration(8, 'full-text search index over grounds (SQLite FTS5)')
+def _add_ground_fts(conn):
+    if conn.dialect.name != 'sqlite':
+        return  # other databases search with ILIKE
+    # Very old catalogues predate the columns the index reads
+    columns = _column_names(conn, 'ground')
+    for column, ddl in (('materials', 'VARCHAR(300)'), ('city', 'VARCHAR(100)'), ('full_address', 'VARCHAR(300)')):
+        if column not in columns:
+            conn.execute(text(f'ALTER TABLE ground ADD COLUMN {column} {ddl}'))
+    for statement in GROUND_FTS_DDL:
+        conn.execute(text(statement))
+    conn.execute(text(GROUND_FTS_REBUILD))
+
+
+@migration(9, 'ground_material: one indexed row per ground material')
+def _add_ground_material(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS ground_material ('
+        'ground_id INTEGER NOT NULL REFERENCES ground (id), '
+        'material VARCHAR(50) NOT NULL, '
+        'PRIMARY KEY (ground_id, material))'
+    ))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_ground_material_material ON ground_material (material, ground_id)'))
+    conn.execute(text('DELETE FROM ground_material'))
+    rows = [{'ground_id': ground_id, 'material': key}
+            for ground_id, materials in conn.execute(text("SELECT id, materials FROM ground WHERE materials <> ''"))
+            for key in material_keys(materials)]
+    if rows:
+        conn.execute(text('INSERT INTO ground_material (ground_id, material) VALUES (:ground_id, :material)'), rows)
+
+
+def _rebuild_with_autoincrement(conn, table):
+    # SQLite can't change a primary key in place: copy the rows into a new
+    # table declared AUTOINCREMENT, swap it in and recreate the indexes
+    indexes = inspect(conn).get_indexes(table)
+    old = Table(table, MetaData(), autoload_with=conn)
+    new = old.to_metadata(old.metadata, name=f'{table}_rebuild')
+    new.dialect_options['sqlite']['autoincrement'] = True
+    new.indexes.clear()
+    new.create(conn)
+    columns = ', '.join(f'"{c.name}"' for c in old.columns)
+    conn.execute(text(f'INSERT INTO "{table}_rebuild" ({columns}) SELECT {columns} FROM "{table}"'))
+    conn.execute(text(f'DROP TABLE "{table}"'))
+    conn.execute(text(f'ALTER TABLE "{table}_rebuild" RENAME TO "{table}"'))
+    for index in indexes:
+        unique = 'UNIQUE ' if index['unique'] else ''
+        names = ', '.join(index['column_names'])
+        conn.execute(text(f'CREATE {unique}INDEX IF NOT EXISTS {index["name"]} ON "{table}" ({names})'))
+
+
+@migration(10, 'never reuse match, match_player and booking ids (SQLite AUTOINCREMENT)')
+def _autoincrement_pool_and_booking_ids(conn):
+    # Plain SQLite rowids hand the highest id out again once it is deleted, and
+    # retention deletes exactly those rows: a new pool could take an archived
+    # pool's id (colliding in match_archive) and its form_teams/notify_host job
+    # keys. PostgreSQL sequences never go back, so only SQLite needs this.
+    if conn.dialect.name != 'sqlite':
+        return
+    tables = inspect(conn).get_table_names()
+    for table, archive in (('match', 'match_archive'), ('match_player', 'match_player_archive'),
+                           ('booking', 'booking_archive')):
+        ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :t"),
+                           {'t': table}).scalar()
+        if 'AUTOINCREMENT' not in ddl.upper():
+            _rebuild_with_autoincrement(conn, table)
+        # Continue after every id ever handed out, archived ones included
+        used = [f'SELECT MAX(id) AS id FROM "{table}"']
+        if archive in tables:
+            used.append(f'SELECT MAX(id) FROM {archive}')
+        top = conn.execute(text(f'SELECT COALESCE(MAX(id), 0) FROM ({" UNION ALL ".join(used)})')).scalar()
+        conn.execute(text('DELETE FROM sqlite_sequence WHERE name = :t'), {'t': table})
+        conn.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:t, :seq)'), {'t': table, 'seq': top})
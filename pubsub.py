@@ -0,0 +1,76 @@
+"""
+In-process publish/subscribe hub used to push match pool updates to browsers.
+
+Routes publish a payload to a topic (for pools: ground id, date and time) and
+every open Server-Sent Events stream subscribed to that topic receives it.
+Subscribers live in this process only, so each worker serves the streams of
+the clients connected to it.
+"""
+import queue
+import threading
+
+
+class Subscription:
+    """One listener's queue of pending messages for a topic."""
+
+    def __init__(self, hub, topic, maxsize):
+        self.hub = hub
+        self.topic = topic
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout=None):
+        """Next message, or None if nothing arrived within ``timeout`` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put(self, message):
+        # A slow client only needs the newest state, so drop the oldest message
+        while True:
+            try:
+                self.queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class PubSubHub:
+    """Thread-safe topic -> subscribers registry."""
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic):
+        sub = Subscription(self, topic, self.maxsize)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.topic]
+
+    def has_subscribers(self, topic):
+        with self._lock:
+            return bool(self._subscribers.get(topic))
+
+    def publish(self, topic, message):
+        """Deliver ``message`` to every subscriber of ``topic``. Returns how many got it."""
+        with self._lock:
+            subs = list(self._subscribers.get(topic, ()))
+        for sub in subs:
+            sub.put(message)
+        return len(subs)
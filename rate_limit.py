@@ -0,0 +1,185 @@
+"""
+Token-bucket rate limiting for expensive or heavily polled routes.
+
+Every client gets a bucket per route and scope (its IP address, its
+session). A bucket holds up to ``capacity`` tokens and refills at ``rate``
+tokens a second; each request takes one. A client can burst up to the
+capacity and is then held to the refill rate; a denied request is told
+how long until the next token.
+
+Buckets live in a pluggable backend: ``MemoryBuckets`` (this process only)
+or ``SQLiteBuckets`` (a SQLite file every worker process shares, so running
+more workers doesn't multiply a client's allowance).
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+SCOPES = ('ip', 'session')
+
+_LIMIT = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+_SETTING = re.compile(r'^RATE_LIMIT_(\w+)_PER_(IP|SESSION)$')
+
+
+def parse_limit(spec):
+    """(capacity, tokens per second) for '10/minute', '100/5 minutes' etc. Empty means no limit (None)."""
+    if not spec:
+        return None
+    m = _LIMIT.match(str(spec))
+    if not m or int(m.group(1)) < 1:
+        raise ValueError(f"rate limit {spec!r} must look like '10/minute' (second, minute, hour or day)")
+    capacity = int(m.group(1))
+    period = int(m.group(2) or 1) * PERIODS[m.group(3)]
+    return capacity, capacity / period
+
+
+def rate_limits(config):
+    """{(route name, scope): (capacity, rate)} from the RATE_LIMIT_<NAME>_PER_IP/_PER_SESSION settings.
+
+    Raises ValueError on a malformed setting.
+    """
+    limits = {}
+    for key, value in config.items():
+        m = _SETTING.match(key)
+        if m:
+            limit = parse_limit(value)
+            if limit:
+                limits[(m.group(1).lower(), m.group(2).lower())] = limit
+    return limits
+
+
+def take_token(bucket, now, capacity, rate):
+    """Take one token from ``bucket`` (tokens, updated_at), or None for a new, full one.
+
+    Returns (tokens left, allowed, seconds until a token is available).
+    """
+    if bucket is None:
+        tokens = float(capacity)
+    else:
+        tokens = min(float(capacity), bucket[0] + max(0.0, now - bucket[1]) * rate)
+    if tokens >= 1:
+        return tokens - 1, True, 0.0
+    return tokens, False, (1 - tokens) / rate
+
+
+class MemoryBuckets:
+    """Thread-safe buckets for this process, at most ``maxsize`` of them.
+
+    The least recently used bucket is dropped first; a dropped bucket
+    comes back full, which only matters for clients that went quiet.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, allowed, retry_after = take_token(self._data.get(key), now, capacity, rate)
+            self._data[key] = (tokens, now)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return allowed, retry_after
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteBuckets:
+    """Buckets kept in a SQLite file, so several worker processes share them.
+
+    Each take is one short write transaction. Buckets idle for longer than
+    ``idle_seconds`` (enough to have refilled completely) are pruned now and
+    then.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path, idle_seconds=86400):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_bucket ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+            self._local.takes = 0
+        return conn
+
+    def take(self, key, capacity, rate):
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front, so two processes can't both spend the last token
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            bucket = conn.execute('SELECT tokens, updated_at FROM rate_bucket WHERE key = ?', (key,)).fetchone()
+            tokens, allowed, retry_after = take_token(bucket, now, capacity, rate)
+            conn.execute('INSERT OR REPLACE INTO rate_bucket (key, tokens, updated_at) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            self._local.takes += 1
+            if self._local.takes % self.PRUNE_EVERY == 0:
+                conn.execute('DELETE FROM rate_bucket WHERE updated_at < ?', (now - self.idle_seconds,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def clear(self):
+        self._conn().execute('DELETE FROM rate_bucket')
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM rate_bucket').fetchone()[0]
+
+
+class RateLimiter:
+    """Checks requests against the configured limits; allows everything while ``backend`` is None."""
+
+    def __init__(self, backend, limits=None):
+        self.backend = backend
+        self.limits = limits or {}
+
+    def hit(self, name, clients):
+        """Take a token from each of the client's buckets for route ``name``.
+
+        ``clients`` maps scope to client id, e.g. {'ip': '10.0.0.1', 'session': 'user:a@b.c'}.
+        Returns (allowed, seconds to wait before retrying).
+        """
+        if self.backend is None:
+            return True, 0.0
+        allowed, retry_after = True, 0.0
+        for scope in SCOPES:
+            limit = self.limits.get((name, scope))
+            if limit is None or not clients.get(scope):
+                continue
+            ok, wait = self.backend.take(f'{name}:{scope}:{clients[scope]}', *limit)
+            if not ok:
+                allowed, retry_after = False, max(retry_after, wait)
+        return allowed, retry_after
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
@@ -0,0 +1,120 @@
+"""
+Retention job: keeps the hot tables small as matches and bookings age.
+
+Each rule picks the rows it applies to with one indexed SELECT and then
+moves or deletes them with set-based statements, a batch of ids at a time.
+Every batch is its own transaction, so the job can be stopped at any point
+and only holds the write lock briefly. Rules, in order:
+
+- archive matches:    pools dated before the match cutoff move to
+                      match_archive / match_player_archive
+- archive bookings:   bookings dated before the booking cutoff move to
+                      booking_archive
+- orphaned members:   match_player rows whose pool no longer exists
+- orphaned schedule:  player_schedule rows whose booking or pool is gone
+- bot users:          dev_fill_match bots (no password, matching email
+                      pattern) that are no longer in any pool
+- finished jobs:      background jobs that succeeded before the job cutoff
+                      (failed ones are kept for inspection)
+- pool counts:        match.player_count recomputed where it has drifted
+
+The archive tables are created by ``db.create_all()`` from the models in
+app.py. Run it with ``flask --app app retention`` (``--dry-run`` to count).
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import bindparam, text
+
+_MATCH_ARCHIVE = [
+    'INSERT INTO match_archive (id, ground_id, date, time, status, host_email, player_count, archived_at)'
+    ' SELECT id, ground_id, date, time, status, host_email, player_count, :now FROM "match" WHERE id IN :ids',
+    'INSERT INTO match_player_archive (id, match_id, user_email, team, archived_at)'
+    ' SELECT id, match_id, user_email, team, :now FROM match_player WHERE match_id IN :ids',
+    "DELETE FROM player_schedule WHERE kind = 'match' AND ref_id IN :ids",
+    'DELETE FROM match_player WHERE match_id IN :ids',
+    'DELETE FROM "match" WHERE id IN :ids',
+]
+_BOOKING_ARCHIVE = [
+    'INSERT INTO booking_archive (id, ground_id, player_email, date, start_time, end_time, status, archived_at)'
+    ' SELECT id, ground_id, player_email, date, start_time, end_time, status, :now FROM booking WHERE id IN :ids',
+    "DELETE FROM player_schedule WHERE kind = 'booking' AND ref_id IN :ids",
+    'DELETE FROM booking WHERE id IN :ids',
+]
+
+# (rule, SELECT of the ids it applies to, statements run for each batch of ids)
+RULES = [
+    ('archive matches', 'SELECT id FROM "match" WHERE date < :match_cutoff ORDER BY id', _MATCH_ARCHIVE),
+    ('archive bookings', 'SELECT id FROM booking WHERE date < :booking_cutoff ORDER BY id', _BOOKING_ARCHIVE),
+    ('orphaned members',
+     'SELECT mp.id FROM match_player mp WHERE NOT EXISTS (SELECT 1 FROM "match" m WHERE m.id = mp.match_id)'
+     ' ORDER BY mp.id',
+     ['DELETE FROM match_player WHERE id IN :ids']),
+    ('orphaned schedule',
+     'SELECT ps.id FROM player_schedule ps WHERE'
+     " (ps.kind = 'match' AND NOT EXISTS (SELECT 1 FROM \"match\" m WHERE m.id = ps.ref_id))"
+     " OR (ps.kind = 'booking' AND NOT EXISTS (SELECT 1 FROM booking b WHERE b.id = ps.ref_id))"
+     ' ORDER BY ps.id',
+     ['DELETE FROM player_schedule WHERE id IN :ids']),
+    ('bot users',
+     'SELECT u.id FROM "user" u WHERE u.email LIKE :bot_pattern AND u.password_hash IS NULL'
+     ' AND NOT EXISTS (SELECT 1 FROM match_player mp WHERE mp.user_email = u.email) ORDER BY u.id',
+     ['DELETE FROM "user" WHERE id IN :ids']),
+    ('finished jobs', "SELECT id FROM job WHERE status = 'done' AND updated_at < :job_cutoff ORDER BY id",
+     ['DELETE FROM job WHERE id IN :ids']),
+]
+
+_POOL_COUNT = '(SELECT COUNT(*) FROM match_player mp WHERE mp.match_id = "match".id)'
+
+
+def _run_rule(engine, name, select_sql, statements, params, batch_size, dry_run, progress):
+    if dry_run:
+        with engine.connect() as conn:
+            pending = conn.execute(text(f'SELECT COUNT(*) FROM ({select_sql}) AS pending'), params).scalar()
+        progress(name, pending)
+        return pending
+    done = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(text(select_sql + ' LIMIT :batch_size'),
+                               dict(params, batch_size=batch_size)).scalars().all()
+            if not ids:
+                break
+            for sql in statements:
+                conn.execute(text(sql).bindparams(bindparam('ids', expanding=True)), dict(params, ids=ids))
+        done += len(ids)
+        progress(name, done)
+    return done
+
+
+def _recount_pools(engine, dry_run, progress):
+    where = f' WHERE player_count <> {_POOL_COUNT}'
+    with engine.begin() as conn:
+        if dry_run:
+            fixed = conn.execute(text('SELECT COUNT(*) FROM "match"' + where)).scalar()
+        else:
+            fixed = conn.execute(text(f'UPDATE "match" SET player_count = {_POOL_COUNT}' + where)).rowcount
+    progress('pool counts', fixed)
+    return fixed
+
+
+def run_retention(engine, match_days, booking_days, bot_email_pattern, batch_size=1000,
+                  dry_run=False, progress=None, today=None, job_days=7):
+    """Apply every retention rule. Returns {rule: rows affected (or that would be, on a dry run)}.
+
+    ``progress(rule, rows so far)`` is called after every batch.
+    """
+    today = today or date.today()
+    progress = progress or (lambda rule, rows: None)
+    params = {
+        # ISO strings compare correctly against SQLite's date text and cast on PostgreSQL
+        'match_cutoff': (today - timedelta(days=match_days)).isoformat(),
+        'booking_cutoff': (today - timedelta(days=booking_days)).isoformat(),
+        'job_cutoff': (today - timedelta(days=job_days)).isoformat(),
+        'bot_pattern': bot_email_pattern,
+        'now': datetime.now().isoformat(sep=' '),
+    }
+    results = {}
+    for name, select_sql, statements in RULES:
+        results[name] = _run_rule(engine, name, select_sql, statements, params, batch_size, dry_run, progress)
+    results['pool counts'] = _recount_pools(engine, dry_run, progress)
+    return results
@@ -0,0 +1,69 @@
+"""
+Full-text search over the grounds catalogue, and material name normalization.
+
+On SQLite, ``ground_fts`` is an FTS5 index over the name, city, location,
+full_address and materials columns of ``ground``. It is an external-content
+table: it stores only the index, and triggers on ``ground`` keep it in step
+with every insert, update and delete, whichever code path makes them (views,
+bulk import, retention). Other databases fall back to ILIKE matching in app.py.
+"""
+import html
+import re
+
+FTS_COLUMNS = ('name', 'city', 'location', 'full_address', 'materials')
+# bm25() weights in FTS_COLUMNS order: a hit in the name counts most
+FTS_WEIGHTS = (10.0, 5.0, 3.0, 1.0, 2.0)
+MAX_QUERY_TERMS = 8
+MAX_MATERIAL_LENGTH = 50  # ground_material.material
+
+_TERM = re.compile(r'\w+')
+_COLUMNS = ', '.join(FTS_COLUMNS)
+_NEW_VALUES = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+_OLD_VALUES = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+
+GROUND_FTS_DDL = [
+    # prefix='2 3' keeps short prefixes (what autocomplete sends first) as index lookups
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS ground_fts USING fts5({_COLUMNS}, content='ground', content_rowid='id',"
+    f" tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f'CREATE TRIGGER IF NOT EXISTS ground_fts_insert AFTER INSERT ON ground BEGIN'
+    f' INSERT INTO ground_fts (rowid, {_COLUMNS}) VALUES (new.id, {_NEW_VALUES}); END',
+    f'CREATE TRIGGER IF NOT EXISTS ground_fts_delete AFTER DELETE ON ground BEGIN'
+    f" INSERT INTO ground_fts (ground_fts, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD_VALUES}); END",
+    f'CREATE TRIGGER IF NOT EXISTS ground_fts_update AFTER UPDATE OF {_COLUMNS} ON ground BEGIN'
+    f" INSERT INTO ground_fts (ground_fts, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD_VALUES});"
+    f' INSERT INTO ground_fts (rowid, {_COLUMNS}) VALUES (new.id, {_NEW_VALUES}); END',
+]
+GROUND_FTS_REBUILD = "INSERT INTO ground_fts (ground_fts) VALUES ('rebuild')"
+
+
+def query_terms(q):
+    """The words of a search box input, lowercased, at most MAX_QUERY_TERMS."""
+    return [term.lower() for term in _TERM.findall(q or '')][:MAX_QUERY_TERMS]
+
+
+def fts_match_expression(q):
+    """FTS5 MATCH string for q: every term must match as a word prefix ("lah gym").
+
+    Terms are quoted, so FTS5 syntax in the input (AND, NEAR, column filters)
+    is searched for as plain words. Returns None when q has no words.
+    """
+    terms = query_terms(q)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}" *' for term in terms)
+
+
+def material_keys(materials):
+    """Normalized material names from a comma-separated string or a list of them.
+
+    Trimmed, lowercased and de-duplicated, so 'Goal Post' and ' goal post'
+    are one facet value. Stored (escaped) text is unescaped first.
+    """
+    if isinstance(materials, str):
+        materials = [materials]
+    keys = set()
+    for value in materials or []:
+        for part in html.unescape(str(value)).split(','):
+            if part.strip():
+                keys.add(part.strip().lower()[:MAX_MATERIAL_LENGTH])
+    return sorted(keys)
@@ -0,0 +1,113 @@
+"""
+In-memory grid index over ground coordinates for "grounds near me" lookups.
+
+The world is cut into square cells of ``cell_deg`` degrees. Each point lives
+in exactly one cell, so inserting, moving or removing a ground is O(1), and
+a query only visits the cells that overlap its search area instead of every
+ground in the catalogue.
+"""
+import heapq
+import math
+import threading
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """Thread-safe uniform-grid spatial index mapping ids to (lat, lng)."""
+
+    def __init__(self, cell_deg=0.1):
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._points = {}
+        self._lock = threading.RLock()
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, item_id):
+        return item_id in self._points
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+
+    def load(self, points):
+        """Replace the whole index with ``points``, an iterable of (id, lat, lng)."""
+        cells, index = {}, {}
+        for item_id, lat, lng in points:
+            cell = self._cell(lat, lng)
+            cells.setdefault(cell, {})[item_id] = (lat, lng)
+            index[item_id] = (lat, lng, cell)
+        with self._lock:
+            self._cells, self._points = cells, index
+
+    def upsert(self, item_id, lat, lng):
+        """Add a point, or move it if the id is already indexed."""
+        with self._lock:
+            self.remove(item_id)
+            cell = self._cell(lat, lng)
+            self._cells.setdefault(cell, {})[item_id] = (lat, lng)
+            self._points[item_id] = (lat, lng, cell)
+
+    def remove(self, item_id):
+        with self._lock:
+            point = self._points.pop(item_id, None)
+            if point is None:
+                return
+            cell = point[2]
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.pop(item_id, None)
+                if not bucket:
+                    del self._cells[cell]
+
+    def within_bbox(self, min_lat, min_lng, max_lat, max_lng, limit=None):
+        """Ids of points inside the box, as [(id, lat, lng)]."""
+        lo_r, lo_c = self._cell(min_lat, min_lng)
+        hi_r, hi_c = self._cell(max_lat, max_lng)
+        found = []
+        with self._lock:
+            # Walk whichever is smaller: the covered cells or the occupied cells
+            if (hi_r - lo_r + 1) * (hi_c - lo_c + 1) <= len(self._cells):
+                cells = ((r, c) for r in range(lo_r, hi_r + 1) for c in range(lo_c, hi_c + 1))
+            else:
+                cells = (cell for cell in self._cells if lo_r <= cell[0] <= hi_r and lo_c <= cell[1] <= hi_c)
+            for cell in cells:
+                for item_id, (lat, lng) in self._cells.get(cell, {}).items():
+                    if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+                        found.append((item_id, lat, lng))
+                        if limit is not None and len(found) >= limit:
+                            return found
+        return found
+
+    def nearest(self, lat, lng, radius_km, limit=20):
+        """Up to ``limit`` points within ``radius_km`` of (lat, lng), closest first.
+
+        Returns [(distance_km, id, lat, lng)].
+        """
+        # Bounding box of the search circle; longitude degrees shrink towards the poles
+        dlat = radius_km / KM_PER_DEG_LAT
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        dlng = min(180.0, radius_km / (KM_PER_DEG_LAT * cos_lat))
+        candidates = self.within_bbox(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+        scored = []
+        for item_id, plat, plng in candidates:
+            dist = haversine_km(lat, lng, plat, plng)
+            if dist <= radius_km:
+                scored.append((dist, item_id, plat, plng))
+        return heapq.nsmallest(limit, scored)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for join_match against SQLite in WAL mode.
+
+Starts several worker processes (like several WSGI workers), each with a
+few threads, that hammer /join_match for a handful of slots at once. When
+they are done it checks the invariants join_match promises:
+
+- exactly one Match row per ground/date/time slot
+- no pool holds more than 10 players, and player_count matches the members
+- every full pool went to pending_host with 5 players on each team
+- pools that are not full have no teams
+
+Usage:
+    python stress_join_match.py --processes 4 --threads 8 --players 200 --slots 5
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+DATE = datetime.date(2025, 6, 1)
+
+
+def _import_app(db_path):
+    import app as app_module
+    return app_module, app_module.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'})
+
+
+def seed(db_path, players, slots):
+    """Create a WAL-mode database with one ground, `players` players and nothing else."""
+    app_module, app = _import_app(db_path)
+    db = app_module.db
+    with app.app_context():
+        app_module.init_database()
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+        ground = app_module.Ground(name='Stress Arena', location='Lahore', rate=1000, img='x.jpg',
+                                   published=True, host_email='stress@host.com')
+        db.session.add(ground)
+        db.session.add_all([
+            app_module.User(email=f'stress{i}@example.com', name=f'Stress {i}', age=random.randint(16, 45), user_type='player')
+            for i in range(players)
+        ])
+        db.session.commit()
+        times = app_module.POOL_SLOT_TIMES[:slots]
+        return ground.id, times
+
+
+def worker(db_path, ground_id, times, emails, threads, results):
+    """One 'WSGI worker': a process running `threads` clients over its share of players."""
+    import threading
+    app_module, app = _import_app(db_path)
+    statuses = {}
+    lock = threading.Lock()
+
+    def run(my_emails):
+        client = app.test_client()
+        for email in my_emails:
+            with client.session_transaction() as sess:
+                sess['user_type'] = 'player'
+                sess['user_email'] = email
+            # Every player tries every slot, in random order, to maximise contention
+            for slot in random.sample(times, len(times)):
+                rv = client.post(f'/join_match/{ground_id}', data={'date': DATE.isoformat(), 'time': slot})
+                with lock:
+                    statuses[rv.status_code] = statuses.get(rv.status_code, 0) + 1
+
+    chunks = [emails[i::threads] for i in range(threads)]
+    pool = [threading.Thread(target=run, args=(chunk,)) for chunk in chunks]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put(statuses)
+
+
+def check_invariants(db_path, ground_id, times):
+    app_module, app = _import_app(db_path)
+    Match, MatchPlayer = app_module.Match, app_module.MatchPlayer
+    capacity = app.config['MATCH_CAPACITY']
+    problems = []
+    with app.app_context():
+        # Teams are formed by queued jobs; finish whatever the workers left
+        while app_module.run_jobs():
+            pass
+        for slot in times:
+            start = datetime.datetime.strptime(slot, '%H:%M').time()
+            matches = Match.query.filter_by(ground_id=ground_id, date=DATE, time=start).all()
+            if len(matches) != 1:
+                problems.append(f'{slot}: expected 1 match row, found {len(matches)}')
+                continue
+            match = matches[0]
+            members = MatchPlayer.query.filter_by(match_id=match.id).all()
+            teams = sorted(mp.team or '-' for mp in members)
+            if len(members) > capacity:
+                problems.append(f'{slot}: overfilled with {len(members)} players')
+            if match.player_count != len(members):
+                problems.append(f'{slot}: player_count {match.player_count} != {len(members)} members')
+            if len(members) == capacity:
+                jobs = app_module.Job.query.filter_by(idempotency_key=f'form_teams:{match.id}').count()
+                if jobs != 1:
+                    problems.append(f'{slot}: {jobs} form_teams jobs queued for a full pool')
+                if match.status != 'pending_host' or teams != ['A'] * (capacity // 2) + ['B'] * (capacity // 2):
+                    problems.append(f'{slot}: full pool not handed to host correctly ({match.status}, {teams})')
+            elif match.status != 'waiting' or any(t != '-' for t in teams):
+                problems.append(f'{slot}: partial pool has status {match.status} / teams {teams}')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--slots', type=int, default=5)
+    parser.add_argument('--db', help='SQLite file to use (default: a fresh temp file)')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='stress_join_'), 'stress.db')
+    ground_id, times = seed(db_path, args.players, args.slots)
+    emails = [f'stress{i}@example.com' for i in range(args.players)]
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(db_path, ground_id, times, emails[i::args.processes], args.threads, results))
+        for i in range(args.processes)
+    ]
+    started = time.perf_counter()
+    for p in procs:
+        p.start()
+    statuses = {}
+    for _ in procs:
+        for code, n in results.get().items():
+            statuses[code] = statuses.get(code, 0) + n
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    attempts = sum(statuses.values())
+    print(f'Database:        {db_path} (WAL)')
+    print(f'Workers:         {args.processes} processes x {args.threads} threads')
+    print(f'Join attempts:   {attempts} in {elapsed:.2f}s ({attempts / elapsed:.0f} req/s)')
+    print(f'HTTP statuses:   {dict(sorted(statuses.items()))}')
+
+    problems = check_invariants(db_path, ground_id, times)
+    if problems:
+        print('FAILED invariants:')
+        for p in problems:
+            print(f'  - {p}')
+        sys.exit(1)
+    print(f'OK: {len(times)} slots, one pool each, none overfilled, teams formed exactly once per full pool')
+
+
+if __name__ == '__main__':
+    main()
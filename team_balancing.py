@@ -0,0 +1,169 @@
+"""
+Team balancing for match pools of any size and any number of teams.
+
+Players are given as (key, age) pairs. Teams get sizes that differ by at
+most one, and the goal is to make the average age of every team as close
+as possible: the cost of a split is the gap between the oldest and the
+youngest team average.
+
+Small pools are solved exactly with a depth-first search over all distinct
+splits (see ``split_count``). Larger pools start from a snake draft and
+improve it with pairwise swaps. Both stop at a deadline, so a call never
+takes much longer than ``time_budget`` seconds.
+"""
+import math
+import time
+from collections import Counter
+
+TEAM_LABELS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def check_match_format(player_count, team_count):
+    """Raise ValueError unless a pool of player_count players can be split into team_count teams."""
+    if not 2 <= team_count <= len(TEAM_LABELS):
+        raise ValueError(f'MATCH_TEAM_COUNT must be between 2 and {len(TEAM_LABELS)}')
+    if player_count < team_count:
+        raise ValueError('MATCH_CAPACITY must be at least MATCH_TEAM_COUNT (one player per team)')
+
+
+def team_sizes(player_count, team_count):
+    """Sizes of each team, largest first, differing by at most one."""
+    base, extra = divmod(player_count, team_count)
+    return [base + (1 if i < extra else 0) for i in range(team_count)]
+
+
+def spread(teams_ages):
+    """Gap between the highest and lowest team average age."""
+    means = [sum(ages) / len(ages) for ages in teams_ages if ages]
+    return max(means) - min(means) if means else 0.0
+
+
+def split_count(sizes):
+    """Number of distinct ways to deal players into teams of these sizes."""
+    ways = math.factorial(sum(sizes))
+    for size in sizes:
+        ways //= math.factorial(size)
+    # Teams of equal size are interchangeable
+    for repeats in Counter(sizes).values():
+        ways //= math.factorial(repeats)
+    return ways
+
+
+def balance_teams(players, team_count=2, max_exact_splits=50000, time_budget=0.05):
+    """Split ``players`` into ``team_count`` teams with near-equal average age.
+
+    Returns a list of ``team_count`` lists of player keys. When there are at
+    most ``max_exact_splits`` possible splits (10 players in 2 teams have
+    126, 16 in 2 have 6435) every split is checked; otherwise the heuristic
+    result is used.
+    """
+    if team_count < 2:
+        raise ValueError('team_count must be at least 2')
+    if len(players) < team_count:
+        raise ValueError('need at least one player per team')
+    deadline = time.perf_counter() + time_budget
+    # Oldest first: big values placed early make both searches converge faster
+    ordered = sorted(players, key=lambda p: p[1], reverse=True)
+    sizes = team_sizes(len(ordered), team_count)
+    ages = [age for _, age in ordered]
+    assignment = _snake_draft(len(ordered), sizes)
+    assignment = _improve_by_swaps(ages, assignment, sizes, deadline)
+    if split_count(sizes) <= max_exact_splits:
+        assignment = _exact_search(ages, sizes, assignment, deadline)
+    teams = [[] for _ in sizes]
+    for (key, _), team in zip(ordered, assignment):
+        teams[team].append(key)
+    return teams
+
+
+def _cost(ages, assignment, sizes):
+    sums = [0.0] * len(sizes)
+    for age, team in zip(ages, assignment):
+        sums[team] += age
+    means = [total / size for total, size in zip(sums, sizes)]
+    return max(means) - min(means)
+
+
+def _snake_draft(n, sizes):
+    """Deal players 0, 1, 2... to teams in 0..k-1, k-1..0 order, skipping full teams."""
+    k = len(sizes)
+    counts = [0] * k
+    assignment = []
+    order = list(range(k)) + list(range(k - 1, -1, -1))
+    step = 0
+    for _ in range(n):
+        while counts[order[step % len(order)]] >= sizes[order[step % len(order)]]:
+            step += 1
+        team = order[step % len(order)]
+        assignment.append(team)
+        counts[team] += 1
+        step += 1
+    return assignment
+
+
+def _improve_by_swaps(ages, assignment, sizes, deadline):
+    """Swap pairs of players between teams while that lowers the cost."""
+    assignment = list(assignment)
+    best = _cost(ages, assignment, sizes)
+    improved = True
+    while improved and best > 0:
+        improved = False
+        for i in range(len(ages)):
+            if time.perf_counter() > deadline:
+                return assignment
+            for j in range(i + 1, len(ages)):
+                if assignment[i] == assignment[j] or ages[i] == ages[j]:
+                    continue
+                assignment[i], assignment[j] = assignment[j], assignment[i]
+                cost = _cost(ages, assignment, sizes)
+                if cost < best - 1e-12:
+                    best = cost
+                    improved = True
+                else:
+                    assignment[i], assignment[j] = assignment[j], assignment[i]
+    return assignment
+
+
+def _exact_search(ages, sizes, incumbent, deadline):
+    """Depth-first search over all splits, keeping the best found before the deadline."""
+    n, k = len(ages), len(sizes)
+    best = {'cost': _cost(ages, incumbent, sizes), 'assignment': list(incumbent)}
+    current = [0] * n
+    counts = [0] * k
+    sums = [0.0] * k
+    checks = [0]
+
+    def dfs(i):
+        if best['cost'] == 0:
+            return True
+        checks[0] += 1
+        if checks[0] % 1024 == 0 and time.perf_counter() > deadline:
+            return True
+        if i == n:
+            means = [sums[t] / sizes[t] for t in range(k)]
+            cost = max(means) - min(means)
+            if cost < best['cost'] - 1e-12:
+                best['cost'] = cost
+                best['assignment'] = list(current)
+            return False
+        seen_empty = set()
+        for team in range(k):
+            if counts[team] >= sizes[team]:
+                continue
+            # Empty teams of the same size are interchangeable: try only the first
+            if counts[team] == 0:
+                if sizes[team] in seen_empty:
+                    continue
+                seen_empty.add(sizes[team])
+            current[i] = team
+            counts[team] += 1
+            sums[team] += ages[i]
+            stop = dfs(i + 1)
+            counts[team] -= 1
+            sums[team] -= ages[i]
+            if stop:
+                return True
+        return False
+
+    dfs(0)
+    return best['assignment']
@@ -1,11 +1,22 @@
+import os
 import pytest
-from app import app, db, Ground
+from datetime import date, time, timedelta
+
+from sqlalchemy import create_engine, inspect, text
+from app import create_app, db, Ground, Match, MatchPlayer, User, Booking, invalidate_lobby_feed, invalidate_ground_index, rate_limiter, run_jobs, schedule_cache, response_cache
+from migrations import run_migrations, current_version, MIGRATIONS
+
+# An in-memory database keeps tests off the real instance/grounds.db
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'RESPONSE_CACHE_BACKEND': 'memory'})
 
 @pytest.fixture
 def client():
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     app.config['WTF_CSRF_ENABLED'] = False
+    invalidate_lobby_feed()
+    invalidate_ground_index()
+    schedule_cache.invalidate()
+    response_cache.clear()
+    rate_limiter.clear()
     with app.test_client() as client:
         with app.app_context():
             db.create_all()
@@ -54,4 +65,938 @@ def test_xss_sanitization(client):
     }, follow_redirects=True)
     # Now check that the script tag is escaped in the database or output
     rv2 = client.get('/grounds')
-    assert b'&lt;script&gt;' in rv2.data or b'<script>' not in rv2.data 
\ No newline at end of file
+    assert b'&lt;script&gt;' in rv2.data or b'<script>' not in rv2.data 
+
+
+def test_migrations_upgrade_legacy_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # Schema as it looked before profile images and indexes
+        conn.execute(text("CREATE TABLE user (id INTEGER PRIMARY KEY, email VARCHAR(120), name VARCHAR(120), age INTEGER, user_type VARCHAR(20))"))
+        conn.execute(text("CREATE TABLE ground (id INTEGER PRIMARY KEY, name VARCHAR(120), location VARCHAR(120), published BOOLEAN, host_email VARCHAR(120))"))
+        conn.execute(text('CREATE TABLE "match" (id INTEGER PRIMARY KEY, ground_id INTEGER, date VARCHAR(20), time VARCHAR(10), status VARCHAR(20), host_email VARCHAR(120))'))
+        conn.execute(text("CREATE TABLE match_player (id INTEGER PRIMARY KEY, match_id INTEGER, user_email VARCHAR(120), team VARCHAR(1))"))
+        conn.execute(text("CREATE TABLE booking (id INTEGER PRIMARY KEY, ground_id INTEGER, player_email VARCHAR(120), date VARCHAR(20), start_time VARCHAR(10), end_time VARCHAR(10), status VARCHAR(20))"))
+        # Two pools for the same slot, sharing one player
+        conn.execute(text('INSERT INTO "match" VALUES (1, 1, \'2025-01-18\', \'18:00\', \'waiting\', \'h@x.com\'), (2, 1, \'2025-01-18\', \'18:00\', \'waiting\', \'h@x.com\')'))
+        conn.execute(text("INSERT INTO match_player VALUES (1, 1, 'a@x.com', NULL), (2, 2, 'a@x.com', NULL), (3, 2, 'b@x.com', NULL)"))
+        # Free-text dates and times, one of them unreadable
+        conn.execute(text("INSERT INTO booking VALUES (1, 1, 'a@x.com', '2025-1-18', '9:30', '24:00', 'pending'), (2, 1, 'b@x.com', 'soon', 'noon', 'late', NULL)"))
+
+    assert run_migrations(engine) == [m[0] for m in MIGRATIONS]
+    assert run_migrations(engine) == []
+    assert current_version(engine) == MIGRATIONS[-1][0]
+
+    insp = inspect(engine)
+    assert 'profile_image_url' in {c['name'] for c in insp.get_columns('user')}
+    assert 'uq_match_ground_slot' in {i['name'] for i in insp.get_indexes('match')}
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT COUNT(*) FROM "match"')).scalar() == 1
+        members = conn.execute(text("SELECT match_id, user_email FROM match_player ORDER BY user_email")).fetchall()
+        bookings = conn.execute(text("SELECT id, date, start_time, end_time FROM booking")).fetchall()
+        slot = conn.execute(text('SELECT date, time, player_count FROM "match"')).one()
+    assert [tuple(r) for r in members] == [(1, 'a@x.com'), (1, 'b@x.com')]
+    assert tuple(slot) == ('2025-01-18', '18:00:00.000000', 2)
+    assert [tuple(r) for r in bookings] == [(1, '2025-01-18', '09:30:00.000000', '23:59:00.000000')]
+    with engine.connect() as conn:
+        schedule = conn.execute(text("SELECT player_email, kind, ref_id FROM player_schedule ORDER BY id")).fetchall()
+    assert [tuple(r) for r in schedule] == [('a@x.com', 'booking', 1), ('a@x.com', 'match', 1), ('b@x.com', 'match', 1)]
+
+
+def login_as_player(client, email, age=20):
+    with app.app_context():
+        if not User.query.filter_by(email=email).first():
+            db.session.add(User(email=email, name=email.split('@')[0], age=age, user_type='player'))
+            db.session.commit()
+    with client.session_transaction() as sess:
+        sess['user_type'] = 'player'
+        sess['user_email'] = email
+
+
+def test_lobby_feed_cached_and_invalidated_on_join(client):
+    with app.app_context():
+        ground = Ground.query.first()
+        day = date.today() + timedelta(days=1)
+        # A pool that already happened is not in the lobby
+        db.session.add(Match(ground_id=ground.id, date=date.today() - timedelta(days=1), time=time(18), status='waiting',
+                             host_email=ground.host_email))
+        match = Match(ground_id=ground.id, date=day, time=time(18), status='waiting', host_email=ground.host_email)
+        db.session.add(match)
+        db.session.commit()
+        db.session.add(MatchPlayer(match_id=match.id, user_email='p1@x.com'))
+        db.session.commit()
+        ground_id = ground.id
+
+    rv = client.get('/')
+    assert b'1/10 joined' in rv.data
+
+    # Rows written behind the app's back are not seen until invalidation
+    with app.app_context():
+        db.session.add(MatchPlayer(match_id=Match.query.filter_by(date=day).one().id, user_email='p2@x.com'))
+        db.session.commit()
+    assert b'1/10 joined' in client.get('/').data
+
+    login_as_player(client, 'p3@x.com')
+    client.post(f'/join_match/{ground_id}', data={'date': day.isoformat(), 'time': '18:00'})
+    assert b'3/10 joined' in client.get('/').data
+
+
+def test_match_pool_stream_pushes_updates(client):
+    with app.app_context():
+        ground_id = Ground.query.first().id
+    login_as_player(client, 'watcher@x.com')
+    rv = client.get(f'/api/match_pool/{ground_id}/stream?date=2025-02-01&time=18:00', buffered=False)
+    assert rv.mimetype == 'text/event-stream'
+    chunks = iter(rv.response)
+    first = next(chunks).decode()
+    assert first.startswith('event: pool') and '"count": 0' in first
+
+    other = app.test_client()
+    login_as_player(other, 'joiner@x.com')
+    other.post(f'/join_match/{ground_id}', data={'date': '2025-02-01', 'time': '18:00'})
+    update = next(chunks).decode()
+    assert '"count": 1' in update and 'joiner@x.com' in update
+    rv.close()
+
+
+def test_match_pools_batch_grid(client):
+    with app.app_context():
+        g1 = Ground.query.first()
+        g2 = Ground(name='Second', location='Lahore', rate=500, img='x.jpg', published=True, host_email='h2@x.com')
+        db.session.add(g2)
+        db.session.commit()
+        match = Match(ground_id=g1.id, date=date(2025, 3, 1), time=time(18), status='pending_host', host_email=g1.host_email)
+        db.session.add(match)
+        db.session.commit()
+        db.session.add_all([MatchPlayer(match_id=match.id, user_email=f'p{i}@x.com', team='A' if i < 3 else 'B') for i in range(5)])
+        # A three-team format: nobody on team C goes missing
+        three = Match(ground_id=g1.id, date=date(2025, 3, 1), time=time(20), status='pending_host', host_email=g1.host_email)
+        db.session.add(three)
+        db.session.flush()
+        db.session.add_all([MatchPlayer(match_id=three.id, user_email=f't{i}@x.com', team='ABC'[i % 3]) for i in range(6)])
+        # A legacy pool at a time that is no longer a slot
+        legacy = Match(ground_id=g2.id, date=date(2025, 3, 1), time=time(19), host_email=g2.host_email)
+        db.session.add(legacy)
+        db.session.flush()
+        db.session.add(MatchPlayer(match_id=legacy.id, user_email='l@x.com'))
+        db.session.commit()
+        ids = (g1.id, g2.id)
+
+    rv = client.get(f'/api/match_pools?ground_ids={ids[0]},{ids[1]}&date=2025-03-01')
+    data = rv.get_json()
+    assert data['slots'][0] == '06:00' and data['slots'][-1] == '22:00'
+    slot = data['grounds'][str(ids[0])]['18:00']
+    assert (slot['count'], slot['team_a'], slot['team_b'], slot['status']) == (5, 3, 2, 'pending_host')
+    assert data['grounds'][str(ids[1])]['18:00']['count'] == 0
+    slot = data['grounds'][str(ids[0])]['20:00']
+    assert slot['count'] == 6 and slot['teams'] == {'A': 2, 'B': 2, 'C': 2}
+    assert data['grounds'][str(ids[1])]['19:00']['count'] == 1
+
+    # New pools only start on a slot
+    login_as_player(client, 'offgrid@x.com')
+    client.post(f'/join_match/{ids[1]}', data={'date': '2025-03-02', 'time': '19:00'})
+    with app.app_context():
+        assert Match.query.filter_by(ground_id=ids[1], date=date(2025, 3, 2)).count() == 0
+    assert client.get('/api/match_pools?ground_ids=a,b&date=2025-03-01').status_code == 400
+
+    for capacity, team_count in ((1, 2), (10, 1), (40, 27)):
+        with pytest.raises(ValueError):
+            create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'MATCH_CAPACITY': capacity,
+                        'MATCH_TEAM_COUNT': team_count})
+
+
+def test_join_pool_caps_at_capacity_and_forms_teams_once(client):
+    from app import join_pool
+    MATCH_CAPACITY = app.config['MATCH_CAPACITY']
+    with app.app_context():
+        ground = Ground.query.first()
+        db.session.add_all([User(email=f'j{i}@x.com', age=18 + i, user_type='player') for i in range(MATCH_CAPACITY + 1)])
+        db.session.commit()
+        day, start = date(2025, 4, 1), time(20)
+        outcomes = [join_pool(ground, day, start, f'j{i}@x.com')[1] for i in range(MATCH_CAPACITY + 1)]
+        assert outcomes[:MATCH_CAPACITY - 1] == ['joined'] * (MATCH_CAPACITY - 1)
+        assert outcomes[MATCH_CAPACITY - 1] == 'teams_queued'
+        assert outcomes[MATCH_CAPACITY] == 'full'
+        assert join_pool(ground, day, start, 'j0@x.com')[1] == 'already_joined'
+
+        # Teams are formed by the queued job, once however often it runs
+        match = Match.query.filter_by(ground_id=ground.id, date=day, time=start).one()
+        assert match.status == 'waiting'
+        run_jobs()
+        run_jobs()
+        assert join_pool(ground, day, start, f'j{MATCH_CAPACITY}@x.com')[1] == 'closed'
+        match = Match.query.filter_by(ground_id=ground.id, date=day, time=start).one()
+        teams = [mp.team for mp in MatchPlayer.query.filter_by(match_id=match.id)]
+        assert match.status == 'pending_host' and match.player_count == MATCH_CAPACITY
+        assert sorted(teams) == ['A'] * 5 + ['B'] * 5
+
+
+def test_join_pool_uses_the_app_match_format():
+    from app import join_pool
+    # 2-a-side in three teams; the module-level app keeps the default 10/2
+    small = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                        'MATCH_CAPACITY': 6, 'MATCH_TEAM_COUNT': 3})
+    with small.app_context():
+        db.create_all()
+        ground = Ground(name='Small Ground', location='Test City', rate=500, img='s.jpg', published=True,
+                        host_email='test@host.com', materials='Football', ground_use='Football')
+        db.session.add(ground)
+        db.session.add_all([User(email=f's{i}@x.com', age=20 + i, user_type='player') for i in range(7)])
+        db.session.commit()
+        day, start = date(2025, 4, 2), time(18)
+        outcomes = [join_pool(ground, day, start, f's{i}@x.com')[1] for i in range(7)]
+        assert outcomes == ['joined'] * 5 + ['teams_queued', 'full']
+        run_jobs()
+        match = Match.query.filter_by(ground_id=ground.id, date=day, time=start).one()
+        teams = [mp.team for mp in MatchPlayer.query.filter_by(match_id=match.id)]
+        assert match.status == 'pending_host' and match.player_count == 6
+        assert sorted(teams) == ['A', 'A', 'B', 'B', 'C', 'C']
+    assert app.config['MATCH_CAPACITY'] == 10
+
+
+def test_grid_index_nearest_and_bbox():
+    from spatial_index import GridIndex, haversine_km
+    index = GridIndex(cell_deg=0.1)
+    index.upsert('lahore', 31.5204, 74.3587)
+    index.upsert('model_town', 31.4805, 74.3239)
+    index.upsert('karachi', 24.8607, 67.0011)
+    assert round(haversine_km(31.5204, 74.3587, 24.8607, 67.0011)) == 1033
+    hits = index.nearest(31.5204, 74.3587, radius_km=20, limit=5)
+    assert [h[1] for h in hits] == ['lahore', 'model_town']
+    index.upsert('model_town', 24.9, 67.1)  # moved
+    assert [h[1] for h in index.nearest(31.5204, 74.3587, 20)] == ['lahore']
+    assert {h[0] for h in index.within_bbox(24, 66, 26, 68)} == {'karachi', 'model_town'}
+    index.remove('karachi')
+    assert len(index) == 2
+
+
+def test_grounds_near_api_tracks_publishing(client):
+    with app.app_context():
+        near = Ground(name='Near', location='Lahore', rate=1, img='x', published=True, host_email='n@x.com', latitude=31.52, longitude=74.35)
+        far = Ground(name='Far', location='Karachi', rate=1, img='x', published=True, host_email='f@x.com', latitude=24.86, longitude=67.0)
+        draft = Ground(name='Draft', location='Lahore', rate=1, img='x', published=False, host_email='d@x.com', latitude=31.53, longitude=74.36)
+        db.session.add_all([near, far, draft])
+        db.session.commit()
+        draft_id = draft.id
+
+    rv = client.get('/api/grounds/near?lat=31.5204&lng=74.3587&radius=25')
+    assert [g['name'] for g in rv.get_json()['grounds']] == ['Near']
+
+    with client.session_transaction() as sess:
+        sess['user_type'] = 'host'
+        sess['user_email'] = 'd@x.com'
+    client.post(f'/publish-ground/{draft_id}')
+    names = [g['name'] for g in client.get('/api/grounds/near?lat=31.5204&lng=74.3587&radius=25').get_json()['grounds']]
+    assert names == ['Near', 'Draft']
+
+    rv = client.get('/api/grounds/within?min_lat=24&min_lng=66&max_lat=26&max_lng=68')
+    assert [g['name'] for g in rv.get_json()['grounds']] == ['Far']
+    assert client.get('/api/grounds/near?lat=abc&lng=1').status_code == 400
+    for bad in ('min_lat=-inf&min_lng=66&max_lat=26&max_lng=68', 'min_lat=nan&min_lng=66&max_lat=26&max_lng=68',
+                'min_lat=24&min_lng=-181&max_lat=26&max_lng=68', 'min_lat=26&min_lng=66&max_lat=24&max_lng=68'):
+        assert client.get(f'/api/grounds/within?{bad}').status_code == 400
+
+
+def test_grounds_keyset_pagination(client):
+    with app.app_context():
+        db.session.add_all([
+            Ground(name=f'Paged {i}', location='Lahore', rate=1, img='x', published=True, host_email=f'pg{i}@x.com')
+            for i in range(5)
+        ])
+        db.session.add(Ground(name='Hidden', location='Lahore', rate=1, img='x', published=False, host_email='hid@x.com'))
+        db.session.commit()
+
+    seen, cursor = [], 0
+    while True:
+        data = client.get(f'/api/grounds?limit=2&after={cursor}').get_json()
+        seen += [g['name'] for g in data['grounds']]
+        if not data['next_cursor']:
+            break
+        cursor = data['next_cursor']
+    assert seen == ['Test Ground'] + [f'Paged {i}' for i in range(5)]
+
+    original = app.config['GROUNDS_PAGE_SIZE']
+    app.config['GROUNDS_PAGE_SIZE'] = 2
+    try:
+        page = client.get('/grounds').data
+        assert b'Paged 0' in page and b'Paged 1' not in page and b'Load more grounds' in page
+        html = client.get('/api/grounds?html=1&after=2').get_json()['html']
+        assert 'Paged 1' in html and 'ground-card' in html
+    finally:
+        app.config['GROUNDS_PAGE_SIZE'] = original
+
+
+def test_signup_and_login_use_persistent_credentials(client):
+    rv = client.post('/signup/player', data={
+        'name': 'Ali', 'age': '20', 'email': 'ali@x.com', 'phone': '0300', 'password': 'secret1'
+    })
+    assert rv.status_code == 302
+    with app.app_context():
+        user = User.query.filter_by(email='ali@x.com').one()
+        assert user.password_hash and user.password_hash != 'secret1'
+
+    # A fresh client (think: another worker) can log in from the database alone
+    other = app.test_client()
+    assert b'Invalid email or password' in other.post('/login/player', data={'email': 'ali@x.com', 'password': 'nope'}).data
+    rv = other.post('/login/player', data={'email': 'ali@x.com', 'password': 'secret1'})
+    assert rv.status_code == 302 and rv.location.endswith('/grounds')
+    # Players cannot use the host login
+    assert b'Invalid email or password' in other.post('/login/host', data={'email': 'ali@x.com', 'password': 'secret1'}).data
+
+
+def test_login_upgrades_hash_when_method_changes(client):
+    from app import hash_password
+    with app.app_context():
+        db.session.add(User(email='old@x.com', age=30, user_type='host',
+                            password_hash=hash_password('pw')))
+        db.session.commit()
+    original = app.config['PASSWORD_HASH_METHOD']
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    try:
+        assert client.post('/login/host', data={'email': 'old@x.com', 'password': 'pw'}).status_code == 302
+        with app.app_context():
+            assert User.query.filter_by(email='old@x.com').one().password_hash.startswith('pbkdf2:sha256:1000$')
+    finally:
+        app.config['PASSWORD_HASH_METHOD'] = original
+
+
+def test_balance_teams_exact_and_multi_team():
+    from itertools import combinations
+    from team_balancing import balance_teams, spread, team_sizes
+    ages = [16, 17, 19, 22, 23, 25, 30, 31, 38, 44]
+    players = [(f'p{i}', age) for i, age in enumerate(ages)]
+    teams = balance_teams(players, 2)
+    by_key = dict(players)
+    got = spread([[by_key[k] for k in team] for team in teams])
+    best = min(
+        spread([[ages[i] for i in combo], [ages[i] for i in range(10) if i not in combo]])
+        for combo in combinations(range(10), 5)
+    )
+    assert sorted(len(t) for t in teams) == [5, 5] and abs(got - best) < 1e-9
+
+    teams = balance_teams([(i, 15 + i) for i in range(22)], 3)
+    assert sorted(len(t) for t in teams) == [7, 7, 8]
+    assert sorted(k for team in teams for k in team) == list(range(22))
+    assert team_sizes(14, 2) == [7, 7]
+
+
+def test_day_schedule_conflicts():
+    from availability import DaySchedule
+    schedule = DaySchedule([(600, 720, 'a'), (700, 760, 'b'), (900, 960, 'c')])
+    assert len(schedule) == 2  # a and b overlap, so they share a block
+    assert schedule.conflicts(760, 900) == []
+    assert schedule.conflicts(759, 800) == ['a', 'b']
+    assert schedule.conflicts(500, 1000) == ['a', 'b', 'c']
+    schedule.add(800, 900, 'd')
+    assert schedule.free(360, 1440) == [(360, 600), (760, 800), (960, 1440)]
+
+
+def test_booking_overlaps_rejected(client):
+    with app.app_context():
+        ground = Ground.query.first()
+        db.session.add(Booking(ground_id=ground.id, player_email='a@x.com', date=date(2025, 5, 1),
+                               start_time=time(10), end_time=time(12), status='approved'))
+        db.session.add(Match(ground_id=ground.id, date=date(2025, 5, 1), time=time(18), status='confirmed',
+                             host_email=ground.host_email, player_count=10))
+        db.session.commit()
+        ground_id = ground.id
+    login_as_player(client, 'b@x.com')
+
+    for start, end in [('11:00', '13:00'), ('19:00', '21:00'), ('15:00', '14:00')]:
+        rv = client.post(f'/final-booking/{ground_id}', data={'date': '2025-05-01', 'start_time': start, 'end_time': end})
+        assert rv.status_code == 200
+    rv = client.post(f'/final-booking/{ground_id}', data={'date': '2025-05-01', 'start_time': '12:00', 'end_time': '14:00'})
+    assert rv.status_code == 302
+
+    data = client.get(f'/api/grounds/{ground_id}/availability?date=2025-05-01').get_json()
+    assert [(b['start'], b['end']) for b in data['busy']] == [('10:00', '12:00'), ('18:00', '20:00')]
+    assert data['free'][0] == {'start': '06:00', 'end': '10:00'}
+
+    # Two pending requests for the same time: the host can only approve one
+    with app.app_context():
+        db.session.add(Booking(ground_id=ground_id, player_email='c@x.com', date=date(2025, 5, 1),
+                               start_time=time(13), end_time=time(15), status='pending'))
+        db.session.commit()
+        first, second = [b.id for b in Booking.query.filter_by(status='pending').order_by(Booking.id)]
+    with client.session_transaction() as sess:
+        sess['user_type'] = 'host'
+        sess['user_email'] = 'test@host.com'
+    client.post(f'/booking/{first}/approve')
+    client.post(f'/booking/{second}/approve')
+    with app.app_context():
+        assert db.session.get(Booking, first).status == 'approved'
+        assert db.session.get(Booking, second).status == 'pending'
+
+    # A waiting pool doesn't block a booking, so the host can't confirm the pool on top of it later
+    with app.app_context():
+        match = Match(ground_id=ground_id, date=date(2025, 5, 1), time=time(8), status='waiting',
+                      host_email='test@host.com', player_count=10)
+        booking = Booking(ground_id=ground_id, player_email='d@x.com', date=date(2025, 5, 1),
+                          start_time=time(9), end_time=time(10), status='pending')
+        db.session.add_all([match, booking])
+        db.session.commit()
+        match_id, booking_id = match.id, booking.id
+    client.post(f'/booking/{booking_id}/approve')
+    with app.app_context():
+        db.session.get(Match, match_id).status = 'pending_host'
+        db.session.commit()
+    rv = client.post(f'/match/{match_id}/accept', follow_redirects=True)
+    assert b'Cannot confirm' in rv.data
+    with app.app_context():
+        assert db.session.get(Booking, booking_id).status == 'approved'
+        assert db.session.get(Match, match_id).status == 'pending_host'
+    client.post(f'/booking/{booking_id}/decline')
+    client.post(f'/match/{match_id}/accept')
+    with app.app_context():
+        assert db.session.get(Match, match_id).status == 'confirmed'
+
+
+def test_matches_range_api(client):
+    with app.app_context():
+        ground = Ground.query.first()
+        for day, hour in [(1, 18), (3, 8), (7, 20), (9, 6)]:
+            db.session.add(Match(ground_id=ground.id, date=date(2025, 7, day), time=time(hour), status='waiting',
+                                 host_email=ground.host_email))
+        db.session.commit()
+        ground_id = ground.id
+
+    data = client.get('/api/matches?from=2025-07-01').get_json()
+    assert data['to'] == '2025-07-07'
+    assert [(m['date'], m['time']) for m in data['matches']] == [
+        ('2025-07-01', '18:00'), ('2025-07-03', '08:00'), ('2025-07-07', '20:00')]
+    data = client.get(f'/api/matches?from=2025-07-03&to=2025-07-09&ground_id={ground_id}').get_json()
+    assert len(data['matches']) == 3
+    assert client.get('/api/matches?from=2025-07-09&to=2025-07-01').status_code == 400
+    assert client.get('/api/matches?from=July').status_code == 400
+
+
+def test_host_dashboard_query_count_is_constant(client):
+    MATCH_CAPACITY = app.config['MATCH_CAPACITY']
+    with app.app_context():
+        ground = Ground.query.first()
+        db.session.add_all([Booking(ground_id=ground.id, player_email=f'b{i}@x.com', date=date(2025, 8, 1),
+                                    start_time=time(10), end_time=time(11), status='pending') for i in range(30)])
+        db.session.add_all([User(email=f'r{i}@x.com', name=f'Roster {i}', age=20 + i, user_type='player')
+                            for i in range(MATCH_CAPACITY)])
+        db.session.commit()
+        ground_id = ground.id
+    with client.session_transaction() as sess:
+        sess['user_type'] = 'host'
+        sess['user_email'] = 'test@host.com'
+
+    def add_pending_match(hour):
+        with app.app_context():
+            match = Match(ground_id=ground_id, date=date(2025, 8, 2), time=time(hour), status='pending_host',
+                          host_email='test@host.com', player_count=MATCH_CAPACITY)
+            db.session.add(match)
+            db.session.commit()
+            db.session.add_all([MatchPlayer(match_id=match.id, user_email=f'r{i}@x.com', team='AB'[i % 2])
+                                for i in range(MATCH_CAPACITY)])
+            db.session.commit()
+
+    app.debug = True
+    try:
+        add_pending_match(8)
+        rv = client.get('/host/dashboard')
+        one_match = int(rv.headers['X-Query-Count'])
+        for hour in (10, 12, 14):
+            add_pending_match(hour)
+        rv = client.get('/host/dashboard')
+        assert int(rv.headers['X-Query-Count']) == one_match
+    finally:
+        app.debug = False
+    assert b'30 Pending' in rv.data and b'Roster 3 (23)' in rv.data
+    assert rv.data.count(b'b0@x.com') == 0 and b'b29@x.com' in rv.data  # newest first, one page
+    cursor = rv.data.split(b'before=')[1].split(b'"')[0].decode()
+    older = client.get(f'/host/dashboard?before={cursor}')
+    assert b'b0@x.com' in older.data and b'Older requests' not in older.data
+
+
+def test_player_schedule_follows_bookings_and_pools(client):
+    from app import join_pool
+    MATCH_CAPACITY = app.config['MATCH_CAPACITY']
+    with app.app_context():
+        ground_id = Ground.query.first().id
+    login_as_player(client, 'sched@x.com')
+    client.post(f'/final-booking/{ground_id}', data={'date': '2025-09-01', 'start_time': '10:00', 'end_time': '11:00'})
+    client.post(f'/join_match/{ground_id}', data={'date': '2025-09-02', 'time': '18:00'})
+    items = client.get('/api/player/schedule').get_json()['items']
+    assert [(i['kind'], i['date'], i['status'], i['ground']['name']) for i in items] == [
+        ('match', '2025-09-02', 'waiting', 'Test Ground'), ('booking', '2025-09-01', 'pending', 'Test Ground')]
+
+    # Filling the pool assigns teams; the host then approves the booking
+    with app.app_context():
+        ground = db.session.get(Ground, ground_id)
+        db.session.add_all([User(email=f'f{i}@x.com', age=30, user_type='player') for i in range(MATCH_CAPACITY - 1)])
+        db.session.commit()
+        for i in range(MATCH_CAPACITY - 1):
+            join_pool(ground, date(2025, 9, 2), time(18), f'f{i}@x.com')
+        run_jobs()
+        booking_id = Booking.query.filter_by(player_email='sched@x.com').one().id
+    host = app.test_client()
+    with host.session_transaction() as sess:
+        sess['user_type'] = 'host'
+        sess['user_email'] = 'test@host.com'
+    host.post(f'/booking/{booking_id}/approve')
+
+    items = client.get('/api/player/schedule?since=2025-09-02').get_json()['items']
+    assert len(items) == 1 and items[0]['status'] == 'pending_host' and items[0]['team'] in ('A', 'B')
+    rv = client.get('/player/requests')
+    assert b'Test Ground' in rv.data and b'Approved' in rv.data
+    assert b'Pending Host' in client.get('/player/dashboard').data
+    assert app.test_client().get('/api/player/schedule').status_code == 401
+
+
+def test_catalogue_served_from_response_cache_until_published(client):
+    with app.app_context():
+        db.session.add(Ground(name='Hidden Turf', location='Multan', rate=800, img='x.jpg', published=False,
+                              host_email='test@host.com'))
+        db.session.commit()
+        hidden_id = Ground.query.filter_by(name='Hidden Turf').one().id
+    assert client.get('/grounds').headers['X-Cache'] == 'MISS'
+    app.debug = True
+    try:
+        rv = client.get('/grounds')
+        assert rv.headers['X-Cache'] == 'HIT' and rv.headers['X-Query-Count'] == '0'
+    finally:
+        app.debug = False
+    assert b'Hidden Turf' not in rv.data
+
+    host = app.test_client()
+    with host.session_transaction() as sess:
+        sess['user_type'] = 'host'
+        sess['user_email'] = 'test@host.com'
+    host.post(f'/publish-ground/{hidden_id}')
+    rv = client.get('/grounds')
+    assert rv.headers['X-Cache'] == 'MISS' and b'Hidden Turf' in rv.data
+    # Logged-in viewers get their own entries (the navbar shows who they are)
+    login_as_player(client, 'viewer@x.com')
+    assert client.get('/grounds').headers['X-Cache'] == 'MISS'
+
+
+@pytest.mark.parametrize('backend', ['memory', 'disk'])
+def test_response_cache_backends_evict_and_invalidate(tmp_path, backend):
+    import time as clock
+    from cache import DiskCache, LRUCache, ResponseCache
+    store = LRUCache(maxsize=3, ttl=60) if backend == 'memory' else DiskCache(str(tmp_path / 'c.db'), maxsize=3, ttl=60)
+    for key in 'abcd':
+        store.set(key, key.upper())
+        clock.sleep(0.001)
+    assert len(store) == 3 and store.get('a') is None and store.get('d') == 'D'
+
+    pages = ResponseCache(store)
+    key = pages.key('grounds', [('after', '5')], (None, None), ['grounds'])
+    pages.set(key, b'page')
+    assert pages.get(pages.key('grounds', [('after', '5')], (None, None), ['grounds'])) == b'page'
+    pages.invalidate('lobby')
+    assert pages.key('grounds', [('after', '5')], (None, None), ['grounds']) == key
+    pages.invalidate('grounds')
+    assert pages.get(pages.key('grounds', [('after', '5')], (None, None), ['grounds'])) is None
+
+
+def test_demo_accounts_created_on_first_login_and_by_seed(client):
+    with app.app_context():
+        assert User.query.filter_by(email='player@demo.com').first() is None
+    rv = client.post('/login/player', data={'email': 'player@demo.com', 'password': 'demo123'})
+    assert rv.status_code == 302
+    with app.app_context():
+        assert User.query.filter_by(email='player@demo.com').one().name == 'Demo Player'
+        assert User.query.filter_by(email='demo@host.com').first() is None
+
+    result = app.test_cli_runner().invoke(args=['seed'])
+    assert result.exit_code == 0 and 'Added 0 grounds' in result.output
+    with app.app_context():
+        assert User.query.filter_by(email='demo@host.com').one().password_hash
+
+
+def test_metrics_endpoint_reports_routes_queries_and_slow_queries(client):
+    from app import metrics
+    metrics.reset()
+    client.get('/grounds')
+    client.get('/grounds?after=1')
+    app.config['SLOW_QUERY_MS'] = 0  # every statement counts as slow
+    try:
+        client.get('/api/grounds')
+    finally:
+        app.config['SLOW_QUERY_MS'] = 200
+    body = client.get('/metrics').data.decode()
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'http_requests_total{method="GET",route="/grounds",status="200"} 2' in body
+    assert 'http_request_duration_seconds_count{route="/grounds"} 2' in body
+    assert 'http_request_queries_bucket{route="/grounds",le="+Inf"} 2' in body
+    assert 'db_slow_queries_total{route="/api/grounds"}' in body
+    assert metrics.value('http_request_queries', {'route': '/api/grounds'}).sum >= 1
+
+    app.config['METRICS_TOKEN'] = 'secret'
+    try:
+        assert client.get('/metrics').status_code == 401
+        assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+    finally:
+        app.config['METRICS_TOKEN'] = None
+
+    # A statement that fails leaves no timing state behind on the connection
+    from sqlalchemy.exc import OperationalError
+    with app.app_context():
+        with db.engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conn.execute(text('SELECT * FROM no_such_table'))
+                conn.rollback()
+            assert conn.execute(text('SELECT 1')).scalar() == 1
+            assert not conn.info.get('query_started')
+
+
+def test_grounds_import_validates_and_export_round_trips(client, tmp_path):
+    source = tmp_path / 'grounds.csv'
+    source.write_text(
+        'name,host_email,city,latitude,longitude,rate,materials,ground_use\n'
+        'Gymkhana Ground,gym@host.com,Lahore,31.55,74.34,2500,"Grass,Lights",Football\n'
+        'Model Town Park,mt@host.com,Lahore,31.48,74.32,-5,Grass,Football\n'
+        'Bad Coordinates,bc@host.com,Lahore,95,74.3,1000,,Football\n'
+        'No City,nc@host.com,,31.4,74.3,1000,,Football\n'
+        'DHA Arena,dha@host.com,Lahore,31.47,74.41,3000,,Futsal\n'
+    )
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['import-grounds', str(source), '--batch-size', '1', '--publish'])
+    assert result.exit_code == 1
+    assert 'Imported 2 grounds, rejected 3.' in result.output
+    assert 'line 3: Rate must be a positive number.' in result.output
+    assert 'line 4: Please enter valid coordinates' in result.output
+    assert 'line 5: Missing city.' in result.output
+    with app.app_context():
+        gym = Ground.query.filter_by(name='Gymkhana Ground').one()
+        assert (gym.location, gym.rate, gym.materials, gym.published) == ('Lahore', 2500, 'Grass,Lights', True)
+    assert b'DHA Arena' in client.get('/grounds').data
+
+    exported = tmp_path / 'grounds.jsonl'
+    result = runner.invoke(args=['export-grounds', str(exported), '--published-only'])
+    assert result.exit_code == 0
+    lines = exported.read_text().splitlines()
+    assert len(lines) == 3 and '"materials": ["Grass", "Lights"]' in lines[1]
+
+    with app.app_context():
+        Ground.query.delete()
+        db.session.commit()
+    result = runner.invoke(args=['import-grounds', str(exported)])
+    assert 'Imported 2 grounds, rejected 1.' in result.output  # Test Ground has no coordinates
+    with app.app_context():
+        assert Ground.query.filter_by(name='Gymkhana Ground').one().materials == 'Grass,Lights'
+
+
+def test_retention_archives_past_rows_and_purges_bots(client):
+    from app import MatchArchive, MatchPlayerArchive, BookingArchive, PlayerSchedule
+    from migrations import rebuild_player_schedule
+    old, soon = date.today() - timedelta(days=120), date.today() + timedelta(days=1)
+    with app.app_context():
+        past = Match(ground_id=1, date=old, time=time(18), host_email='test@host.com', player_count=2)
+        live = Match(ground_id=1, date=soon, time=time(18), host_email='test@host.com', player_count=5)
+        db.session.add_all([past, live])
+        db.session.flush()
+        db.session.add_all([
+            MatchPlayer(match_id=past.id, user_email='bot1@example.com'),
+            MatchPlayer(match_id=past.id, user_email='p@x.com'),
+            MatchPlayer(match_id=live.id, user_email='bot2@example.com'),
+            MatchPlayer(match_id=999, user_email='ghost@x.com'),
+            User(email='bot1@example.com', user_type='player'),
+            User(email='bot2@example.com', user_type='player'),
+            Booking(ground_id=1, player_email='p@x.com', date=old, start_time=time(8), end_time=time(9)),
+            Booking(ground_id=1, player_email='p@x.com', date=soon, start_time=time(8), end_time=time(9)),
+        ])
+        db.session.commit()
+        with db.engine.begin() as conn:
+            rebuild_player_schedule(conn)
+        db.session.add(PlayerSchedule(player_email='p@x.com', kind='booking', ref_id=999, ground_id=1,
+                                      date=soon, start_time=time(8), status='pending'))
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['retention', '--dry-run'])
+    assert 'archive matches: 1 (dry run)' in result.output and 'orphaned members: 1 (dry run)' in result.output
+    with app.app_context():
+        assert Match.query.count() == 2
+
+    result = runner.invoke(args=['retention', '--batch-size', '1'])
+    assert result.exit_code == 0
+    for line in ['archive matches: 1', 'archive bookings: 1', 'orphaned members: 1', 'orphaned schedule: 1',
+                 'bot users: 1', 'pool counts: 1']:
+        assert line in result.output
+    with app.app_context():
+        assert [m.date for m in Match.query.all()] == [soon]
+        assert Match.query.one().player_count == 1
+        assert MatchArchive.query.one().date == old and MatchPlayerArchive.query.count() == 2
+        assert BookingArchive.query.one().date == old and Booking.query.one().date == soon
+        assert [u.email for u in User.query.all()] == ['bot2@example.com']  # still in a live pool
+        assert sorted((s.kind, s.date) for s in PlayerSchedule.query.all()) == [('booking', soon), ('match', soon)]
+
+
+    # Archiving the newest pool frees the highest id; the next pool must not reuse it
+    for hour in (20, 21):
+        with app.app_context():
+            db.session.add(Match(ground_id=1, date=old, time=time(hour), host_email='test@host.com'))
+            db.session.commit()
+        result = runner.invoke(args=['retention'])
+        assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert MatchArchive.query.count() == 3
+
+
+def test_engine_settings_from_config(tmp_path):
+    from db_settings import engine_options, sqlite_pragmas
+    file_app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/tuned.db', 'SQLITE_BUSY_TIMEOUT_MS': 1234})
+    with file_app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+            assert conn.execute(text('PRAGMA busy_timeout')).scalar() == 1234
+        db.engine.dispose()
+
+    server = dict(file_app.config, SQLALCHEMY_DATABASE_URI='postgresql://u@db/grounds', DB_POOL_SIZE=20)
+    assert engine_options(server) == {'pool_size': 20, 'max_overflow': 10, 'pool_timeout': 30,
+                                      'pool_recycle': 1800, 'pool_pre_ping': True}
+    assert engine_options(file_app.config) == {}
+    with pytest.raises(ValueError):
+        sqlite_pragmas(dict(file_app.config, SQLITE_JOURNAL_MODE='wal; DROP TABLE ground'))
+    with pytest.raises(ValueError):
+        sqlite_pragmas(dict(file_app.config, SQLITE_MMAP_SIZE='1; DROP TABLE ground'))
+
+    # An empty env var keeps SQLite's default instead of failing at import
+    import subprocess
+    import sys
+    env = dict(os.environ, SQLITE_CACHE_SIZE='', SQLITE_MMAP_SIZE='', SQLITE_BUSY_TIMEOUT_MS='')
+    out = subprocess.run([sys.executable, '-c', 'from config import Config; from db_settings import sqlite_pragmas;'
+                          ' print([p for p, _ in sqlite_pragmas(vars(Config))])'],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "['journal_mode', 'synchronous']"
+
+
+def test_ground_search_ranks_prefixes_and_follows_writes(client):
+    from app import invalidate_pages
+    from search import fts_match_expression
+    with app.app_context():
+        db.session.add_all([
+            Ground(name='Lahore Gymkhana', location='Lahore', city='Lahore', rate=1, img='x', published=True,
+                   host_email='a@h.com', materials='Grass,Floodlights'),
+            Ground(name='Karachi Arena', location='Karachi', city='Karachi', full_address='Near Lahore Hotel',
+                   rate=1, img='x', published=True, host_email='b@h.com', materials='Turf'),
+            Ground(name='Lahore Hidden', location='Lahore', city='Lahore', rate=1, img='x', published=False,
+                   host_email='c@h.com'),
+        ])
+        db.session.commit()
+
+    def names(q):
+        return [g['name'] for g in client.get('/api/grounds/search', query_string={'q': q}).get_json()['grounds']]
+
+    assert names('lahore') == ['Lahore Gymkhana', 'Karachi Arena']  # name hit outranks the address
+    assert names('lah') == ['Lahore Gymkhana', 'Karachi Arena']
+    assert names('gym flood') == ['Lahore Gymkhana']
+    assert names('"lahore* (') == ['Lahore Gymkhana', 'Karachi Arena']  # FTS5 syntax is not passed through
+    assert names('') == [] and fts_match_expression(' ,; ') is None
+
+    with app.app_context():
+        gym = Ground.query.filter_by(name='Lahore Gymkhana').one()
+        gym.name = 'Model Town Park'
+        Ground.query.filter_by(name='Lahore Hidden').one().published = True
+        db.session.commit()
+    invalidate_pages('grounds')
+    assert names('model') == ['Model Town Park']
+    assert names('lahore') == ['Lahore Hidden', 'Model Town Park', 'Karachi Arena']
+    with app.app_context():
+        db.session.delete(Ground.query.filter_by(name='Karachi Arena').one())
+        db.session.commit()
+    assert names('hotel') == []
+
+
+def test_grounds_api_filters_and_facets_in_one_query(client):
+    from app import metrics
+    with app.app_context():
+        db.session.execute(text('DELETE FROM ground'))
+        db.session.commit()
+    result = app.test_cli_runner().invoke(args=['seed'])
+    assert result.exit_code == 0
+    login_as_player(client, 'facets@x.com')
+    client.post('/publish-ground', data={'ground_name': 'Padel Box', 'location': 'Lahore', 'rate': '6000',
+                                         'materials': 'Rackets, goal post', 'ground_use': 'Padel'})
+    with app.app_context():
+        Ground.query.filter_by(name='Padel Box').one().published = True
+        db.session.commit()
+
+    body = client.get('/api/grounds?facets=1').get_json()
+    assert body['facets']['sport'] == {'football': 5, 'padel': 1}
+    assert body['facets']['material']['goal post'] == 6 and body['facets']['material']['rackets'] == 1
+    assert body['facets']['rate'] == {'1000-1999': 1, '2000-2999': 4, '5000+': 1}
+
+    metrics.reset()
+    body = client.get('/api/grounds?facets=1&material=Goal%20Post,rackets&max_rate=9000').get_json()
+    assert [g['name'] for g in body['grounds']] == ['Padel Box']
+    assert body['facets'] == {'sport': {'padel': 1}, 'material': {'goal post': 1, 'rackets': 1}, 'rate': {'5000+': 1}}
+    assert metrics.value('http_request_queries', {'route': '/api/grounds'}).sum == 2  # page + all facets
+    assert len(client.get('/api/grounds?sport=FOOTBALL&min_rate=2000').get_json()['grounds']) == 4
+    assert client.get('/api/grounds?min_rate=cheap').status_code == 400
+
+
+def test_matchmaking_places_overflow_in_best_nearby_pool(client):
+    from app import MatchRequest, PlayerSchedule, run_matchmaking
+    day = date.today() + timedelta(days=1)
+    with app.app_context():
+        def ground(name, lat, lng, use='Football'):
+            return Ground(name=name, location='Lahore', rate=1, img='x', published=True, host_email=f'{name}@h.com',
+                          ground_use=use, latitude=lat, longitude=lng)
+        a, b, far, padel = ground('a', 31.50, 74.30), ground('b', 31.52, 74.31), ground('far', 31.90, 74.30), \
+            ground('padel', 31.51, 74.30, 'Padel')
+        db.session.add_all([a, b, far, padel])
+        db.session.flush()
+        db.session.add_all([
+            Match(ground_id=a.id, date=day, time=time(18), status='pending_host', host_email=a.host_email, player_count=10),
+            Match(ground_id=b.id, date=day, time=time(8), host_email=b.host_email, player_count=1),
+            Match(ground_id=b.id, date=day, time=time(20), host_email=b.host_email, player_count=3),
+            Match(ground_id=far.id, date=day, time=time(10), host_email=far.host_email, player_count=8),
+        ])
+        db.session.commit()
+        ids = {'a': a.id, 'b': b.id, 'padel': padel.id}
+
+    login_as_player(client, 'late@x.com')
+    rv = client.post(f'/join_match/{ids["a"]}', data={'date': day.isoformat(), 'time': '18:00'}, follow_redirects=True)
+    assert b'queued you for the best open pool nearby' in rv.data
+    login_as_player(client, 'padel@x.com')
+    client.post('/matchmaking', data={'date_from': day.isoformat(), 'ground_id': ids['a'], 'sport': 'padel'})
+    with app.app_context():
+        db.session.add(MatchRequest(player_email='old@x.com', date_from=date(2020, 1, 1), date_to=date(2020, 1, 2),
+                                    max_distance_km=5))
+        db.session.commit()
+        assert run_matchmaking() == {'placed': 2, 'waiting': 0, 'expired': 1}
+
+        late = MatchRequest.query.filter_by(player_email='late@x.com').one()
+        placed = db.session.get(Match, late.match_id)
+        assert (placed.ground_id, placed.time, placed.player_count) == (ids['b'], time(20), 4)  # fullest within 10 km
+        assert PlayerSchedule.query.filter_by(player_email='late@x.com', ref_id=placed.id).count() == 1
+        started = db.session.get(Match, MatchRequest.query.filter_by(player_email='padel@x.com').one().match_id)
+        assert (started.ground_id, started.date, started.time, started.player_count) == (ids['padel'], day, time(6), 1)
+        assert run_matchmaking() == {'placed': 0, 'waiting': 0, 'expired': 0}
+    assert client.get('/api/matchmaking').get_json()['request']['status'] == 'placed'
+
+    # A full pool that already happened: nothing to be placed in, so nothing is queued
+    yesterday = date.today() - timedelta(days=1)
+    with app.app_context():
+        db.session.add(Match(ground_id=ids['a'], date=yesterday, time=time(18), status='confirmed',
+                             host_email='a@h.com', player_count=10))
+        db.session.commit()
+    login_as_player(client, 'past@x.com')
+    rv = client.post(f'/join_match/{ids["a"]}', data={'date': yesterday.isoformat(), 'time': '18:00'},
+                     follow_redirects=True)
+    assert b'This match pool is full.' in rv.data and b'queued you' not in rv.data
+    with app.app_context():
+        assert MatchRequest.query.filter_by(player_email='past@x.com').count() == 0
+
+    # Teams can't be balanced without ages: no age, no queueing, and an old request expires
+    with app.app_context():
+        db.session.add(User(email='noage@x.com', user_type='player'))
+        db.session.commit()
+    with client.session_transaction() as sess:
+        sess['user_email'] = 'noage@x.com'
+    rv = client.post('/matchmaking', data={'date_from': day.isoformat(), 'ground_id': ids['b']}, follow_redirects=True)
+    assert b'Your profile age is missing' in rv.data
+    with app.app_context():
+        assert MatchRequest.query.filter_by(player_email='noage@x.com').count() == 0
+        db.session.add(MatchRequest(player_email='noage@x.com', date_from=day, date_to=day, origin_ground_id=ids['b'],
+                                    max_distance_km=5))
+        db.session.commit()
+        assert run_matchmaking() == {'placed': 0, 'waiting': 0, 'expired': 1}
+        assert MatchRequest.query.filter_by(player_email='noage@x.com').one().status == 'expired'
+
+
+def test_periodic_worker_wakes_and_survives_errors():
+    import threading
+    from jobs import PeriodicWorker
+    failed, ran = threading.Event(), threading.Event()
+
+    def job():
+        if not failed.is_set():
+            failed.set()
+            raise RuntimeError('first pass fails')
+        ran.set()
+
+    worker = PeriodicWorker(job, interval=60, name='test')
+    worker.start()
+    worker.wake()
+    assert failed.wait(5)
+    worker.wake()
+    assert ran.wait(5) and worker.running
+    worker.stop(timeout=5)
+    assert not worker.running
+
+
+def test_jobs_are_idempotent_and_retried_with_backoff(client):
+    from app import JOB_HANDLERS, Job, enqueue_job, job_handler
+    calls = []
+
+    @job_handler('test_flaky')
+    def flaky(n):
+        calls.append(n)
+        if len(calls) == 1:
+            raise RuntimeError('transient')
+
+    @job_handler('test_broken')
+    def broken():
+        raise RuntimeError('always')
+
+    try:
+        with app.app_context():
+            enqueue_job('test_flaky', {'n': 1}, key='flaky:1')
+            enqueue_job('test_flaky', {'n': 1}, key='flaky:1')
+            db.session.add(Job(kind='test_broken', payload='{}', max_attempts=2))
+            db.session.commit()
+            assert Job.query.count() == 2
+            assert run_jobs() == 2
+            flaky_job = Job.query.filter_by(kind='test_flaky').one()
+            assert (flaky_job.status, flaky_job.attempts) == ('queued', 1)
+            assert 'transient' in flaky_job.last_error and flaky_job.run_after > flaky_job.updated_at
+            assert run_jobs() == 0  # backing off
+
+            Job.query.update({Job.run_after: Job.created_at})
+            db.session.commit()
+            result = app.test_cli_runner().invoke(args=['run-jobs'])
+            assert 'Ran 2 jobs.' in result.output
+            assert calls == [1, 1]
+            assert {j.kind: (j.status, j.attempts) for j in Job.query.all()} == {
+                'test_flaky': ('done', 2), 'test_broken': ('failed', 2)}
+            # A key that was used already is not queued again
+            enqueue_job('test_flaky', {'n': 1}, key='flaky:1')
+            db.session.commit()
+            assert Job.query.count() == 2
+    finally:
+        JOB_HANDLERS.pop('test_flaky')
+        JOB_HANDLERS.pop('test_broken')
+
+
+def test_rate_limits_login_attempts_and_pool_polling(client, tmp_path):
+    from rate_limit import SQLiteBuckets, parse_limit
+    assert parse_limit('30/minute') == (30, 0.5) and parse_limit('') is None
+    with pytest.raises(ValueError):
+        parse_limit('lots')
+
+    # 5/minute per session: the sixth password check is refused without running
+    for _ in range(5):
+        rv = client.post('/login/player', data={'email': 'nobody@x.com', 'password': 'wrong'})
+        assert rv.status_code == 200
+    rv = client.post('/login/player', data={'email': 'nobody@x.com', 'password': 'wrong'})
+    assert rv.status_code == 429 and b'Too many attempts' in rv.data
+    assert 1 <= int(rv.headers['Retry-After']) <= 12
+    assert client.get('/login/player').status_code == 200  # only POSTs count
+    # Host and player logins share the bucket; a fresh session still has its own
+    assert client.post('/login/host', data={'email': 'h@x.com', 'password': 'x'}).status_code == 429
+    assert app.test_client().post('/login/host', data={'email': 'h@x.com', 'password': 'x'}).status_code == 200
+
+    with app.app_context():
+        ground_id = Ground.query.first().id
+    login_as_player(client, 'poller@x.com')
+    url = f'/api/match_pool/{ground_id}?date=2025-05-01&time=18:00'
+    statuses = [client.get(url).status_code for _ in range(61)]
+    assert statuses[:60] == [200] * 60 and statuses[60] == 429
+    rv = client.get(url)
+    assert rv.get_json()['error'] == 'too many requests' and rv.headers['Retry-After'] == '1'
+
+    # Worker processes sharing the SQLite file share the buckets
+    first, second = SQLiteBuckets(str(tmp_path / 'rl.db')), SQLiteBuckets(str(tmp_path / 'rl.db'))
+    assert first.take('k', 2, 1 / 60)[0] and second.take('k', 2, 1 / 60)[0]
+    allowed, retry_after = first.take('k', 2, 1 / 60)
+    assert not allowed and 55 < retry_after <= 60